@@ -0,0 +1,316 @@
+"""Content-addressed cache for OpenAI resume analyses.
+
+Analysing a resume is by far the slowest and most expensive step of a request,
+and the result only depends on the resume text, the model and the prompt.  The
+cache below therefore keys every analysis by a hash of exactly those three
+inputs and keeps results in two tiers:
+
+1. An in-process LRU with size and TTL eviction (no I/O on a hit).
+2. A small SQLite file shared by all gunicorn workers on the same host, so a
+   result computed by one worker is reused by the others and survives restarts.
+
+Hit/miss counters are kept per process, along with the OpenAI latency and
+tokens each hit avoided, and added to the totals in the shared file when the
+disk tier is used anyway (or every ``stats_flush_seconds``), so a memory hit
+never touches the disk.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from metrics import cache_lookup
+
+
+class LRUTTLCache:
+    """Thread-safe LRU mapping whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def normalize_text(text: str) -> str:
+    """Normalise resume text so cosmetic differences map to the same key."""
+    text = unicodedata.normalize("NFC", text or "")
+    text = re.sub(r"[ \t\f\v\u00a0]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+class AnalysisCache:
+    """Two-tier (memory + SQLite) cache for analysis Markdown."""
+
+    _COUNTERS = ("memory_hits", "disk_hits", "misses", "stores", "seconds_saved", "tokens_saved")
+
+    def __init__(
+        self,
+        path: str | None = None,
+        maxsize: int = 256,
+        ttl: float = 3600,
+        disk_ttl: float = 30 * 24 * 3600,
+        enabled: bool = True,
+        stats_flush_seconds: float = 60,
+    ):
+        self.enabled = enabled
+        self.path = path
+        self.disk_ttl = disk_ttl
+        self.memory = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+        self._stats: Dict[str, float] = {name: 0 for name in self._COUNTERS}
+        self._stats_lock = threading.Lock()
+        # Counted since the last write to cache_stats
+        self._pending: Dict[str, float] = {}
+        self.stats_flush_seconds = stats_flush_seconds
+        self._flushed_at = time.monotonic()
+        if self.enabled and self.path:
+            self._init_disk()
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+    @staticmethod
+    def make_key(text: str, model: str, prompt_version: str) -> str:
+        digest = hashlib.sha256()
+        for part in (normalize_text(text), model, prompt_version):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+    def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._record(memory_hits=1, seconds_saved=entry[1], tokens_saved=entry[2])
+            cache_lookup('analysis', 'memory_hit')
+            return entry[0]
+
+        entry = self._disk_get(key)
+        if entry is not None:
+            self.memory.set(key, entry)
+            self._record(disk_hits=1, seconds_saved=entry[1], tokens_saved=entry[2])
+            cache_lookup('analysis', 'disk_hit')
+            return entry[0]
+
+        self._record(misses=1)
+        cache_lookup('analysis', 'miss')
+        return None
+
+    def set(self, key: str, value: str, cost_seconds: float = 0.0, tokens: int = 0) -> None:
+        if not self.enabled:
+            return
+        entry = (value, float(cost_seconds), int(tokens or 0))
+        self.memory.set(key, entry)
+        self._disk_set(key, entry)
+        self._record(stores=1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            process = dict(self._stats)
+        lookups = process["memory_hits"] + process["disk_hits"] + process["misses"]
+        process["hit_ratio"] = round((lookups - process["misses"]) / lookups, 4) if lookups else 0.0
+        process["memory_entries"] = len(self.memory)
+        return {
+            "enabled": self.enabled,
+            "process": process,
+            "shared": self._disk_stats(),
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _record(self, **deltas) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+                self._pending[name] = self._pending.get(name, 0) + delta
+            due = time.monotonic() - self._flushed_at >= self.stats_flush_seconds
+        if due and self.path:
+            try:
+                with self._connect() as conn:
+                    self._flush_stats(conn)
+            except sqlite3.Error as e:
+                print(f"Analysis cache stats update failed: {e}")
+
+    def _flush_stats(self, conn) -> None:
+        """Add the pending counters to cache_stats, in *conn*'s transaction."""
+        with self._stats_lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            conn.executemany(
+                "UPDATE cache_stats SET value = value + ? WHERE name = ?",
+                [(delta, name) for name, delta in pending.items()],
+            )
+        except sqlite3.Error as e:
+            # Count them again with the next flush; the lookup itself goes on
+            print(f"Analysis cache stats update failed: {e}")
+            with self._stats_lock:
+                for name, delta in pending.items():
+                    self._pending[name] = self._pending.get(name, 0) + delta
+
+    @contextmanager
+    def _connect(self):
+        # A fresh connection per operation keeps the cache fork- and
+        # thread-safe; SQLite connections are cheap to open.
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_disk(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                    " key TEXT PRIMARY KEY,"
+                    " value TEXT NOT NULL,"
+                    " cost_seconds REAL NOT NULL DEFAULT 0,"
+                    " tokens INTEGER NOT NULL DEFAULT 0,"
+                    " created_at REAL NOT NULL,"
+                    " expires_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache_stats ("
+                    " name TEXT PRIMARY KEY,"
+                    " value REAL NOT NULL DEFAULT 0)"
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO cache_stats (name, value) VALUES (?, 0)",
+                    [(name,) for name in self._COUNTERS],
+                )
+        except sqlite3.Error as e:
+            # Degrade to a memory-only cache rather than failing requests
+            print(f"Analysis cache disk tier disabled: {e}")
+            self.path = None
+
+    def _disk_get(self, key: str):
+        if not self.path:
+            return None
+        try:
+            with self._connect() as conn:
+                self._flush_stats(conn)
+                row = conn.execute(
+                    "SELECT value, cost_seconds, tokens FROM analysis_cache"
+                    " WHERE key = ? AND expires_at > ?",
+                    (key, time.time()),
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Analysis cache read failed: {e}")
+            return None
+        return tuple(row) if row else None
+
+    def _disk_set(self, key: str, entry) -> None:
+        if not self.path:
+            return
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                self._flush_stats(conn)
+                conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache"
+                    " (key, value, cost_seconds, tokens, created_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, entry[0], entry[1], entry[2], now, now + self.disk_ttl),
+                )
+                conn.execute("DELETE FROM analysis_cache WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            print(f"Analysis cache write failed: {e}")
+
+    def _disk_stats(self) -> Dict[str, Any] | None:
+        if not self.path:
+            return None
+        try:
+            with self._connect() as conn:
+                self._flush_stats(conn)
+                stats = dict(conn.execute("SELECT name, value FROM cache_stats").fetchall())
+                stats["entries"] = conn.execute(
+                    "SELECT COUNT(*) FROM analysis_cache WHERE expires_at > ?", (time.time(),)
+                ).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Analysis cache stats read failed: {e}")
+            return None
+        lookups = stats.get("memory_hits", 0) + stats.get("disk_hits", 0) + stats.get("misses", 0)
+        stats["hit_ratio"] = round((lookups - stats.get("misses", 0)) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# ---------------------------------------------------------------------------
+# Process-wide instance
+# ---------------------------------------------------------------------------
+_cache: AnalysisCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Return the shared cache, configured from environment variables.
+
+    ``ANALYSIS_CACHE_ENABLED``   set to ``0`` to disable caching entirely
+    ``ANALYSIS_CACHE_PATH``      SQLite file shared by all workers
+    ``ANALYSIS_CACHE_SIZE``      max entries in the in-process LRU
+    ``ANALYSIS_CACHE_TTL``       in-process TTL in seconds
+    ``ANALYSIS_CACHE_DISK_TTL``  persistent TTL in seconds
+    ``ANALYSIS_CACHE_STATS_FLUSH_SECONDS``  max age of counters not yet in the shared file
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalysisCache(
+                    path=os.environ.get("ANALYSIS_CACHE_PATH", os.path.join("instance", "analysis_cache.db")),
+                    maxsize=int(os.environ.get("ANALYSIS_CACHE_SIZE", 256)),
+                    ttl=float(os.environ.get("ANALYSIS_CACHE_TTL", 3600)),
+                    disk_ttl=float(os.environ.get("ANALYSIS_CACHE_DISK_TTL", 30 * 24 * 3600)),
+                    enabled=os.environ.get("ANALYSIS_CACHE_ENABLED", "1") != "0",
+                    stats_flush_seconds=float(os.environ.get("ANALYSIS_CACHE_STATS_FLUSH_SECONDS", 60)),
+                )
+    return _cache
@@ -0,0 +1,342 @@
+"""Read-through access to stored resume analyses.
+
+Endpoints that need the analysis of a resume (analyze, send-pdf, strategies)
+go through `get_or_create_analysis` instead of calling `PDFProcessor` directly.
+The stored `ResumeAnalysis` row is reused as long as the uploaded file and the
+prompt are unchanged; otherwise the text is extracted, analysed and stored.
+
+Concurrent requests for the same analysis (double clicks, retries, send-pdf
+while /analyze is still running) are coalesced: within a process they share
+one call through `SingleFlight`, and across workers the first one takes a lock
+row while the others wait for its stored result.
+"""
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Generator, Iterator, List, Tuple
+
+from sqlalchemy import and_, case, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Resume, ResumeAnalysis, ExtractedDocument, ExtractedPage
+from openai_analyzer import OpenAIResumeAnalyzer
+from pdf_processor import PDFProcessor
+from singleflight import SingleFlight, acquire_lock, release_lock, lock_held
+from storage import get_storage
+
+# Lock TTL must exceed the OpenAI deadline so a live holder never loses it
+SINGLEFLIGHT_LOCK_TTL = float(os.environ.get('SINGLEFLIGHT_LOCK_TTL', 120))
+SINGLEFLIGHT_WAIT = float(os.environ.get('SINGLEFLIGHT_WAIT', 120))
+SINGLEFLIGHT_POLL_INTERVAL = 0.5
+
+_analysis_flight = SingleFlight()
+
+
+@contextmanager
+def resume_pdf_file(resume: Resume) -> Iterator[str]:
+    """Local path of the uploaded PDF for *resume*, valid inside the ``with``
+    block (a temporary copy if the storage is remote)."""
+    with get_storage().local_file(resume.filename) as path:
+        yield path
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resume_content_hash(resume: Resume) -> str:
+    """SHA-256 of the resume's file.
+
+    Content-addressed uploads record it; legacy uploads were stored under
+    their file name and may have been overwritten since, so they are hashed.
+    """
+    if resume.content_hash:
+        return resume.content_hash
+    with resume_pdf_file(resume) as path:
+        return file_sha256(path)
+
+
+def store_extraction(content_hash: str, pages: List[str]) -> ExtractedDocument:
+    """Persist per-page text (with character offsets) for a PDF."""
+    document = ExtractedDocument(
+        content_hash=content_hash,
+        page_count=len(pages),
+        char_count=sum(len(page) for page in pages),
+    )
+    db.session.add(document)
+    offset = 0
+    for number, page_text in enumerate(pages, start=1):
+        db.session.add(ExtractedPage(
+            content_hash=content_hash,
+            page_number=number,
+            char_offset=offset,
+            text=page_text,
+        ))
+        offset += len(page_text)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request stored the same file concurrently
+        db.session.rollback()
+        document = db.session.get(ExtractedDocument, content_hash)
+    return document
+
+
+def extract_and_store(filepath: str, content_hash: str | None = None, processor=None) -> ExtractedDocument:
+    """Extract *filepath* once and store its pages; no-op if already stored."""
+    content_hash = content_hash or file_sha256(filepath)
+    document = db.session.get(ExtractedDocument, content_hash)
+    if document is None:
+        processor = processor or PDFProcessor()
+        document = store_extraction(content_hash, processor.extract_pages(filepath))
+    return document
+
+
+def get_resume_document(resume: Resume, content_hash: str | None = None, processor=None) -> ExtractedDocument:
+    """Stored extraction of *resume*.
+
+    Resumes uploaded before text was extracted at upload time are extracted
+    (and stored) on first access.  The file is only fetched from the
+    storage if its text is not stored yet.
+    """
+    content_hash = content_hash or resume_content_hash(resume)
+    document = db.session.get(ExtractedDocument, content_hash)
+    if document is None:
+        with resume_pdf_file(resume) as path:
+            document = extract_and_store(path, content_hash, processor)
+    return document
+
+
+def get_resume_text(resume: Resume, content_hash: str | None = None, processor=None) -> str:
+    """Full text of *resume*, read from the extraction store."""
+    return get_resume_document(resume, content_hash, processor).text
+
+
+def find_analysis(content_hash: str, model: str = OpenAIResumeAnalyzer.DEFAULT_MODEL,
+                  prompt_version: str = OpenAIResumeAnalyzer.PROMPT_VERSION) -> ResumeAnalysis | None:
+    """Return the newest stored analysis for this file content, if current."""
+    return (
+        ResumeAnalysis.query
+        .filter_by(content_hash=content_hash, model=model, prompt_version=prompt_version)
+        .order_by(ResumeAnalysis.created_at.desc(), ResumeAnalysis.id.desc())
+        .first()
+    )
+
+
+def _latest_analysis_query(columns, resume_id: int, content_hash: str | None):
+    """Analyses are shared by file content, so they are looked up by
+    *content_hash* (legacy uploads without one: by *resume_id*); an analysis
+    with the current model and prompt wins over newer outdated ones."""
+    if content_hash:
+        match = ResumeAnalysis.content_hash == content_hash
+    else:
+        match = ResumeAnalysis.resume_id == resume_id
+    current = case(
+        (and_(ResumeAnalysis.model == OpenAIResumeAnalyzer.DEFAULT_MODEL,
+              ResumeAnalysis.prompt_version == OpenAIResumeAnalyzer.PROMPT_VERSION), 1),
+        else_=0,
+    )
+    return (
+        select(*columns)
+        .where(match)
+        .order_by(current.desc(), ResumeAnalysis.created_at.desc(), ResumeAnalysis.id.desc())
+        .limit(1)
+    )
+
+
+def latest_analysis(resume: Resume) -> ResumeAnalysis | None:
+    """Newest stored analysis of *resume*'s file, preferring a current one."""
+    return db.session.scalars(_latest_analysis_query([ResumeAnalysis], resume.id, resume.content_hash)).first()
+
+
+def latest_analysis_version(resume_id: int, content_hash: str | None = None) -> Tuple[int, datetime] | None:
+    """``(id, created_at)`` of the analysis `latest_analysis` returns,
+    without loading its Markdown (for ETags)."""
+    return db.session.execute(
+        _latest_analysis_query([ResumeAnalysis.id, ResumeAnalysis.created_at], resume_id, content_hash)
+    ).first()
+
+
+def save_analysis(resume: Resume, markdown: str, extracted_text: str, content_hash: str,
+                  model: str, prompt_version: str) -> ResumeAnalysis:
+    artifact = ResumeAnalysis(
+        resume_id=resume.id,
+        content_hash=content_hash,
+        model=model,
+        prompt_version=prompt_version,
+        markdown=markdown,
+        extracted_text=extracted_text,
+    )
+    db.session.add(artifact)
+    resume.processed = True
+    db.session.commit()
+    return artifact
+
+
+def lookup_analysis(resume: Resume, processor=None) -> Tuple[str, ResumeAnalysis | None]:
+    """Return ``(content_hash, artifact)``; *artifact* is the current stored
+    analysis of the resume's file or ``None`` if it must be (re)computed."""
+    content_hash = resume_content_hash(resume)
+    model = processor.analyzer.model if processor is not None else OpenAIResumeAnalyzer.DEFAULT_MODEL
+    artifact = find_analysis(content_hash, model=model)
+    if artifact is not None and not resume.processed:
+        resume.processed = True
+        db.session.commit()
+    return content_hash, artifact
+
+
+def analysis_key(content_hash: str, model: str, prompt_version: str) -> str:
+    return f"analysis:{content_hash}:{model}:{prompt_version}"
+
+
+def poll_analysis(key: str, content_hash: str, model: str) -> Tuple[ResumeAnalysis | None, bool]:
+    """Return ``(artifact, still_locked)`` for an analysis another worker is computing."""
+    artifact = find_analysis(content_hash, model=model)
+    if artifact is not None:
+        return artifact, False
+    return None, lock_held(key)
+
+
+def wait_for_analysis(key: str, content_hash: str, model: str) -> Tuple[ResumeAnalysis | None, bool]:
+    """Block while *key* is locked by another worker.
+
+    Returns ``(artifact, still_locked)``: the stored result once it appears,
+    or ``(None, False)`` if the holder released the lock without storing one
+    (e.g. it fell back to basic analysis), or ``(None, True)`` on timeout.
+    """
+    deadline = time.monotonic() + SINGLEFLIGHT_WAIT
+    while True:
+        artifact, locked = poll_analysis(key, content_hash, model)
+        if artifact is not None or not locked or time.monotonic() >= deadline:
+            return artifact, locked
+        time.sleep(SINGLEFLIGHT_POLL_INTERVAL)
+
+
+def release_analysis_lock(key: str, owner: str) -> None:
+    try:
+        release_lock(key, owner)
+    except Exception as e:
+        # The lock expires on its own after SINGLEFLIGHT_LOCK_TTL
+        db.session.rollback()
+        print(f"Releasing analysis lock failed: {str(e)}")
+
+
+def _analyse_once(resume: Resume, content_hash: str, processor, key: str) -> Tuple[Any, int | None]:
+    """Compute the analysis unless another worker already does; returns
+    ``(analysis, artifact_id)`` so the result can be shared across threads."""
+    model = processor.analyzer.model
+    while True:
+        owner = acquire_lock(key, SINGLEFLIGHT_LOCK_TTL)
+        if owner is not None:
+            break
+        artifact, locked = wait_for_analysis(key, content_hash, model)
+        if artifact is not None:
+            return artifact.markdown, artifact.id
+        if locked:
+            # Gave up waiting; compute without the lock rather than fail
+            break
+
+    try:
+        # The previous holder may have stored it between lookup and lock
+        artifact = find_analysis(content_hash, model=model)
+        if artifact is not None:
+            return artifact.markdown, artifact.id
+
+        document = get_resume_document(resume, content_hash, processor)
+        text = document.text
+        try:
+            markdown = processor.analyzer.analyse(text, pages=[page.text for page in document.pages])
+        except Exception as e:
+            # Fallback to basic analysis if OpenAI fails
+            print(f"OpenAI analysis failed: {str(e)}")
+            return processor.basic_analysis(text), None
+
+        artifact = save_analysis(
+            resume,
+            markdown=markdown,
+            extracted_text=text,
+            content_hash=content_hash,
+            model=model,
+            prompt_version=processor.analyzer.PROMPT_VERSION,
+        )
+        return markdown, artifact.id
+    finally:
+        if owner is not None:
+            release_analysis_lock(key, owner)
+
+
+def get_or_create_analysis(resume: Resume, processor=None) -> Tuple[str | Dict[str, Any], ResumeAnalysis | None]:
+    """Return ``(analysis, artifact)`` for *resume*.
+
+    *analysis* is the Markdown report.  If the OpenAI call fails the result of
+    `PDFProcessor.basic_analysis` (a dict) is returned instead and *artifact*
+    is ``None`` – fallback results are never stored so the next request tries
+    the LLM again.
+    """
+    content_hash, artifact = lookup_analysis(resume, processor)
+    if artifact is not None:
+        return artifact.markdown, artifact
+
+    processor = processor or PDFProcessor()
+    key = analysis_key(content_hash, processor.analyzer.model, processor.analyzer.PROMPT_VERSION)
+    analysis, artifact_id = _analysis_flight.do(
+        key, lambda: _analyse_once(resume, content_hash, processor, key)
+    )
+    if artifact_id is None:
+        return analysis, None
+
+    # Re-load in this thread's session; the result may come from another thread
+    artifact = db.session.get(ResumeAnalysis, artifact_id)
+    if not resume.processed:
+        resume.processed = True
+        db.session.commit()
+    return artifact.markdown, artifact
+
+
+def stream_analysis(resume: Resume, processor=None) -> Generator[str, None, ResumeAnalysis]:
+    """Yield Markdown chunks for *resume* as they arrive from the model.
+
+    A current stored analysis is yielded as a single chunk, as is the result
+    of an identical analysis already running elsewhere.  Otherwise the
+    assembled Markdown is stored once the stream completes, exactly like
+    `get_or_create_analysis`.  The generator returns the `ResumeAnalysis`.
+    Errors from the OpenAI call propagate to the caller.
+    """
+    content_hash, artifact = lookup_analysis(resume, processor)
+    if artifact is not None:
+        yield artifact.markdown
+        return artifact
+
+    processor = processor or PDFProcessor()
+    model = processor.analyzer.model
+    key = analysis_key(content_hash, model, processor.analyzer.PROMPT_VERSION)
+    owner = acquire_lock(key, SINGLEFLIGHT_LOCK_TTL)
+    if owner is None:
+        artifact, _ = wait_for_analysis(key, content_hash, model)
+        if artifact is not None:
+            yield artifact.markdown
+            return artifact
+        owner = acquire_lock(key, SINGLEFLIGHT_LOCK_TTL)
+
+    try:
+        document = get_resume_document(resume, content_hash, processor)
+        text = document.text
+        markdown = yield from processor.analyzer.analyse_stream(text, pages=[page.text for page in document.pages])
+
+        return save_analysis(
+            resume,
+            markdown=markdown,
+            extracted_text=text,
+            content_hash=content_hash,
+            model=model,
+            prompt_version=processor.analyzer.PROMPT_VERSION,
+        )
+    finally:
+        if owner is not None:
+            release_analysis_lock(key, owner)
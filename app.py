@@ -6,12 +6,20 @@ from flask_cors import CORS
 from dotenv import load_dotenv
 import os
 import sys
-from blueprints import blueprints
-from models import db
 
-# Load environment variables
+# Load environment variables before the app modules read their settings
 load_dotenv()
 
+from blueprints import blueprints
+from models import db
+from database import configure_database
+import migrations
+import storage
+from metrics import init_metrics
+from jobs import init_jobs
+from outbox import init_outbox
+from photo_analyzer import start_warm_up
+
 app = Flask(__name__, static_folder='frontend/build', static_url_path='')
 CORS(app)
 
@@ -27,28 +35,56 @@ CORS(app)
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key')
 app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///resume_analyzer.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024  # 16MB max file size by default; raise for batch uploads
 
-# Initialize SQLAlchemy
+# Initialize SQLAlchemy (URL, pool and SQLite tuning from the environment)
+configure_database(app)
 db.init_app(app)
 
-# Create tables if they do not exist
-with app.app_context():
-    db.create_all()
+def init_db() -> None:
+    """Create the tables that do not exist yet and apply pending migrations.
+
+    Run once per deploy (``flask --app app init-db``) rather than at import,
+    so that booting a worker does not touch the schema.
+    """
+    with app.app_context():
+        db.create_all()
+        for migration_id in migrations.upgrade():
+            print(f"Applied migration {migration_id}")
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing database tables and apply migrations."""
+    init_db()
+    print("Database initialised")
+
+@app.cli.command('storage-copy')
+def storage_copy_command():
+    """Copy the files under uploads/ to the configured storage backend."""
+    copied = storage.copy_local_files(storage.get_storage())
+    print(f"Copied {copied} files")
+
+# Request histograms and Server-Timing headers
+init_metrics(app)
 
 # Register blueprints
 for bp in blueprints:
     app.register_blueprint(bp)
 
-# Configure OpenAI
-try:
-    import openai
-    openai.api_key = os.environ.get('OPENAI_API_KEY')
+# Background workers for queued analyses (started lazily in each process)
+init_jobs(app)
+
+# Background email delivery (started lazily in each process)
+init_outbox(app)
+
+# The OpenAI client is created on first use (see openai_client.py); only
+# check the configuration here so boot does not import the SDK
+if os.environ.get('OPENAI_API_KEY'):
     print("OpenAI API key configured successfully")
-except Exception as e:
-    print(f"Error configuring OpenAI: {str(e)}")
+else:
+    print("OPENAI_API_KEY is not set; analyses will fall back to the basic analysis,"
+          " PDF reports will answer 503 and strategies a placeholder")
 
 @app.route('/')
 def index():
@@ -74,6 +110,14 @@ if __name__ == '__main__':
     print(f"Starting server on port {port}")
     print(f"Python version: {sys.version}")
     print(f"Current working directory: {os.getcwd()}")
+
+    # The development server creates the schema itself; deployments run init-db
+    init_db()
+
+    # gunicorn and the ASGI lifespan warm the photo models up in each worker;
+    # here only in the reloader's child, the process that serves
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up()
     
     # Run the Flask application (development server)
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,272 @@
+"""ASGI entry point with an asyncio path for the LLM-bound endpoints.
+
+The blocking Flask views hold a worker thread for the whole OpenAI round-trip.
+Served through this module, the two endpoints that call the LLM run as
+coroutines on the worker's event loop instead, using the shared `AsyncOpenAI`
+client, so one worker can keep hundreds of analyses in flight:
+
+* ``POST /api/resumes/<slug>/analyze``  (the ``?async=1`` job mode stays in Flask)
+* ``POST /api/strategies/<resume_id>``
+
+Database and file work still runs synchronously, but in a thread via
+`asyncio.to_thread`, inside a Flask app context.  Their responses get the
+same CORS headers as the Flask routes and a ``Server-Timing`` header; their
+``OPTIONS`` preflight, like every other request, is passed to the Flask app
+through a WSGI adapter with its own thread pool.
+
+Run with::
+
+    gunicorn -c gunicorn.conf.py asgi:app
+
+``ASGI_WSGI_THREADS`` sets the thread pool size for the Flask routes.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Any, Dict
+
+from a2wsgi import WSGIMiddleware
+from flask_cors.core import get_cors_headers, get_cors_options
+from werkzeug.datastructures import Headers
+
+from app import app as flask_app
+from auth_utils import decode_token, resume_criteria
+from metrics import REQUEST_SECONDS, SERVER_TIMING, native_request_timing, server_timing_header
+from models import db, Resume
+from analysis_service import (
+    lookup_analysis, get_resume_document, save_analysis, analysis_key, poll_analysis,
+    release_analysis_lock, SINGLEFLIGHT_LOCK_TTL, SINGLEFLIGHT_WAIT, SINGLEFLIGHT_POLL_INTERVAL,
+)
+from singleflight import acquire_lock
+from openai_analyzer import OpenAIResumeAnalyzer
+from pdf_processor import PDFProcessor
+from photo_analyzer import start_warm_up
+from strategy_generator import StrategyGenerator
+
+wsgi_app = WSGIMiddleware(flask_app, workers=int(os.environ.get('ASGI_WSGI_THREADS', 10)))
+# The policy `CORS(app)` applies to the Flask routes.  Preflight requests
+# (OPTIONS) of the native routes are answered by Flask.
+CORS_OPTIONS = get_cors_options(flask_app)
+
+ANALYZE_PATH = re.compile(r'^/api/resumes/(?P<slug>[^/]+)/analyze$')
+STRATEGY_PATH = re.compile(r'^/api/strategies/(?P<resume_id>\d+)$')
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+async def _send_json(send, status: int, payload: Dict[str, Any]) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope.get('headers', []):
+        if key.lower() == name:
+            return value.decode('latin-1')
+    return ''
+
+
+def _authenticate(scope):
+    """Mirror `auth_utils.login_required`; returns ``(token payload, error)``."""
+    auth_header = _header(scope, b'authorization')
+    if not auth_header.startswith('Bearer '):
+        return None, 'Missing token'
+    try:
+        return decode_token(auth_header[7:]), None
+    except Exception:
+        return None, 'Invalid or expired token'
+
+
+def _prepare(resume: Resume) -> Dict[str, Any]:
+    """Stored analysis if current, else the text that must be analysed."""
+    content_hash, artifact = lookup_analysis(resume)
+    if artifact is not None:
+        return {'resume_id': resume.id, 'markdown': artifact.markdown}
+    document = get_resume_document(resume, content_hash)
+    return {
+        'resume_id': resume.id,
+        'content_hash': content_hash,
+        'text': document.text,
+        'pages': [page.text for page in document.pages],
+    }
+
+
+def _store(prepared: Dict[str, Any], markdown: str, analyzer: OpenAIResumeAnalyzer) -> None:
+    with flask_app.app_context():
+        resume = Resume.query.get(prepared['resume_id'])
+        save_analysis(
+            resume,
+            markdown=markdown,
+            extracted_text=prepared['text'],
+            content_hash=prepared['content_hash'],
+            model=analyzer.model,
+            prompt_version=analyzer.PROMPT_VERSION,
+        )
+
+
+def _in_app_context(fn, *args):
+    with flask_app.app_context():
+        return fn(*args)
+
+
+async def _wait_for_analysis(key: str, prepared: Dict[str, Any], model: str):
+    """Async counterpart of `analysis_service.wait_for_analysis`."""
+    def poll():
+        artifact, locked = poll_analysis(key, prepared['content_hash'], model)
+        return (artifact.markdown if artifact else None), locked
+
+    deadline = asyncio.get_running_loop().time() + SINGLEFLIGHT_WAIT
+    while True:
+        markdown, locked = await asyncio.to_thread(_in_app_context, poll)
+        if markdown is not None or not locked or asyncio.get_running_loop().time() >= deadline:
+            return markdown
+        await asyncio.sleep(SINGLEFLIGHT_POLL_INTERVAL)
+
+
+async def _analysis(prepared: Dict[str, Any]):
+    """Async counterpart of `analysis_service.get_or_create_analysis`,
+    including the cross-worker single-flight lock."""
+    if 'markdown' in prepared:
+        return prepared['markdown']
+
+    processor = PDFProcessor()
+    analyzer = processor.analyzer
+    key = analysis_key(prepared['content_hash'], analyzer.model, analyzer.PROMPT_VERSION)
+    owner = await asyncio.to_thread(_in_app_context, acquire_lock, key, SINGLEFLIGHT_LOCK_TTL)
+    if owner is None:
+        markdown = await _wait_for_analysis(key, prepared, analyzer.model)
+        if markdown is not None:
+            return markdown
+        owner = await asyncio.to_thread(_in_app_context, acquire_lock, key, SINGLEFLIGHT_LOCK_TTL)
+
+    try:
+        try:
+            markdown = await analyzer.aanalyse(prepared['text'], pages=prepared['pages'])
+        except Exception as e:
+            # Fallback to basic analysis if OpenAI fails
+            print(f"OpenAI analysis failed: {str(e)}")
+            return processor.basic_analysis(prepared['text'])
+
+        await asyncio.to_thread(_store, prepared, markdown, analyzer)
+        return markdown
+    finally:
+        if owner is not None:
+            await asyncio.to_thread(_in_app_context, release_analysis_lock, key, owner)
+
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+async def analyze_resume(scope, send, slug: str) -> None:
+    token, error = _authenticate(scope)
+    if error:
+        return await _send_json(send, 401, {'error': error})
+
+    def load():
+        with flask_app.app_context():
+            resume = Resume.query.filter(Resume.slug == slug, *resume_criteria(token)).first()
+            return _prepare(resume) if resume else None
+
+    prepared = await asyncio.to_thread(load)
+    if prepared is None:
+        return await _send_json(send, 404, {'error': 'Not found'})
+
+    analysis_markdown = await _analysis(prepared)
+    await _send_json(send, 200, {
+        'message': 'Analysis complete',
+        'analysis_markdown': analysis_markdown
+    })
+
+
+async def generate_strategy(scope, send, resume_id: int) -> None:
+    def load():
+        with flask_app.app_context():
+            resume = Resume.query.options(db.joinedload(Resume.questionnaire)).filter_by(id=resume_id).first()
+            if resume is None:
+                return 404, None, None
+            if not resume.questionnaire:
+                return 400, None, None
+            return 200, _prepare(resume), StrategyGenerator.questionnaire_to_dict(resume.questionnaire)
+
+    status, prepared, questionnaire = await asyncio.to_thread(load)
+    if status == 404:
+        return await _send_json(send, 404, {'error': 'Not found'})
+    if status == 400:
+        return await _send_json(send, 400, {'error': 'Questionnaire not found for this resume'})
+
+    analysis = await _analysis(prepared)
+    strategy = await StrategyGenerator().agenerate(analysis, questionnaire)
+    await _send_json(send, 200, {'strategy': strategy})
+
+
+def _cors_headers(scope):
+    request_headers = Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope.get('headers', [])])
+    return [(k.lower().encode('latin-1'), v.encode('latin-1'))
+            for k, v in get_cors_headers(CORS_OPTIONS, request_headers, scope['method']).items(multi=True)]
+
+
+async def _observed(route: str, handler, scope, send, *args) -> None:
+    """Run a native route with what Flask routes get from `CORS(app)` and
+    `metrics`: CORS headers, the request histogram and ``Server-Timing``."""
+    status = {'code': 500}
+    started = time.perf_counter()
+
+    with native_request_timing() as timings:
+        async def capture(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+                headers = list(message.get('headers', [])) + _cors_headers(scope)
+                if SERVER_TIMING:
+                    elapsed = time.perf_counter() - started
+                    headers.append((b'server-timing', server_timing_header(timings, elapsed).encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await handler(scope, capture, *args)
+        finally:
+            REQUEST_SECONDS.labels(scope['method'], route, str(status['code'])).observe(time.perf_counter() - started)
+
+
+# ---------------------------------------------------------------------------
+# ASGI application
+# ---------------------------------------------------------------------------
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                start_warm_up()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] == 'http' and scope['method'] == 'POST':
+        match = ANALYZE_PATH.match(scope['path'])
+        query = scope.get('query_string', b'').decode('latin-1')
+        wants_job = re.search(r'(^|&)async=(1|true)(&|$)', query) or \
+            'respond-async' in _header(scope, b'prefer')
+        if match and not wants_job:
+            return await _observed('/api/resumes/<string:slug>/analyze', analyze_resume, scope, send, match['slug'])
+
+        match = STRATEGY_PATH.match(scope['path'])
+        if match:
+            return await _observed('/api/strategies/<int:resume_id>', generate_strategy, scope, send,
+                                   int(match['resume_id']))
+
+    await wsgi_app(scope, receive, send)
@@ -2,14 +2,22 @@
 import os, jwt, datetime
 from flask import request, g, jsonify
 from functools import wraps
+from models import db, Resume, BatchItem
 
 JWT_SECRET = os.environ.get('JWT_SECRET', 'change-me')
 EXP_MIN = int(os.environ.get('JWT_EXP_MIN', 15))
 
 
-def create_token(user_id):
+def create_token(user_id, resume_ids=(), batch_ids=()):
+    """Token for the resumes (and batches) one upload request created.
+
+    Tokens are handed out to whoever uploads with an email address, without
+    proving that they own it, so a token never opens the rest of the account.
+    """
     payload = {
         'user_id': user_id,
+        'resume_ids': list(resume_ids),
+        'batch_ids': list(batch_ids),
         'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=EXP_MIN)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
@@ -19,6 +27,21 @@ def decode_token(token):
     return jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
 
 
+def resume_criteria(payload):
+    """Filter criteria for the resumes the token *payload* may access: its own
+    resumes and those of its batches."""
+    batch_resumes = db.select(BatchItem.resume_id).where(BatchItem.batch_id.in_(payload.get('batch_ids', [])))
+    return [
+        Resume.user_id == payload['user_id'],
+        db.or_(Resume.id.in_(payload.get('resume_ids', [])), Resume.id.in_(batch_resumes)),
+    ]
+
+
+def token_resumes():
+    """`resume_criteria` of the current request's token."""
+    return resume_criteria(g.token)
+
+
 def login_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -29,6 +52,7 @@ def login_required(fn):
         try:
             payload = decode_token(token)
             g.user_id = payload['user_id']
+            g.token = payload
         except Exception:
             return jsonify({'error': 'Invalid or expired token'}), 401
         return fn(*args, **kwargs)
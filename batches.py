@@ -0,0 +1,157 @@
+"""Bulk resume analysis.
+
+A batch is created from a multi-file upload and/or zip archives of PDFs.  The
+files are saved and one `Resume` plus one ``batch_analyze`` job is created per
+PDF; the batch job pool (see `jobs.py`) then extracts and analyses them with
+bounded concurrency, each OpenAI call waiting on the process-wide RPM/TPM
+limiter (see `rate_limiter.py`).  Progress is reported per item from the
+status of its job.
+
+Configuration (environment variables):
+
+``BATCH_MAX_FILES``     PDFs accepted per batch
+``BATCH_MAX_FILE_MB``   size limit of a single PDF inside a zip
+"""
+import os
+import uuid
+import zipfile
+from typing import Dict, IO, Iterable, Iterator, List, Tuple
+
+from models import db, AnalysisBatch, BatchItem, Resume, User
+from upload_store import PDF_HEADER_WINDOW, NotAPDF, StoredBlob, check_pdf_header, store_bytes, remove_blob
+from jobs import enqueue_jobs, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 500))
+BATCH_MAX_FILE_BYTES = int(float(os.environ.get('BATCH_MAX_FILE_MB', 16)) * 1024 * 1024)
+
+
+class BatchError(ValueError):
+    """The upload cannot be turned into a batch (empty, too many files, ...)."""
+
+
+def _is_pdf(name: str) -> bool:
+    return name.lower().endswith('.pdf')
+
+
+def _checked(name: str, data: bytes) -> Tuple[str, bytes | None, str | None]:
+    """Refuse files named ``.pdf`` that do not start like one."""
+    try:
+        check_pdf_header(data[:PDF_HEADER_WINDOW])
+    except NotAPDF as e:
+        return name, None, str(e)
+    return name, data, None
+
+
+def iter_pdfs(uploads: Iterable[Tuple[str, IO[bytes]]]) -> Iterator[Tuple[str, bytes | None, str | None]]:
+    """Yield ``(name, data, error)`` for every PDF in *uploads*.
+
+    Zip archives are expanded; entries that are not named ``.pdf`` are
+    skipped, those that are too large or lack the PDF header are yielded with
+    an error instead of data.
+    """
+    for name, stream in uploads:
+        if name.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(stream)
+            except zipfile.BadZipFile:
+                yield name, None, 'Not a valid zip archive'
+                continue
+            with archive:
+                for info in archive.infolist():
+                    base = os.path.basename(info.filename)
+                    # Skip directories and macOS resource forks ("__MACOSX/._cv.pdf")
+                    if info.is_dir() or not _is_pdf(base) or base.startswith('._'):
+                        continue
+                    if info.file_size > BATCH_MAX_FILE_BYTES:
+                        yield info.filename, None, 'File too large'
+                        continue
+                    yield _checked(info.filename, archive.read(info))
+        elif _is_pdf(name):
+            yield _checked(name, stream.read())
+        else:
+            yield name, None, 'Only PDF and zip files are accepted'
+
+
+def create_batch(user: User, uploads: Iterable[Tuple[str, IO[bytes]]]) -> AnalysisBatch:
+    """Save the PDFs in *uploads*, create their resumes and queue the analyses."""
+    batch = AnalysisBatch(id=uuid.uuid4().hex, user_id=user.id)
+
+    items: List[BatchItem] = []
+    saved: List[StoredBlob] = []
+    try:
+        for position, (name, data, error) in enumerate(iter_pdfs(uploads)):
+            if position >= BATCH_MAX_FILES:
+                raise BatchError(f'A batch may contain at most {BATCH_MAX_FILES} PDFs')
+            item = BatchItem(batch_id=batch.id, position=position, filename=name[:255], error=error)
+            if data is not None:
+                # Content-addressed: duplicates in (or across) batches share one
+                # blob, and its extraction and analysis
+                blob = store_bytes(data)
+                saved.append(blob)
+                item.resume = Resume(
+                    user_id=user.id,
+                    filename=blob.path,
+                    original_filename=os.path.basename(name)[:255],
+                    content_hash=blob.content_hash,
+                    slug=uuid.uuid4().hex[:16],
+                )
+            items.append(item)
+        if not items:
+            raise BatchError('No PDF files found in the upload')
+    except BatchError:
+        for blob in saved:
+            remove_blob(blob)
+        raise
+
+    batch.total = len(items)
+    db.session.add(batch)
+    db.session.add_all(items)
+    db.session.commit()
+
+    queued = [item for item in items if item.resume is not None]
+    for item, job in zip(queued, enqueue_jobs([item.resume for item in queued])):
+        item.job_id = job.id
+    db.session.commit()
+    return batch
+
+
+def item_status(item: BatchItem) -> str:
+    if item.job is None:
+        return JOB_FAILED
+    return item.job.status
+
+
+def batch_to_dict(batch: AnalysisBatch, include_items: bool = True) -> Dict:
+    items = (
+        BatchItem.query
+        .filter_by(batch_id=batch.id)
+        .options(db.joinedload(BatchItem.job), db.joinedload(BatchItem.resume))
+        .order_by(BatchItem.position)
+        .all()
+    )
+    counts = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED)}
+    for item in items:
+        counts[item_status(item)] += 1
+
+    data = {
+        'batch_id': batch.id,
+        'total': batch.total,
+        'counts': counts,
+        'completed': counts[JOB_SUCCEEDED] + counts[JOB_FAILED],
+        'done': counts[JOB_QUEUED] + counts[JOB_RUNNING] == 0,
+        'created_at': batch.created_at.isoformat() if batch.created_at else None,
+    }
+    if include_items:
+        data['items'] = [
+            {
+                'position': item.position,
+                'filename': item.filename,
+                'resume_slug': item.resume.slug if item.resume else None,
+                'job_id': item.job_id,
+                'status': item_status(item),
+                'attempts': item.job.attempts if item.job else 0,
+                'error': item.error or (item.job.error if item.job and item.job.status == JOB_FAILED else None),
+            }
+            for item in items
+        ]
+    return data
@@ -0,0 +1,163 @@
+"""Concurrent upload + questionnaire writes against SQLite.
+
+Simulates ``--workers`` gunicorn worker processes, each running
+``--threads`` request threads, that upload a small resume and submit its
+questionnaire ``--iterations`` times through the Flask app, and counts the
+requests that failed (e.g. "database is locked").  Runs twice on fresh
+database files:
+
+* ``baseline``: rollback journal and Python's default 5 s lock timeout, as
+  before `database.py`;
+* ``tuned``: the default settings (WAL, busy timeout, synchronous=NORMAL).
+
+Usage::
+
+    python benchmarks/db_concurrency.py --workers 4 --threads 4 --iterations 25
+
+Prints a JSON report with throughput, latency percentiles and errors per mode.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    'baseline': {'SQLITE_WAL': '0', 'SQLITE_BUSY_TIMEOUT_MS': '5000', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'tuned': {},
+}
+
+
+def _pdf() -> bytes:
+    import fitz
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "Jane Doe\nPython developer, 5 years of experience\nDocker, SQL")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _worker(index, threads, iterations, queue):
+    import io
+    from app import app
+
+    app.testing = True
+    pdf = _pdf()
+    latencies, errors = [], Counter()
+
+    def run(thread):
+        client = app.test_client()
+        for i in range(iterations):
+            started = time.perf_counter()
+            try:
+                r = client.post('/api/resumes/upload', data={
+                    'email': f'user-{index}-{thread}-{i}@example.com',
+                    'resume': (io.BytesIO(pdf), f'cv-{index}-{thread}-{i}.pdf'),
+                }, content_type='multipart/form-data')
+                if r.status_code != 200:
+                    errors[f'upload {r.status_code}'] += 1
+                    continue
+                with app.app_context():
+                    from models import Resume
+                    resume_id = Resume.query.filter_by(slug=r.get_json()['resume_slug']).one().id
+                r = client.post(f'/api/questionnaires/{resume_id}', json={
+                    'current_status': 'employed', 'job_type': 'full-time',
+                    'salary_expectation': '60000', 'preferred_location': 'Berlin',
+                })
+                if r.status_code != 200:
+                    errors[f'questionnaire {r.status_code}'] += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors[str(e).split('\n')[0][:80]] += 1
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    queue.put((latencies, dict(errors)))
+
+
+def _run(mode, workers, threads, iterations):
+    """Run one mode; called in a fresh interpreter with its env applied."""
+    from app import init_db
+    init_db()
+
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    started = time.perf_counter()
+    procs = [ctx.Process(target=_worker, args=(i, threads, iterations, queue)) for i in range(workers)]
+    for p in procs:
+        p.start()
+    results = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for lat, _ in results for l in lat)
+    errors = Counter()
+    for _, errs in results:
+        errors.update(errs)
+    total = workers * threads * iterations
+    return {
+        'mode': mode,
+        'requests': total * 2,
+        'succeeded': len(latencies),
+        'failed': total - len(latencies),
+        'errors': dict(errors),
+        'seconds': round(elapsed, 2),
+        'pairs_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=25)
+    parser.add_argument('--modes', default='baseline,tuned')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(_run(args.run, args.workers, args.threads, args.iterations)))
+        return
+
+    report = []
+    for mode in args.modes.split(','):
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                ANALYSIS_CACHE_PATH=os.path.join(workdir, 'cache.db'),
+                PHOTO_ANALYZER_WARMUP='0',
+                **MODES[mode],
+            )
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run', mode,
+                 '--workers', str(args.workers), '--threads', str(args.threads),
+                 '--iterations', str(args.iterations)],
+                cwd=workdir, env=env, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                sys.stderr.write(proc.stderr)
+                raise SystemExit(f"{mode} run failed")
+            report.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
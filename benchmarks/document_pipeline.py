@@ -0,0 +1,301 @@
+"""Time and peak memory of the per-document steps on a synthetic corpus.
+
+Generates resumes with PyMuPDF in English, German and Chinese, of 1 to 50
+pages, each with a photo on the first page and further images every few
+pages.  For each document it measures:
+
+* ``extract_text``: `PDFProcessor.extract_text` (with the configured engine,
+  including the process pool for long documents);
+* ``basic_analysis``: `PDFProcessor.basic_analysis` of the extracted text;
+* ``extract_profile_picture``: `PDFProcessor.extract_profile_picture`;
+* ``render_report``: the Markdown to PDF rendering behind ``send-pdf`` and
+  ``report.pdf`` (`report_renderer`), bypassing its cache.
+
+Times are the median, min and max of ``--repeat`` runs after one warm-up;
+``peak_kib`` is the peak of Python allocations during one more run
+(tracemalloc; MuPDF's and reportlab's C allocations are not included, the
+process high-water mark is reported as ``max_rss_mib``).
+
+Usage::
+
+    python benchmarks/document_pipeline.py --output before.json
+    # ... change something ...
+    python benchmarks/document_pipeline.py --output after.json --compare before.json
+
+Prints a JSON report on stdout (progress and log lines go to stderr).  With ``--compare`` it also lists the steps whose median
+got slower than the baseline by more than ``--threshold`` (and at least
+`MIN_REGRESSION_MS`) and exits with status 1 if there are any.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+import fitz  # noqa: E402
+
+from pdf_processor import PDFProcessor  # noqa: E402
+from report_renderer import get_renderer  # noqa: E402
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+TEXTS = {
+    'en': {
+        'font': 'helv',
+        'name': 'Jane Doe, Senior Software Engineer',
+        'sections': ['Profile', 'Experience', 'Education', 'Skills', 'Languages'],
+        'lines': [
+            '03/2018 - present  Backend Developer, ACME Ltd, London',
+            'Built microservices with Python, Django and PostgreSQL on Kubernetes',
+            'CI/CD with GitHub Actions and Terraform; monitoring with Prometheus',
+            'Jan 2015 - Feb 2018  Full-stack developer, Foo Inc, Manchester',
+            'React, TypeScript, Node.js and REST APIs; data analysis with Pandas',
+            'Led a team of 5 engineers using Scrum and Jira',
+            'B.Sc. Computer Science, University of Leeds, 2010 - 2014',
+            'English (native), German (fluent), Spanish (basic)',
+        ],
+    },
+    'de': {
+        'font': 'helv',
+        'name': 'Jana Müller, Senior Software-Entwicklerin',
+        'sections': ['Profil', 'Berufserfahrung', 'Ausbildung', 'Kenntnisse', 'Sprachen'],
+        'lines': [
+            '03/2018 - heute  Backend Developer, ACME GmbH, München',
+            'Entwicklung von Microservices mit Spring Boot, Kafka und PostgreSQL',
+            'CI/CD mit GitLab CI, Terraform und Ansible; Monitoring mit Grafana',
+            'Jan 2015 - Feb 2018  Full-Stack-Entwickler, Foo AG, Berlin',
+            'Vue.js, TypeScript, Node.js, REST APIs, SAP S/4HANA Integration',
+            'Führung eines Teams von 5 Entwicklern, agile Methoden (Scrum)',
+            'B.Sc. Informatik, Technische Universität München, 2010 - 2014',
+            'Deutsch (Muttersprache), Englisch (verhandlungssicher)',
+        ],
+    },
+    'cjk': {
+        'font': 'china-s',
+        'name': '张伟 高级软件工程师',
+        'sections': ['个人简介', '工作经历', '教育背景', '专业技能', '语言能力'],
+        'lines': [
+            '2018年3月 - 至今  后端开发工程师 北京某科技有限公司',
+            '使用 Python、Django 和 PostgreSQL 开发微服务，部署于 Kubernetes',
+            '负责 CI/CD 流程（GitLab CI、Terraform），使用 Prometheus 监控',
+            '2015年1月 - 2018年2月  全栈开发工程师 上海某网络公司',
+            '前端 React、TypeScript，后端 Node.js 与 REST API 设计',
+            '带领 5 人团队，采用 Scrum 敏捷开发',
+            '2010 - 2014  清华大学 计算机科学与技术 学士',
+            '中文（母语），英语（流利），日语（基础）',
+        ],
+    },
+}
+
+DEFAULT_PAGES = (1, 2, 10, 50)
+IMAGE_EVERY_PAGES = 5
+# Slowdowns smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_MS = 0.5
+
+
+def _image(rng: random.Random, width: int = 240, height: int = 300) -> bytes:
+    """A PNG with a few coloured blocks (a stand-in for a photo)."""
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pix.set_rect(pix.irect, tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(12):
+        x, y = rng.randrange(width - 20), rng.randrange(height - 20)
+        pix.set_rect(fitz.IRect(x, y, x + rng.randint(10, width - x), y + rng.randint(10, height - y)),
+                     tuple(rng.randrange(256) for _ in range(3)))
+    return pix.tobytes('png')
+
+
+def _page_lines(lang: str, page: int, rng: random.Random):
+    text = TEXTS[lang]
+    lines = [text['name'] if page == 0 else f"{text['name']} - {page + 1}", '']
+    for section in text['sections']:
+        lines.append(section)
+        lines.extend(rng.sample(text['lines'], 4))
+        lines.append('')
+    return lines
+
+
+def make_resume(lang: str, pages: int, seed: int = 0) -> bytes:
+    """A synthetic resume of *pages* pages in *lang* (``en``, ``de``, ``cjk``)."""
+    rng = random.Random(f"{lang}-{pages}-{seed}")
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), '\n'.join(_page_lines(lang, number, rng)),
+                         fontname=TEXTS[lang]['font'], fontsize=10)
+        if number == 0:
+            page.insert_image(fitz.Rect(430, 50, 530, 175), stream=_image(rng))
+        elif number % IMAGE_EVERY_PAGES == 0:
+            page.insert_image(fitz.Rect(72, 600, 272, 750), stream=_image(rng, 400, 300))
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def build_corpus(directory: str, pages_list, langs):
+    """Write the corpus to *directory*; returns one dict per document."""
+    corpus = []
+    for lang in langs:
+        for pages in pages_list:
+            path = os.path.join(directory, f"{lang}-{pages:02d}p.pdf")
+            data = make_resume(lang, pages)
+            with open(path, 'wb') as f:
+                f.write(data)
+            corpus.append({'document': os.path.basename(path), 'path': path, 'lang': lang,
+                           'pages': pages, 'bytes': len(data)})
+    return corpus
+
+
+def analysis_markdown(text: str) -> str:
+    """Markdown shaped like an OpenAI analysis, built from the resume *text*."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    sections = ['## 1. Summary', '## 2. Strengths', '## 3. Areas to improve', '## 4. Recommendations']
+    per_section = max(1, len(lines) // len(sections))
+    out = []
+    for i, heading in enumerate(sections):
+        out.extend([heading, ''])
+        chunk = lines[i * per_section:(i + 1) * per_section]
+        out.append(' '.join(chunk[:3]))
+        out.extend(f"- **{line}**" if j % 4 == 0 else f"- {line}" for j, line in enumerate(chunk[3:]))
+        out.append('')
+    return '\n'.join(out)
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def _measure(fn, repeat: int):
+    fn()  # warm-up: font registration, process pool, lazy imports
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'min_ms': round(min(samples), 3),
+        'max_ms': round(max(samples), 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run(corpus, repeat: int, engine: str | None = None):
+    processor = PDFProcessor(engine=engine)
+    renderer = get_renderer()
+    results = []
+    for doc in corpus:
+        text = processor.extract_text(doc['path'])
+        markdown = analysis_markdown(text)
+        steps = {
+            'extract_text': lambda: processor.extract_text(doc['path']),
+            'basic_analysis': lambda: processor.basic_analysis(text),
+            'extract_profile_picture': lambda: processor.extract_profile_picture(doc['path']),
+            'render_report': lambda: renderer.render(markdown),
+        }
+        for step, fn in steps.items():
+            result = {key: doc[key] for key in ('document', 'lang', 'pages', 'bytes')}
+            result.update(step=step, **_measure(fn, repeat))
+            results.append(result)
+            print(f"{doc['document']:>12} {step:<24} {result['p50_ms']:>10.2f} ms", file=sys.stderr)
+    return results
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def compare(report, baseline, threshold: float):
+    """Steps whose median is more than *threshold* (0.2 = 20 %) slower than in *baseline*."""
+    before = {(r['document'], r['step']): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        old = before.get((result['document'], result['step']))
+        if old is None or not old['p50_ms']:
+            continue
+        ratio = result['p50_ms'] / old['p50_ms']
+        if ratio > 1 + threshold and result['p50_ms'] - old['p50_ms'] > MIN_REGRESSION_MS:
+            regressions.append({
+                'document': result['document'], 'step': result['step'],
+                'baseline_ms': old['p50_ms'], 'p50_ms': result['p50_ms'], 'ratio': round(ratio, 2),
+                'baseline_peak_kib': old['peak_kib'], 'peak_kib': result['peak_kib'],
+            })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=list(DEFAULT_PAGES))
+    parser.add_argument('--langs', nargs='+', choices=sorted(TEXTS), default=['en', 'de', 'cjk'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--engine', help='PDF text engine (default: PDF_TEXT_ENGINE or auto)')
+    parser.add_argument('--corpus-dir', help='keep the generated PDFs in this directory')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON report of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown of the median that counts as a regression (default 0.2)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        directory = args.corpus_dir or workdir
+        os.makedirs(directory, exist_ok=True)
+        # stdout is the JSON report; the app's log lines go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            corpus = build_corpus(directory, args.pages, args.langs)
+            results = run(corpus, args.repeat, args.engine)
+
+    report = {
+        'commit': _git_commit(),
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pymupdf': fitz.VersionBind,
+        'engine': args.engine or os.environ.get('PDF_TEXT_ENGINE', 'auto'),
+        'repeat': args.repeat,
+        'max_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'results': results,
+    }
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['baseline_commit'] = baseline.get('commit')
+        report['regressions'] = compare(report, baseline, args.threshold)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+    if report.get('regressions'):
+        raise SystemExit(1)
+    return report
+
+
+if __name__ == '__main__':
+    main()
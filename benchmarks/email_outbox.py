@@ -0,0 +1,111 @@
+"""SMTP delivery: one connection per message vs. the outbox's pooled session.
+
+Starts a local SMTP stand-in (``aiosmtpd``, ``pip install aiosmtpd``) that
+adds ``--handshake-ms`` to every new connection, the way a remote server's
+TCP/TLS setup and login do, and delivers ``--messages`` emails twice:
+
+* ``per_message``: connect, EHLO, send, quit for every message (what send-pdf
+  used to do inside the request);
+* ``pooled``: through one `outbox.SMTPSession`, as the outbox sender does.
+
+Usage::
+
+    python benchmarks/email_outbox.py --messages 50 --handshake-ms 300
+
+Prints a JSON report with the wall time and connections used by each mode.
+The same stand-in can serve the app for offline testing::
+
+    python -m aiosmtpd -n -l localhost:8025
+    SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=0 python app.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import smtplib
+import sys
+import time
+from email import policy
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from outbox import SMTPSession  # noqa: E402
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    raise SystemExit("This benchmark needs aiosmtpd: pip install aiosmtpd")
+
+
+class SlowHandshakeHandler:
+    def __init__(self, handshake: float):
+        self.handshake = handshake
+        self.connections = 0
+        self.messages = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        await asyncio.sleep(self.handshake)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return '250 OK'
+
+
+def _message(i: int) -> bytes:
+    msg = EmailMessage()
+    msg['From'] = 'reports@example.com'
+    msg['To'] = f'user{i}@example.com'
+    msg['Subject'] = 'Your Resume Analysis Report'
+    msg.set_content('Please find attached your resume analysis PDF.')
+    msg.add_attachment(os.urandom(30_000), maintype='application', subtype='pdf', filename='analysis.pdf')
+    return msg.as_bytes(policy=policy.SMTP)
+
+
+def _per_message(host, port, messages):
+    for i, data in enumerate(messages):
+        with smtplib.SMTP(host, port) as server:
+            server.sendmail('reports@example.com', [f'user{i}@example.com'], data)
+
+
+def _pooled(host, port, messages):
+    session = SMTPSession(host, port, starttls=False)
+    for i, data in enumerate(messages):
+        session.send('reports@example.com', [f'user{i}@example.com'], data)
+    session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--handshake-ms', type=float, default=300)
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    host = '127.0.0.1'
+    messages = [_message(i) for i in range(args.messages)]
+    report = {'messages': args.messages, 'handshake_ms': args.handshake_ms}
+    for name, deliver in (('per_message', _per_message), ('pooled', _pooled)):
+        handler = SlowHandshakeHandler(args.handshake_ms / 1000)
+        controller = Controller(handler, hostname=host, port=args.port)
+        controller.start()
+        try:
+            started = time.perf_counter()
+            deliver(host, args.port, messages)
+            elapsed = time.perf_counter() - started
+        finally:
+            controller.stop()
+        report[name] = {
+            'seconds': round(elapsed, 3),
+            'connections': handler.connections,
+            'delivered': handler.messages,
+            'ms_per_message': round(elapsed * 1000 / max(1, args.messages), 1),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
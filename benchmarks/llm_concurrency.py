@@ -0,0 +1,141 @@
+"""Concurrency per worker: blocking vs asyncio OpenAI path.
+
+Starts a local stand-in for the OpenAI Chat Completions API that answers after
+a fixed delay and counts how many requests it holds at once, then fires the
+same number of analyses through
+
+* ``sync``  – `OpenAIResumeAnalyzer.analyse` on N threads, i.e. what one
+  gunicorn worker with N sync threads can keep in flight, and
+* ``async`` – `OpenAIResumeAnalyzer.aanalyse` on a single event loop, i.e.
+  one uvicorn worker serving `asgi:app`.
+
+Usage::
+
+    python benchmarks/llm_concurrency.py --requests 200 --latency 2 --threads 1
+
+Prints a JSON report with wall time, throughput and peak in-flight requests.
+Requires ``uvicorn`` (already a dependency of the ASGI entry point).
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+class FakeOpenAI:
+    """Minimal ASGI app mimicking ``POST /v1/chat/completions``."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        while (await receive()).get('more_body'):
+            pass
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        body = json.dumps({
+            'id': 'chatcmpl-bench',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'gpt-3.5-turbo',
+            'choices': [{
+                'index': 0,
+                'finish_reason': 'stop',
+                'message': {'role': 'assistant', 'content': '## 1. Benchmark\n- ok'},
+            }],
+            'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15},
+        }).encode()
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_server(fake: FakeOpenAI, port: int) -> None:
+    import uvicorn
+
+    config = uvicorn.Config(fake, host='127.0.0.1', port=port, log_level='error',
+                            backlog=4096, limit_concurrency=None)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+def _analyzer():
+    from analysis_cache import AnalysisCache
+    from openai_analyzer import OpenAIResumeAnalyzer
+
+    return OpenAIResumeAnalyzer(cache=AnalysisCache(enabled=False))
+
+
+def run_sync(requests: int, threads: int) -> float:
+    analyzer = _analyzer()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: analyzer.analyse(f"resume {i}"), range(requests)))
+    return time.perf_counter() - started
+
+
+def run_async(requests: int) -> float:
+    analyzer = _analyzer()
+
+    async def main():
+        await asyncio.gather(*(analyzer.aanalyse(f"resume {i}") for i in range(requests)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=2.0, help='simulated OpenAI latency (s)')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='threads of the sync worker (gunicorn sync worker = 1)')
+    args = parser.parse_args(argv)
+
+    fake = FakeOpenAI(args.latency)
+    port = _free_port()
+    _start_server(fake, port)
+    os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{port}/v1'
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    os.environ.setdefault('OPENAI_MAX_CONNECTIONS', str(max(args.threads, 1)))
+
+    report = {'requests': args.requests, 'latency_s': args.latency, 'results': {}}
+    for mode, run in (('sync', lambda: run_sync(args.requests, args.threads)),
+                      ('async', lambda: run_async(args.requests))):
+        fake.peak = 0
+        elapsed = run()
+        report['results'][mode] = {
+            'wall_s': round(elapsed, 3),
+            'throughput_rps': round(args.requests / elapsed, 2),
+            'peak_in_flight': fake.peak,
+        }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Offline skill matching speed vs. taxonomy size.
+
+Matches a synthetic German/English resume against the shipped taxonomy and
+against the taxonomy padded with generated terms up to ``--terms`` entries,
+to show that the per-resume cost depends on the resume, not the term count.
+
+Usage::
+
+    python benchmarks/skills_matcher.py --terms 10000 --repeat 200
+
+Prints a JSON report with build time and per-match latency percentiles.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from skills_engine import DEFAULT_TAXONOMY_PATH, SkillMatcher, parse_experience  # noqa: E402
+
+RESUME = """Lebenslauf
+Senior Software-Entwicklerin
+Profil
+Über 8 Jahre Berufserfahrung in der Softwareentwicklung mit Python, Java und Go.
+Berufserfahrung
+03/2018 – heute  Backend Developer, ACME GmbH, München
+- Entwicklung von Microservices mit Spring Boot, Kafka und PostgreSQL auf Kubernetes
+- CI/CD mit GitLab CI, Terraform und Ansible; Monitoring mit Prometheus und Grafana
+- Führung eines Teams von 5 Entwicklern, agile Methoden (Scrum, Jira, Confluence)
+Jan 2015 - Feb 2018 Full-Stack-Entwickler, Foo AG, Berlin
+- Vue.js, TypeScript, Node.js, REST APIs, SAP S/4HANA Integration
+- Datenanalyse mit Pandas, Power BI und Excel
+Ausbildung
+2010 - 2014 B.Sc. Informatik, Technische Universität München
+Kenntnisse
+Docker, AWS, Azure, Linux, Git, SQL, MongoDB, Redis, React, Angular
+Teamfähigkeit, Kommunikationsstärke, analytisches Denken, Eigeninitiative
+Sprachen
+Deutsch (Muttersprache), Englisch (verhandlungssicher), Spanisch (Grundkenntnisse)
+"""
+
+
+def _entries(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data['skills'] + data['titles']
+
+
+def _synthetic(count, seed=0):
+    rng = random.Random(seed)
+    syllables = ['ka', 'lo', 'mi', 'tra', 'vex', 'nor', 'zen', 'qui', 'bel', 'dor', 'sta', 'fen']
+    for i in range(count):
+        word = ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        yield {'name': f"{word.title()} {i}", 'type': 'technical', 'category': 'Synthetic',
+               'synonyms': [f"{word}-{i}", f"{word} Suite {i}"]}
+
+
+def _measure(matcher, text, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        matcher.match(text)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--terms', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--taxonomy', default=DEFAULT_TAXONOMY_PATH)
+    args = parser.parse_args(argv)
+
+    base = _entries(args.taxonomy)
+    report = {'resume_chars': len(RESUME), 'results': {}}
+    for label, entries in (('shipped', base),
+                           ('padded', base + list(_synthetic(max(0, args.terms - len(base)))))):
+        started = time.perf_counter()
+        matcher = SkillMatcher(entries)
+        build_ms = (time.perf_counter() - started) * 1000
+        result = matcher.match(RESUME)
+        report['results'][label] = {
+            'terms': len(matcher.terms),
+            'forms': matcher.form_count,
+            'build_ms': round(build_ms, 1),
+            'tokens': result.token_count,
+            'matches': len(result.matches),
+            'match': _measure(matcher, RESUME, args.repeat),
+        }
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        parse_experience(RESUME)
+    report['experience_ms'] = round((time.perf_counter() - started) * 1000 / args.repeat, 3)
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
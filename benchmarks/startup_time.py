@@ -0,0 +1,132 @@
+"""Worker boot time: per-module import cost and a budget check.
+
+Imports the entry point (``asgi`` by default) in fresh interpreters with
+``python -X importtime``, reports the slowest modules and top-level packages,
+and checks that none of the heavy optional dependencies (OpenAI SDK, Stripe,
+reportlab, PDF engines, ML stacks) is imported at boot: they must load on
+first use.
+
+Usage::
+
+    python benchmarks/startup_time.py --budget-ms 1500 --repeat 5
+
+Prints a JSON report and exits with status 1 if the median boot time is over
+the budget (``STARTUP_BUDGET_MS``) or a heavy module was imported; the
+``startup-time`` GitHub Actions workflow runs it as a regression check.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Imported on first use only; see openai_client.py, payment_processor.py,
+# prompt_compactor.py, pdf_engines.py and photo_analyzer.py
+LAZY_MODULES = (
+    'openai', 'httpx', 'stripe', 'reportlab', 'PyPDF2', 'fitz', 'tiktoken',
+    'numpy', 'PIL', 'deepface', 'tensorflow', 'boto3',
+)
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def _boot(target):
+    """Import *target* in a fresh interpreter; returns (wall ms, importtime log, lazy modules loaded)."""
+    code = (
+        "import sys, json; sys.path.insert(0, %r); import %s; "
+        "print(json.dumps([m for m in %r if m in sys.modules]))" % (ROOT, target, LAZY_MODULES)
+    )
+    env = dict(os.environ, PHOTO_ANALYZER_WARMUP='0')
+    # Run from an empty directory so the boot does not depend on local files
+    with tempfile.TemporaryDirectory() as cwd:
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=cwd, env=env, capture_output=True, text=True,
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"Importing {target} failed")
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    return elapsed, proc.stderr, loaded
+
+
+def _parse(log):
+    """Self and cumulative microseconds per module from an importtime log."""
+    modules = []
+    for line in log.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                'module': name,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'depth': len(indent) // 2,
+            })
+    return modules
+
+
+def report(target='asgi', repeat=3, top=15):
+    runs = [_boot(target) for _ in range(repeat)]
+    wall = [elapsed for elapsed, _, _ in runs]
+    # The last run has warm OS caches, like a restarted worker
+    modules = _parse(runs[-1][1])
+
+    packages = {}
+    for m in modules:
+        package = m['module'].split('.')[0]
+        packages[package] = packages.get(package, 0) + m['self_ms']
+
+    return {
+        'target': target,
+        'boot_ms': {
+            'median': round(statistics.median(wall), 1),
+            'min': round(min(wall), 1),
+            'max': round(max(wall), 1),
+        },
+        'imported_ms': round(sum(m['self_ms'] for m in modules), 1),
+        'slowest_modules': [
+            {k: m[k] for k in ('module', 'self_ms', 'cumulative_ms')}
+            for m in sorted(modules, key=lambda m: m['self_ms'], reverse=True)[:top]
+        ],
+        'packages_ms': dict(
+            (name, round(ms, 1))
+            for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ),
+        'lazy_modules_loaded': sorted(set(runs[-1][2])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--target', default='asgi', help='module to import (default: asgi)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('STARTUP_BUDGET_MS', 1500)))
+    args = parser.parse_args()
+
+    result = report(args.target, max(1, args.repeat), args.top)
+    result['budget_ms'] = args.budget_ms
+    failures = []
+    if result['boot_ms']['median'] > args.budget_ms:
+        failures.append(f"median boot {result['boot_ms']['median']} ms exceeds the {args.budget_ms:g} ms budget")
+    if result['lazy_modules_loaded']:
+        failures.append(f"imported at boot: {', '.join(result['lazy_modules_loaded'])}")
+    result['ok'] = not failures
+
+    print(json.dumps(result, indent=2))
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
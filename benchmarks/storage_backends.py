@@ -0,0 +1,170 @@
+"""Upload and download resumes through each storage backend.
+
+Runs the app against a fresh database and storage per mode, uploads
+``--files`` PDFs of about ``--size-mb`` each, then downloads every file from
+``GET /api/resumes/<slug>/file`` in full and as a Range request and checks the
+bytes.  Modes:
+
+* ``local``: files under ``uploads/``, sent by the worker;
+* ``local_accel``: same, with ``STORAGE_ACCEL_REDIRECT`` (only the headers
+  are checked, there is no nginx in front);
+* ``s3_redirect`` / ``s3_proxy``: an S3-compatible bucket, e.g. a local
+  MinIO (``docker run -p 9000:9000 minio/minio server /data``) or
+  ``moto_server -p 9000``; only run with ``--s3-endpoint``.
+
+Usage::
+
+    python benchmarks/storage_backends.py --files 20 --size-mb 2 \\
+        --s3-endpoint http://localhost:9000 --s3-key minioadmin --s3-secret minioadmin
+
+Prints a JSON report with upload and download times per mode.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+
+def _pdf(size: int, seed: int) -> bytes:
+    import fitz
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), f"Resume {seed}\nPython developer, 5 years of experience\nDocker, SQL")
+    # Incompressible padding to reach the target size
+    doc.embfile_add('portfolio.bin', os.urandom(size))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _fetch(client, url, headers=None):
+    """GET through the app; follows a redirect to the bucket."""
+    r = client.get(url, headers=headers or {})
+    if r.status_code in (301, 302, 303, 307):
+        request = urllib.request.Request(r.headers['Location'], headers=headers or {})
+        with urllib.request.urlopen(request) as remote:
+            return remote.status, remote.read(), dict(remote.headers)
+    return r.status_code, r.get_data(), dict(r.headers)
+
+
+def _run(mode, files, size):
+    """Run one mode; called in a fresh interpreter with its env applied."""
+    from app import app, init_db
+    init_db()
+    if mode.startswith('s3'):
+        from storage import get_storage
+        storage = get_storage()
+        try:
+            storage.client.create_bucket(Bucket=storage.bucket)
+        except Exception:
+            pass  # already exists
+
+    app.testing = True
+    client = app.test_client()
+    pdfs = [_pdf(size, i) for i in range(files)]
+
+    started = time.perf_counter()
+    uploads = []
+    for i, data in enumerate(pdfs):
+        r = client.post('/api/resumes/upload', data={
+            'email': f'storage-{i}@example.com', 'resume': (io.BytesIO(data), f'cv-{i}.pdf'),
+        }, content_type='multipart/form-data')
+        assert r.status_code == 200, r.get_data(as_text=True)
+        uploads.append(r.get_json())
+    upload_seconds = time.perf_counter() - started
+
+    errors = []
+    started = time.perf_counter()
+    for data, upload in zip(pdfs, uploads):
+        auth = {'Authorization': f"Bearer {upload['token']}"}
+        url = f"/api/resumes/{upload['resume_slug']}/file"
+        if mode == 'local_accel':
+            r = client.get(url, headers=auth)
+            if not r.headers.get('X-Accel-Redirect') or r.get_data():
+                errors.append('missing X-Accel-Redirect')
+            continue
+        status, body, _ = _fetch(client, url, auth)
+        if status != 200 or body != data:
+            errors.append(f'full download: {status}')
+        status, body, headers = _fetch(client, url, {**auth, 'Range': 'bytes=100-1099'})
+        if status != 206 or body != data[100:1100]:
+            errors.append(f'range download: {status}')
+    download_seconds = time.perf_counter() - started
+
+    total_mb = sum(len(d) for d in pdfs) / 1024 / 1024
+    return {
+        'mode': mode,
+        'files': files,
+        'total_mb': round(total_mb, 1),
+        'upload_seconds': round(upload_seconds, 3),
+        'download_seconds': round(download_seconds, 3),
+        'download_mb_per_second': round(total_mb / download_seconds, 1) if download_seconds else None,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--files', type=int, default=10)
+    parser.add_argument('--size-mb', type=float, default=1)
+    parser.add_argument('--s3-endpoint', help='S3-compatible endpoint, e.g. http://localhost:9000')
+    parser.add_argument('--s3-bucket', default='resume-analyzer-bench')
+    parser.add_argument('--s3-key', default=os.environ.get('S3_ACCESS_KEY_ID', 'minioadmin'))
+    parser.add_argument('--s3-secret', default=os.environ.get('S3_SECRET_ACCESS_KEY', 'minioadmin'))
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(_run(args.run, args.files, int(args.size_mb * 1024 * 1024))))
+        return
+
+    modes = {
+        'local': {'STORAGE_BACKEND': 'local'},
+        'local_accel': {'STORAGE_BACKEND': 'local', 'STORAGE_ACCEL_REDIRECT': '/protected-uploads/'},
+    }
+    if args.s3_endpoint:
+        s3 = {
+            'STORAGE_BACKEND': 's3', 'S3_ENDPOINT_URL': args.s3_endpoint, 'S3_BUCKET': args.s3_bucket,
+            'S3_ACCESS_KEY_ID': args.s3_key, 'S3_SECRET_ACCESS_KEY': args.s3_secret,
+            'S3_REGION': 'us-east-1', 'S3_PREFIX': f'bench-{os.getpid()}/',
+        }
+        modes['s3_redirect'] = {**s3, 'S3_SERVE': 'redirect'}
+        modes['s3_proxy'] = {**s3, 'S3_SERVE': 'proxy'}
+
+    report = []
+    for mode, settings in modes.items():
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                ANALYSIS_CACHE_PATH=os.path.join(workdir, 'cache.db'),
+                PHOTO_ANALYZER_WARMUP='0',
+                PROFILE_PICTURE_EAGER='0',
+                UPLOAD_MAX_FILE_MB=str(args.size_mb + 1),
+                MAX_UPLOAD_MB=str(int(args.size_mb) + 2),
+                **settings,
+            )
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run', mode,
+                 '--files', str(args.files), '--size-mb', str(args.size_mb)],
+                cwd=workdir, env=env, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                sys.stderr.write(proc.stderr)
+                raise SystemExit(f"{mode} run failed")
+            report.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    print(json.dumps(report, indent=2))
+    if any(r['errors'] for r in report):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,23 @@ from blueprints.resumes import resumes_bp
 from blueprints.payments import payments_bp
 from blueprints.questionnaires import questionnaires_bp
 from blueprints.strategies import strategies_bp
+from blueprints.system import system_bp
+from blueprints.jobs import jobs_bp
+from blueprints.batches import batches_bp
+from blueprints.emails import emails_bp
+from blueprints.uploads import uploads_bp
+from blueprints.metrics import metrics_bp
 
 # Register all blueprints
 blueprints = [
     resumes_bp,
     payments_bp,
     questionnaires_bp,
-    strategies_bp
+    strategies_bp,
+    system_bp,
+    jobs_bp,
+    batches_bp,
+    emails_bp,
+    uploads_bp,
+    metrics_bp
 ]
@@ -0,0 +1,61 @@
+from flask import Blueprint, request, jsonify, g, abort
+from models import db, User, AnalysisBatch
+from batches import create_batch, batch_to_dict, BatchError
+from auth_utils import create_token, login_required
+
+batches_bp = Blueprint('batches', __name__, url_prefix='/api/batches')
+
+@batches_bp.route('', methods=['POST'])
+def create():
+    """Upload many resumes at once and queue their analyses
+    ---
+    requestBody:
+      required: true
+      content:
+        multipart/form-data:
+          schema:
+            type: object
+            properties:
+              email:
+                type: string
+              resumes:
+                type: array
+                items:
+                  type: string
+                  format: binary
+                description: PDFs and/or zip archives of PDFs
+    responses:
+      202:
+        description: Batch queued; poll `GET /api/batches/<batch_id>`
+    """
+    files = [f for f in request.files.getlist('resumes') if f.filename]
+    if 'email' not in request.form or not files:
+        return jsonify({'error': 'Missing email or resume files'}), 400
+
+    user = User.query.filter_by(email=request.form['email']).first()
+    if not user:
+        user = User(email=request.form['email'])
+        db.session.add(user)
+        db.session.commit()
+
+    try:
+        batch = create_batch(user, [(f.filename, f.stream) for f in files])
+    except BatchError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+    # Only for this batch's resumes: the email is not verified
+    response = jsonify({**batch_to_dict(batch), 'token': create_token(user.id, batch_ids=[batch.id])})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/batches/{batch.id}"
+    return response
+
+@batches_bp.route('/<string:batch_id>', methods=['GET'])
+@login_required
+def get_batch(batch_id):
+    """Progress of a batch: status counts and, unless `?items=0`, the
+    status of every file."""
+    if batch_id not in g.token.get('batch_ids', []):
+        abort(404)
+    batch = AnalysisBatch.query.filter_by(id=batch_id, user_id=g.user_id).first_or_404()
+    return jsonify(batch_to_dict(batch, include_items=request.args.get('items') not in ('0', 'false')))
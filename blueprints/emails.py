@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify, g
+from models import OutboxEmail, Resume
+from outbox import email_to_dict
+from auth_utils import login_required, token_resumes
+
+emails_bp = Blueprint('emails', __name__, url_prefix='/api/emails')
+
+@emails_bp.route('/<string:email_id>', methods=['GET'])
+@login_required
+def get_email(email_id):
+    """Delivery status of a queued email: queued, sending, sent or failed."""
+    email = (
+        OutboxEmail.query
+        .join(Resume, OutboxEmail.resume_id == Resume.id)
+        .filter(OutboxEmail.id == email_id, OutboxEmail.user_id == g.user_id, *token_resumes())
+        .first_or_404()
+    )
+    return jsonify(email_to_dict(email))
@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+from models import AnalysisJob, Resume
+from jobs import job_to_dict
+from auth_utils import login_required, token_resumes
+import http_cache
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+@jobs_bp.route('/<string:job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Status of a background job; includes `result` once it succeeded."""
+    job = (
+        AnalysisJob.query
+        .join(Resume, AnalysisJob.resume_id == Resume.id)
+        .filter(AnalysisJob.id == job_id, *token_resumes())
+        .first_or_404()
+    )
+    # Polled until done; unchanged jobs get a 304 without loading the result
+    etag = http_cache.make_etag('job', job.id, job.status, job.attempts, job.analysis_id, job.finished_at)
+    return http_cache.conditional(lambda: jsonify(job_to_dict(job)), etag)
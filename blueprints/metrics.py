@@ -0,0 +1,16 @@
+import hmac
+
+from flask import Blueprint, jsonify, request
+
+from metrics import METRICS_TOKEN, metrics_response
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint (all gunicorn workers combined)."""
+    if METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+            return jsonify({'error': 'Unauthorized'}), 401
+    return metrics_response()
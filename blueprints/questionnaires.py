@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from models import db, Resume, Questionnaire
+import http_cache
 
 questionnaires_bp = Blueprint('questionnaires', __name__, url_prefix='/api/questionnaires')
 
@@ -30,10 +31,12 @@ def submit_questionnaire(resume_id):
 @questionnaires_bp.route('/<int:resume_id>', methods=['GET'])
 def get_questionnaire(resume_id):
     questionnaire = Questionnaire.query.filter_by(resume_id=resume_id).first_or_404()
-    return jsonify({
+    # Questionnaires are never edited; id and creation time identify the version
+    etag = http_cache.make_etag('questionnaire', questionnaire.id, questionnaire.created_at)
+    return http_cache.conditional(lambda: jsonify({
         'current_status': questionnaire.current_status,
         'job_type': questionnaire.job_type,
         'salary_expectation': questionnaire.salary_expectation,
         'preferred_location': questionnaire.preferred_location,
         'created_at': questionnaire.created_at.isoformat()
-    })
+    }), etag, questionnaire.created_at)
@@ -1,31 +1,75 @@
-from flask import Blueprint, request, jsonify, send_from_directory, g
-from werkzeug.utils import secure_filename
-from models import db, User, Resume
-from pdf_processor import PDFProcessor
-# from photo_analyzer import PhotoAnalyzer  # temparorily deactivated
+from flask import Blueprint, request, jsonify, send_file, g, Response, stream_with_context, abort
+from models import db, User, Resume, Questionnaire, ProfilePicture
+from analysis_service import get_or_create_analysis, latest_analysis, latest_analysis_version, stream_analysis, get_resume_document
+from jobs import enqueue_job, job_to_dict
+import profile_pictures
+import upload_store
+import http_cache
+from http_cache import make_etag
+from storage import get_storage
+from photo_analyzer import PhotoAnalyzer, PhotoAnalyzerTimeout, PhotoAnalyzerUnavailable, PHOTO_ANALYSIS_VERSION
+from report_renderer import get_report_pdf, ReportUnavailable
+from outbox import queue_email, email_to_dict
+import base64
+import io
 import os
-import smtplib
+import json
 from email.message import EmailMessage
 from datetime import datetime
-from tempfile import NamedTemporaryFile
 import uuid
-from auth_utils import create_token, login_required
-
-# Optional: simple PDF generation via reportlab
-try:
-    from reportlab.lib.pagesizes import letter
-    from reportlab.pdfgen import canvas
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_LEFT
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
+from auth_utils import create_token, login_required, token_resumes
+
 
 resumes_bp = Blueprint('resumes', __name__, url_prefix='/api/resumes')
 
+# Resume listing: page size and the fields `?fields=` may select
+RESUME_PAGE_SIZE = 20
+RESUME_PAGE_MAX = 100
+RESUME_LIST_FIELDS = ('id', 'slug', 'filename', 'upload_date', 'processed', 'has_questionnaire')
+
+# Browser cache lifetime of profile pictures; revalidated with the ETag after
+PROFILE_PICTURE_MAX_AGE = int(os.environ.get('PROFILE_PICTURE_MAX_AGE', 3600))
+
+def create_uploaded_resume(email, blob, filename):
+    """Create the resume (and if needed the user) for a stored upload and
+    extract its text.  Shared with the resumable uploads (`blueprints/uploads.py`)."""
+    # Create or get user
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        user = User(email=email)
+        db.session.add(user)
+        db.session.commit()
+
+    # Create resume record with random slug
+    slug = uuid.uuid4().hex[:16]
+    print("Generated slug:", slug)
+    resume = Resume(
+        user_id=user.id,
+        filename=blob.path,
+        original_filename=filename[:255],
+        content_hash=blob.content_hash,
+        slug=slug,
+    )
+    db.session.add(resume)
+    db.session.commit()
+
+    # Extract the text once now; analyze/send-pdf/strategies read the
+    # stored pages instead of re-parsing the PDF.  A failure here is not
+    # fatal – extraction is retried on first use.  No-op for known content.
+    try:
+        get_resume_document(resume, blob.content_hash)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Text extraction at upload failed: {str(e)}")
+
+    if profile_pictures.PROFILE_PICTURE_EAGER:
+        try:
+            profile_pictures.extract_profile_picture(resume)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Profile picture extraction at upload failed: {str(e)}")
+    return resume
+
 @resumes_bp.route('/upload', methods=['POST'])
 def upload_resume():
     """Upload a resume PDF and create a record
@@ -63,49 +107,136 @@ def upload_resume():
         return jsonify({'error': 'No selected file'}), 400
 
     if file:
-        filename = secure_filename(file.filename)
-        # Ensure the uploads directory exists (important on Render where the
-        # directory may not be present by default)
-        os.makedirs('uploads', exist_ok=True)
-        filepath = os.path.join('uploads', filename)
-        file.save(filepath)
-
-        # Create or get user
-        user = User.query.filter_by(email=email).first()
-        if not user:
-            user = User(email=email)
-            db.session.add(user)
-            db.session.commit()
-
-        # Create resume record with random slug
-        slug = uuid.uuid4().hex[:16]
-        print("Generated slug:", slug)
-        resume = Resume(user_id=user.id, filename=filename, slug=slug)
-        db.session.add(resume)
-        db.session.commit()
-
-        # Create login token (magic link could also be emailed)
-        token = create_token(user.id)
+        # Stored by content hash: identical files share one blob (and with it
+        # the extracted text and analysis), equal names no longer collide.
+        # Non-PDFs are refused from their first bytes.
+        try:
+            blob = upload_store.store_stream(file.stream, max_bytes=upload_store.UPLOAD_MAX_FILE_BYTES)
+        except upload_store.UploadRejected as e:
+            return jsonify({'error': str(e)}), e.status
+
+        resume = create_uploaded_resume(email, blob, file.filename)
+
+        # The token only opens the resume created here: the email is not
+        # verified, anyone can upload with someone else's address
+        token = create_token(resume.user_id, resume_ids=[resume.id])
         return jsonify({
             'message': 'File uploaded successfully',
-            'resume_slug': slug,
+            'resume_slug': resume.slug,
             'token': token
         })
 
     return jsonify({'error': 'Failed to upload file'}), 400
 
+@resumes_bp.route('', methods=['GET'])
+@login_required
+def list_resumes():
+    """List the resumes the token grants access to, newest first: those of
+    the upload (or batch) it was issued for
+    ---
+    parameters:
+      - in: query
+        name: limit
+        schema:
+          type: integer
+        description: page size (default 20, max 100)
+      - in: query
+        name: cursor
+        schema:
+          type: string
+        description: `next_cursor` of the previous page
+      - in: query
+        name: fields
+        schema:
+          type: string
+        description: comma-separated subset of the resume fields to return
+    responses:
+      200:
+        description: '`{"resumes": [...], "next_cursor": "..." | null}`'
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', RESUME_PAGE_SIZE)), 1), RESUME_PAGE_MAX)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    fields = list(dict.fromkeys(f for f in request.args.get('fields', '').split(',') if f)) or list(RESUME_LIST_FIELDS)
+    unknown = [f for f in fields if f not in RESUME_LIST_FIELDS]
+    if unknown:
+        return jsonify({'error': f'Unknown fields: {", ".join(unknown)}',
+                        'allowed': list(RESUME_LIST_FIELDS)}), 400
+
+    # Only the requested columns are selected (plus id for the cursor)
+    available = {
+        'slug': Resume.slug,
+        'filename': db.func.coalesce(Resume.original_filename, Resume.filename).label('filename'),
+        'upload_date': Resume.upload_date,
+        'processed': Resume.processed,
+    }
+    columns = [Resume.id] + [available[f] for f in fields if f in available]
+    if 'has_questionnaire' in fields:
+        columns.append(db.exists().where(Questionnaire.resume_id == Resume.id).label('has_questionnaire'))
+    query = db.session.query(*columns).filter(*token_resumes())
+
+    # Keyset pagination on the primary key: each page is one range scan of
+    # the (user_id, id) index, however many resumes the user has
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = query.filter(Resume.id < int(base64.urlsafe_b64decode(cursor.encode()).decode()))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    rows = query.order_by(Resume.id.desc()).limit(limit + 1).all()
+
+    resumes = []
+    for row in rows[:limit]:
+        values = row._mapping
+        resumes.append({
+            f: values[f].isoformat() if isinstance(values[f], datetime) else values[f]
+            for f in fields
+        })
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = base64.urlsafe_b64encode(str(rows[limit - 1].id).encode()).decode()
+    return jsonify({'resumes': resumes, 'next_cursor': next_cursor})
+
 @resumes_bp.route('/<string:slug>', methods=['GET'])
 @login_required
 def get_resume(slug):
-    resume = Resume.query.filter_by(slug=slug, user_id=g.user_id).first_or_404()
-    return jsonify({
-        'id': resume.id,
-        'filename': resume.filename,
-        'upload_date': resume.upload_date.isoformat(),
-        'processed': resume.processed,
-        'analysis': resume.analysis,
-        'user_email': resume.user.email if resume.user else None
-    })
+    """The resume with its newest analysis.  Polled by the results page, so
+    the ETag is computed from the row version and the newest analysis id
+    first, and unchanged resumes are answered with 304."""
+    version = db.session.execute(
+        db.select(Resume.id, Resume.updated_at, Resume.upload_date, Resume.content_hash)
+        .filter(Resume.slug == slug, *token_resumes())
+    ).first()
+    if version is None:
+        abort(404)
+    analysis_version = latest_analysis_version(version.id, version.content_hash)
+    last_modified = max(filter(None, (
+        version.updated_at or version.upload_date,
+        analysis_version.created_at if analysis_version else None,
+    )), default=None)
+    etag = make_etag('resume', version.id, last_modified, analysis_version.id if analysis_version else None)
+
+    def build():
+        resume = (
+            Resume.query.options(db.joinedload(Resume.user))
+            .filter_by(id=version.id)
+            .one()
+        )
+        artifact = latest_analysis(resume)
+        return jsonify({
+            'id': resume.id,
+            'filename': resume.original_filename or resume.filename,
+            'upload_date': resume.upload_date.isoformat(),
+            'processed': resume.processed,
+            'analysis': resume.analysis,
+            'analysis_markdown': artifact.markdown if artifact else None,
+            'user_email': resume.user.email if resume.user else None
+        })
+
+    return http_cache.conditional(build, etag, last_modified)
 
 @resumes_bp.route('/<string:slug>/analyze', methods=['POST'])
 @login_required
@@ -118,6 +249,13 @@ def analyze_resume(slug):
         required: true
         schema:
           type: string
+      - in: query
+        name: async
+        required: false
+        schema:
+          type: boolean
+        description: Queue the analysis and return 202 with a job id instead
+          of waiting for it (also enabled by `Prefer: respond-async`).
     responses:
       200:
         description: Analysis markdown
@@ -128,117 +266,86 @@ def analyze_resume(slug):
               properties:
                 analysis_markdown:
                   type: string
+      202:
+        description: Analysis queued; poll `GET /api/jobs/<job_id>`
     """
-    resume = Resume.query.filter_by(slug=slug, user_id=g.user_id).first_or_404()
+    resume = Resume.query.filter(Resume.slug == slug, *token_resumes()).first_or_404()
 
-    # Always (re)analyze on demand and return Markdown directly. We deliberately
-    # avoid persisting the string to the `analysis` JSON column to bypass type
-    # mismatch problems.
+    if request.args.get('async') in ('1', 'true') or 'respond-async' in request.headers.get('Prefer', ''):
+        job = enqueue_job(resume)
+        response = jsonify(job_to_dict(job))
+        response.status_code = 202
+        response.headers['Location'] = f"/api/jobs/{job.id}"
+        return response
 
-    filepath = os.path.join('uploads', resume.filename)
-    pdf_processor = PDFProcessor()
-    analysis_markdown = pdf_processor.analyze_resume(filepath)
-
-    # Mark resume as processed so the UI can reflect the status, but do not
-    # store the markdown string in the JSON field.
-    if not resume.processed:
-        resume.processed = True
-        db.session.commit()
+    # The Markdown is stored as a `ResumeAnalysis` row and reused until the
+    # uploaded file or the prompt changes; the resume is marked processed.
+    analysis_markdown, _ = get_or_create_analysis(resume)
 
     return jsonify({
         'message': 'Analysis complete',
         'analysis_markdown': analysis_markdown
     })
 
+@resumes_bp.route('/<string:slug>/analyze/stream', methods=['GET'])
+@login_required
+def analyze_resume_stream(slug):
+    """Stream the analysis Markdown as Server-Sent Events.
+
+    Events: `chunk` with `{"delta": str}` for every piece of Markdown,
+    then `done` with `{"analysis_id": int}`; `error` with `{"error": str}`
+    if the analysis fails.  The completed Markdown is stored just like the
+    blocking `/analyze` endpoint does.
+    """
+    resume = Resume.query.filter(Resume.slug == slug, *token_resumes()).first_or_404()
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def generate():
+        stream = stream_analysis(resume)
+        try:
+            while True:
+                try:
+                    chunk = next(stream)
+                except StopIteration as stop:
+                    artifact = stop.value
+                    break
+                yield sse('chunk', {'delta': chunk})
+        except Exception as e:
+            print(f"Streaming analysis failed: {str(e)}")
+            yield sse('error', {'error': 'Analysis failed, please try again later'})
+            return
+        yield sse('done', {'analysis_id': artifact.id})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Disable response buffering in nginx-style proxies
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
 # ------------ Send PDF via email -----------------
 
 @resumes_bp.route('/<string:slug>/send-pdf', methods=['POST'])
 @login_required
 def send_pdf(slug):
-    """Generate a simple PDF from the Markdown analysis and email it to the user."""
-    resume = Resume.query.filter_by(slug=slug, user_id=g.user_id).first_or_404()
-
-    # Re-run analysis to get latest markdown
-    filepath = os.path.join('uploads', resume.filename)
-    pdf_processor = PDFProcessor()
-    analysis_md = pdf_processor.analyze_resume(filepath)
-
-    if not REPORTLAB_AVAILABLE:
-        return jsonify({'error': 'Server missing reportlab package for PDF generation'}), 500
-
-    # Generate PDF with basic formatting using Platypus, which handles automatic wrapping
-    tmp_pdf = NamedTemporaryFile(delete=False, suffix='.pdf')
-    doc = SimpleDocTemplate(
-        tmp_pdf.name,
-        pagesize=letter,
-        rightMargin=72,
-        leftMargin=72,
-        topMargin=72,
-        bottomMargin=72,
-    )
+    """Generate a simple PDF from the Markdown analysis and queue an email
+    with it to the user; poll `GET /api/emails/<email_id>` for delivery."""
+    resume = Resume.query.filter(Resume.slug == slug, *token_resumes()).first_or_404()
 
-    styles = getSampleStyleSheet()
-    # --- Register a font that supports Chinese characters (e.g. NotoSansCJK) ---
-    font_registered = False
-    import glob
-    possible_paths = [
-        os.path.join(os.getcwd(), 'fonts', 'NotoSansCJKsc-Regular.otf'),
-        os.path.join(os.getcwd(), 'fonts', 'NotoSansCJKsc-Regular.ttf'),
-        os.path.join(os.getcwd(), 'NotoSansCJKsc-Regular.otf'),
-        os.path.join(os.getcwd(), 'NotoSansCJKsc-Regular.ttf'),
-        '/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc',
-    ]
-    # also accept any NotoSans* TTF/OTF in ./fonts directory
-    possible_paths.extend(glob.glob(os.path.join(os.getcwd(), 'fonts', 'NotoSans*.*tf')))
-    for p in possible_paths:
-        if os.path.exists(p):
-            try:
-                pdfmetrics.registerFont(TTFont('NotoSans', p))
-                font_registered = True
-                break
-            except Exception:
-                pass
-    else:
-        font_registered = True
-
-    # Fallback: if registration failed, Chinese will not render; continue with default
-
-    # Ensure custom bullet style added only once to avoid KeyError on subsequent calls
-    if "MarkdownBullet" not in styles.byName:
-        styles.add(
-            ParagraphStyle(
-                name="MarkdownBullet",
-                parent=styles["Normal"],
-                bulletIndent=0,
-                leftIndent=12,
-                firstLineIndent=-6,
-            )
-        )
+    # Reuse the stored analysis; only recomputed if the file or prompt changed
+    analysis_md, artifact = get_or_create_analysis(resume)
+    if artifact is None:
+        return jsonify({'error': 'Analysis is temporarily unavailable, please try again later'}), 503
 
-    # Override fonts if Chinese-capable font registered
-    if font_registered:
-        for name in ["Normal", "Heading2", "Heading3", "MarkdownBullet"]:
-            if name in styles.byName:
-                styles[name].fontName = 'NotoSans'
-
-    story = []
-    for raw in analysis_md.split("\n"):
-        line = raw.strip()
-        if not line:
-            story.append(Spacer(1, 10))
-            continue
-
-        # Simple markdown cues
-        if line.startswith("###"):
-            story.append(Paragraph(line[3:].strip(), styles["Heading3"]))
-        elif line.startswith("##"):
-            story.append(Paragraph(line[2:].strip(), styles["Heading2"]))
-        elif line.startswith("- ") or line.startswith("• "):
-            story.append(Paragraph(line[2:].strip(), styles["MarkdownBullet"]))
-        else:
-            story.append(Paragraph(line, styles["Normal"]))
-
-    doc.build(story)
+    try:
+        _, pdf_data = get_report_pdf(analysis_md)
+    except ReportUnavailable as e:
+        return jsonify({'error': str(e)}), 500
 
     # Prepare email
     msg = EmailMessage()
@@ -250,93 +357,130 @@ def send_pdf(slug):
 
     msg.set_content('Please find attached your resume analysis PDF generated on ' + datetime.utcnow().isoformat())
 
-    with open(tmp_pdf.name, 'rb') as f:
-        pdf_data = f.read()
     msg.add_attachment(pdf_data, maintype='application', subtype='pdf', filename='analysis.pdf')
 
-    # Send via SMTP (expects SMTP creds in env)
-    smtp_host = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
-    smtp_port = int(os.environ.get('SMTP_PORT', 587))
-    smtp_user = os.environ.get('SMTP_USER')
-    smtp_pass = os.environ.get('SMTP_PASS')
+    # Delivered in the background by the outbox sender (expects SMTP creds in env)
+    email = queue_email(msg, user_id=g.user_id, resume_id=resume.id)
+    response = jsonify({'message': 'PDF queued for delivery', **email_to_dict(email)})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/emails/{email.id}"
+    return response
+
+@resumes_bp.route('/<string:slug>/report.pdf', methods=['GET'])
+@login_required
+def download_report(slug):
+    """Download the analysis report as PDF (the same file send-pdf emails)."""
+    resume = Resume.query.filter(Resume.slug == slug, *token_resumes()).first_or_404()
+
+    analysis_md, artifact = get_or_create_analysis(resume)
+    if artifact is None:
+        return jsonify({'error': 'Analysis is temporarily unavailable, please try again later'}), 503
 
     try:
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            if smtp_user and smtp_pass:
-                server.login(smtp_user, smtp_pass)
-            server.send_message(msg)
-    except Exception as e:
-        return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
+        key, pdf_data = get_report_pdf(analysis_md)
+    except ReportUnavailable as e:
+        return jsonify({'error': str(e)}), 500
+
+    response = send_file(
+        io.BytesIO(pdf_data),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name='analysis.pdf',
+        etag=key,
+        conditional=True,
+        max_age=0,
+    )
+    response.cache_control.private = True
+    return response
 
-    return jsonify({'message': 'PDF emailed successfully'})
+@resumes_bp.route('/<string:slug>/file', methods=['GET'])
+@login_required
+def download_resume(slug):
+    """Download the uploaded PDF (supports Range requests)."""
+    resume = Resume.query.filter(Resume.slug == slug, *token_resumes()).first_or_404()
+    try:
+        response = get_storage().send(
+            resume.filename,
+            mimetype='application/pdf',
+            etag=resume.content_hash,
+            download_name=resume.original_filename or os.path.basename(resume.filename),
+        )
+    except FileNotFoundError:
+        abort(404)
+    response.cache_control.private = True
+    return response
 
 @resumes_bp.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory('uploads', filename)
+    try:
+        return get_storage().send(filename)
+    except FileNotFoundError:
+        abort(404)
 
 # ---------------- Profile picture extraction -----------------
 
 @resumes_bp.route('/<string:slug>/profile-picture', methods=['GET'])
 def get_profile_picture(slug):
     """Return the first image found in the uploaded PDF as the candidate's
-    profile picture.  The image is extracted on demand and cached under
-    `uploads/profile_pictures` for subsequent requests."""
+    profile picture.  The image is extracted once (at upload or on first
+    request) and recorded in the database; responses carry an ETag so
+    repeat views are answered with 304 Not Modified."""
 
     resume = Resume.query.filter_by(slug=slug).first_or_404()
-    pdf_path = os.path.join('uploads', resume.filename)
-
-    # Cache directory for extracted pictures
-    pic_dir = os.path.join('uploads', 'profile_pictures')
-    os.makedirs(pic_dir, exist_ok=True)
-
-    # Build deterministic cache filename
-    base_name, _ = os.path.splitext(resume.filename)
-    cached_prefix = f"{base_name}_{resume.id}_profile."
 
-    # Check if we have already extracted and stored a picture
-    for file in os.listdir(pic_dir):
-        if file.startswith(cached_prefix):
-            return send_from_directory(pic_dir, file)
+    # Revalidation needs only the row, not the file
+    stored = db.session.get(ProfilePicture, resume.id)
+    if stored is not None and stored.path and http_cache.is_fresh(stored.content_hash):
+        return http_cache.not_modified(stored.content_hash, max_age=PROFILE_PICTURE_MAX_AGE)
 
-    # Extract the picture if not cached
-    processor = PDFProcessor()
     try:
-        img_bytes, ext = processor.extract_profile_picture(pdf_path)
+        picture = profile_pictures.get_profile_picture(resume)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
+    if not picture.path:
+        return jsonify({'error': 'No images found in the provided PDF.'}), 400
 
-    pic_filename = f"{cached_prefix}{ext}"
-    pic_path = os.path.join(pic_dir, pic_filename)
-    with open(pic_path, 'wb') as f:
-        f.write(img_bytes)
-
-    return send_from_directory(pic_dir, pic_filename)
+    try:
+        response = get_storage().send(
+            picture.path,
+            mimetype=picture.mime_type,
+            etag=picture.content_hash,
+            max_age=PROFILE_PICTURE_MAX_AGE,
+            allow_redirect=False,
+        )
+    except FileNotFoundError:
+        abort(404)
+    # Personal data: browsers may cache it, shared proxies may not
+    return http_cache.cache_headers(response, picture.content_hash, max_age=PROFILE_PICTURE_MAX_AGE)
 
 # ---------------- Profile picture analysis -----------------
 
 @resumes_bp.route('/<string:slug>/profile-picture/analysis', methods=['GET'])
 def analyze_profile_picture(slug):
-    """Return aesthetic and confidence metrics for the cached profile picture."""
+    """Return aesthetic and confidence metrics for the cached profile picture.
+    The result only depends on the image, so its ETag is the image hash and
+    the analyzer version; revalidation skips loading the image and models."""
 
     resume = Resume.query.filter_by(slug=slug).first_or_404()
 
-    pic_dir = os.path.join('uploads', 'profile_pictures')
-    base_name, _ = os.path.splitext(resume.filename)
-    cached_prefix = f"{base_name}_{resume.id}_profile."
-
-    # Locate cached image (must exist – ensure user hit extract endpoint first)
-    pic_path = None
-    for file in os.listdir(pic_dir):
-        if file.startswith(cached_prefix):
-            pic_path = os.path.join(pic_dir, file)
-            break
+    stored = db.session.get(ProfilePicture, resume.id)
+    if stored is not None and stored.path:
+        etag = make_etag('photo-analysis', stored.content_hash, PHOTO_ANALYSIS_VERSION)
+        if http_cache.is_fresh(etag):
+            return http_cache.not_modified(etag, max_age=PROFILE_PICTURE_MAX_AGE)
 
-    if not pic_path or not os.path.exists(pic_path):
+    picture = profile_pictures.get_profile_picture(resume, extract=False)
+    if picture is None or not picture.path:
         return jsonify({'error': 'Profile picture not found. Call /profile-picture first.'}), 404
-
     analyzer = PhotoAnalyzer()
-    with open(pic_path, 'rb') as fp:
-        result = analyzer.analyze(fp.read())
+    try:
+        result = analyzer.analyze(get_storage().read(picture.path), content_hash=picture.content_hash)
+    except FileNotFoundError:
+        return jsonify({'error': 'Profile picture not found. Call /profile-picture first.'}), 404
+    except PhotoAnalyzerUnavailable:
+        return jsonify({'error': 'Profile picture analysis is not available on this server'}), 503
+    except PhotoAnalyzerTimeout:
+        return jsonify({'error': 'Profile picture analysis is busy, try again later'}), 503
 
-    return jsonify(result)
+    etag = make_etag('photo-analysis', picture.content_hash, PHOTO_ANALYSIS_VERSION)
+    return http_cache.cache_headers(jsonify(result), etag, max_age=PROFILE_PICTURE_MAX_AGE)
@@ -0,0 +1,10 @@
+from flask import Blueprint, jsonify
+from analysis_cache import get_analysis_cache
+
+system_bp = Blueprint('system', __name__, url_prefix='/api/system')
+
+@system_bp.route('/cache', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters of the analysis cache, plus the OpenAI latency
+    (seconds) and tokens saved by cache hits."""
+    return jsonify(get_analysis_cache().stats())
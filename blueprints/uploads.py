@@ -0,0 +1,168 @@
+from flask import Blueprint, request, jsonify
+from models import db, UploadSession
+import chunked_uploads
+from chunked_uploads import UploadConflict
+from upload_store import UploadRejected
+from blueprints.resumes import create_uploaded_resume
+from auth_utils import create_token
+
+uploads_bp = Blueprint('uploads', __name__, url_prefix='/api/uploads')
+
+
+def _error(e: UploadRejected):
+    response = jsonify({'error': str(e)})
+    response.status_code = e.status
+    if isinstance(e, UploadConflict):
+        response.headers['Upload-Offset'] = str(e.offset)
+    return response
+
+
+def _status(session: UploadSession, status_code: int = 200):
+    response = jsonify(chunked_uploads.session_to_dict(session))
+    response.status_code = status_code
+    response.headers['Upload-Offset'] = str(session.offset)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@uploads_bp.route('', methods=['POST'])
+def create_upload():
+    """Start a resumable upload
+    ---
+    requestBody:
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              email:
+                type: string
+              filename:
+                type: string
+              size:
+                type: integer
+                description: total file size in bytes
+    responses:
+      201:
+        description: Upload created; send the chunks to the `Location`
+    """
+    data = request.get_json(silent=True) or {}
+    if not data.get('email') or not data.get('filename') or 'size' not in data:
+        return jsonify({'error': 'Missing email, filename or size'}), 400
+    try:
+        size = int(data['size'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size must be an integer'}), 400
+    try:
+        session = chunked_uploads.create_session(data['email'], str(data['filename']), size)
+    except UploadRejected as e:
+        return _error(e)
+    response = _status(session, 201)
+    response.headers['Location'] = f"/api/uploads/{session.id}"
+    return response
+
+
+@uploads_bp.route('/<string:upload_id>', methods=['GET', 'HEAD'])
+def get_upload(upload_id):
+    """Progress of an upload; continue sending chunks at `offset`."""
+    return _status(db.get_or_404(UploadSession, upload_id))
+
+
+@uploads_bp.route('/<string:upload_id>', methods=['PUT', 'PATCH'])
+def upload_chunk(upload_id):
+    """Append one chunk
+    ---
+    parameters:
+      - in: header
+        name: Upload-Offset
+        required: true
+        schema:
+          type: integer
+        description: byte offset of the chunk, i.e. the current `offset`
+      - in: header
+        name: X-Chunk-SHA256
+        schema:
+          type: string
+        description: optional checksum; a chunk that does not match is dropped
+    requestBody:
+      required: true
+      content:
+        application/octet-stream:
+          schema:
+            type: string
+            format: binary
+    responses:
+      200:
+        description: Chunk stored; `offset` is where the next one starts
+      409:
+        description: Wrong offset; continue at the `Upload-Offset` header
+    """
+    session = db.get_or_404(UploadSession, upload_id)
+    offset = request.headers.get('Upload-Offset', request.args.get('offset'))
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Missing or invalid Upload-Offset'}), 400
+    try:
+        chunk_hash = chunked_uploads.append_chunk(
+            session, offset, request.stream,
+            length=request.content_length,
+            sha256=request.headers.get('X-Chunk-SHA256'),
+        )
+    except UploadRejected as e:
+        return _error(e)
+    response = _status(session)
+    response.headers['X-Chunk-SHA256'] = chunk_hash
+    return response
+
+
+@uploads_bp.route('/<string:upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """Finish an upload and create the resume
+    ---
+    requestBody:
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              sha256:
+                type: string
+                description: optional checksum of the whole file
+    responses:
+      200:
+        description: Same as `POST /api/resumes/upload`
+      409:
+        description: Chunks are missing; continue at the `Upload-Offset` header
+    """
+    session = db.get_or_404(UploadSession, upload_id)
+    if session.status != chunked_uploads.UPLOAD_COMPLETE:
+        sha256 = (request.get_json(silent=True) or {}).get('sha256')
+        try:
+            blob = chunked_uploads.finalize(session, sha256)
+        except UploadRejected as e:
+            return _error(e)
+        try:
+            resume = create_uploaded_resume(session.email, blob, session.filename)
+        except Exception:
+            db.session.rollback()
+            chunked_uploads.reopen(session)
+            raise
+        chunked_uploads.complete(session, resume)
+
+    # Repeating the request (e.g. after a lost response) returns the same resume
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'resume_slug': session.resume.slug,
+        'token': create_token(session.resume.user_id, resume_ids=[session.resume.id])
+    })
+
+
+@uploads_bp.route('/<string:upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    """Abandon an upload and delete the received chunks."""
+    session = db.get_or_404(UploadSession, upload_id)
+    if session.status != chunked_uploads.UPLOAD_COMPLETE:
+        chunked_uploads.discard(session)
+    return '', 204
@@ -0,0 +1,267 @@
+"""Resumable, chunked resume uploads.
+
+A client on a flaky connection uploads a PDF in pieces instead of one
+multipart request that has to start over after every failure:
+
+1. ``POST /api/uploads`` with the email, file name and total size creates an
+   `UploadSession`;
+2. ``PUT /api/uploads/<id>`` appends one chunk at ``Upload-Offset``;
+   ``GET /api/uploads/<id>`` tells a client that lost a response where to
+   continue;
+3. ``POST /api/uploads/<id>/complete`` turns the file into a `Resume`, just
+   like ``POST /api/resumes/upload``, and starts the text extraction.
+
+Every chunk is streamed straight into ``uploads/partial/<id>.part`` (see
+`upload_store.py`): the first one must carry the PDF header, and a chunk
+larger than the declared size or ``UPLOAD_CHUNK_MAX_MB`` is refused from its
+``Content-Length`` before it is read.  The file is hashed as the chunks
+arrive, so finalizing does not read it again unless the chunks were spread
+over several worker processes.  A session is locked while a chunk is written
+or the upload is finalized, with a compare-and-set UPDATE under a lease as in
+`jobs.py`, so concurrent retries of the same chunk cannot interleave.
+
+Configuration (environment variables):
+
+``UPLOAD_CHUNK_MAX_MB``       size limit of one chunk (keep it below ``MAX_UPLOAD_MB``)
+``UPLOAD_SESSION_TTL_HOURS``  idle time after which an unfinished upload is discarded
+``UPLOAD_LEASE_SECONDS``      how long a chunk write or finalize may hold the session
+"""
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, IO
+
+from sqlalchemy import and_, or_, update
+
+from analysis_cache import LRUTTLCache
+from models import db, UploadSession, Resume
+from upload_store import (
+    StoredBlob, UploadRejected, NotAPDF, UploadTooLarge, UPLOAD_MAX_FILE_BYTES,
+    blob_path, check_pdf_trailer, hash_file, partial_path, remove_partial, store_partial, write_chunk,
+)
+
+UPLOAD_CHUNK_MAX_BYTES = int(float(os.environ.get('UPLOAD_CHUNK_MAX_MB', 4)) * 1024 * 1024)
+UPLOAD_SESSION_TTL = timedelta(hours=float(os.environ.get('UPLOAD_SESSION_TTL_HOURS', 24)))
+UPLOAD_LEASE = timedelta(seconds=float(os.environ.get('UPLOAD_LEASE_SECONDS', 300)))
+
+UPLOAD_OPEN = 'open'
+UPLOAD_WRITING = 'writing'
+UPLOAD_FINALIZING = 'finalizing'
+UPLOAD_COMPLETE = 'complete'
+
+# Running SHA-256 of the sessions this process received chunks for:
+# upload id -> (offset, hash object)
+_running = LRUTTLCache(maxsize=1024, ttl=UPLOAD_SESSION_TTL.total_seconds())
+
+
+class UploadConflict(UploadRejected):
+    """The session is not at the state the request expects; `offset` is
+    where the client has to continue."""
+    status = 409
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+# ---------------------------------------------------------------------------
+# Sessions
+# ---------------------------------------------------------------------------
+
+def create_session(email: str, filename: str, size: int) -> UploadSession:
+    """Start an upload of *size* bytes; nothing is read yet, so a file that
+    is too large or not a PDF is refused before its first byte is sent."""
+    if not filename.lower().endswith('.pdf'):
+        raise NotAPDF('Only PDF files are accepted')
+    if size <= 0:
+        raise UploadRejected('size must be a positive number of bytes')
+    if size > UPLOAD_MAX_FILE_BYTES:
+        raise UploadTooLarge(f'File too large (limit {UPLOAD_MAX_FILE_BYTES} bytes)')
+
+    purge_expired()
+    now = datetime.utcnow()
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        email=email,
+        filename=os.path.basename(filename)[:255],
+        size=size,
+        offset=0,
+        status=UPLOAD_OPEN,
+        created_at=now,
+        updated_at=now,
+        expires_at=now + UPLOAD_SESSION_TTL,
+    )
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def session_to_dict(session: UploadSession) -> Dict:
+    data = {
+        'upload_id': session.id,
+        'filename': session.filename,
+        'size': session.size,
+        'offset': session.offset,
+        'status': session.status,
+        'chunk_size': UPLOAD_CHUNK_MAX_BYTES,
+        'expires_at': session.expires_at.isoformat(),
+    }
+    if session.resume is not None:
+        data['resume_slug'] = session.resume.slug
+    return data
+
+
+def _claim(session: UploadSession, status: str, offset: int) -> bool:
+    """Lock *session* at *offset* for one writer (compare-and-set)."""
+    now = datetime.utcnow()
+    claimable = or_(
+        UploadSession.status == UPLOAD_OPEN,
+        and_(UploadSession.status.in_((UPLOAD_WRITING, UPLOAD_FINALIZING)),
+             UploadSession.updated_at < now - UPLOAD_LEASE),
+    )
+    result = db.session.execute(
+        update(UploadSession)
+        .where(UploadSession.id == session.id, UploadSession.offset == offset, claimable)
+        .values(status=status, updated_at=now)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _release(session: UploadSession, offset: int, **values) -> None:
+    now = datetime.utcnow()
+    db.session.execute(
+        update(UploadSession)
+        .where(UploadSession.id == session.id)
+        .values(offset=offset, updated_at=now, expires_at=now + UPLOAD_SESSION_TTL, **values)
+    )
+    db.session.commit()
+    db.session.refresh(session)
+
+
+def _conflict(session: UploadSession, offset: int) -> UploadConflict:
+    db.session.refresh(session)
+    if session.status == UPLOAD_COMPLETE:
+        return UploadConflict('Upload already completed', session.offset)
+    if session.offset != offset:
+        return UploadConflict(f'Expected offset {session.offset}', session.offset)
+    return UploadConflict('Another request is writing this upload; retry shortly', session.offset)
+
+
+# ---------------------------------------------------------------------------
+# Chunks
+# ---------------------------------------------------------------------------
+
+def append_chunk(session: UploadSession, offset: int, stream: IO[bytes],
+                 length: int | None = None, sha256: str | None = None) -> str:
+    """Write one chunk at *offset*; returns the chunk's SHA-256.
+
+    *length* is the request's ``Content-Length``: an oversized chunk is
+    refused before its body is read.  If *sha256* is given, a chunk that
+    does not match it is discarded and has to be sent again.
+    """
+    if offset != session.offset or session.status == UPLOAD_COMPLETE:
+        raise _conflict(session, offset)
+    limit = min(session.size - offset, UPLOAD_CHUNK_MAX_BYTES)
+    if length is not None and length > limit:
+        raise UploadTooLarge(f'Chunk too large (at most {limit} bytes at offset {offset})')
+    if not _claim(session, UPLOAD_WRITING, offset):
+        raise _conflict(session, offset)
+
+    new_offset = offset
+    try:
+        running = _running.get(session.id)
+        if offset == 0:
+            digest = hashlib.sha256()
+        elif running is not None and running[0] == offset:
+            digest = running[1].copy()
+        else:
+            digest = None  # earlier chunks went to another process
+        written, chunk_hash = write_chunk(session.id, offset, stream, limit, digest)
+        if written == 0:
+            raise UploadRejected('Empty chunk')
+        if sha256 and sha256.lower() != chunk_hash:
+            raise UploadRejected('Chunk checksum mismatch')
+        new_offset = offset + written
+        if digest is not None:
+            _running.set(session.id, (new_offset, digest))
+        return chunk_hash
+    finally:
+        _release(session, new_offset, status=UPLOAD_OPEN)
+
+
+# ---------------------------------------------------------------------------
+# Completion
+# ---------------------------------------------------------------------------
+
+def finalize(session: UploadSession, sha256: str | None = None) -> StoredBlob:
+    """Check the assembled file and move it into the blob store.
+
+    Fails with `UploadConflict` while chunks are missing.  A file that is not
+    a complete PDF or does not match *sha256* cannot be repaired by sending
+    more chunks, so its session is discarded.  The caller creates the
+    resume and then calls `complete`.
+    """
+    if session.offset != session.size:
+        raise UploadConflict(f'Upload incomplete: {session.offset} of {session.size} bytes', session.offset)
+    if not _claim(session, UPLOAD_FINALIZING, session.size):
+        raise _conflict(session, session.size)
+
+    if session.content_hash:
+        # A previous finalize stored the blob, but creating the resume failed
+        return StoredBlob(session.content_hash, blob_path(session.content_hash), created=False)
+    try:
+        path = partial_path(session.id)
+        check_pdf_trailer(path)
+        running = _running.get(session.id)
+        if running is not None and running[0] == session.size:
+            content_hash = running[1].hexdigest()
+        else:
+            content_hash = hash_file(path)
+        if sha256 and sha256.lower() != content_hash:
+            raise UploadRejected('File checksum mismatch; start a new upload')
+    except UploadRejected:
+        discard(session)
+        raise
+    except Exception:
+        reopen(session)
+        raise
+
+    try:
+        blob = store_partial(session.id, content_hash)
+    except Exception:
+        reopen(session)
+        raise
+    _release(session, session.size, status=UPLOAD_FINALIZING, content_hash=content_hash)
+    return blob
+
+
+def reopen(session: UploadSession) -> None:
+    """Unlock a session whose finalize failed, so the client can retry it."""
+    _release(session, session.offset, status=UPLOAD_OPEN)
+
+
+def complete(session: UploadSession, resume: Resume) -> None:
+    """Record the resume created from a finalized upload."""
+    _release(session, session.size, status=UPLOAD_COMPLETE, resume_id=resume.id)
+
+
+def discard(session: UploadSession) -> None:
+    remove_partial(session.id)
+    db.session.delete(session)
+    db.session.commit()
+
+
+def purge_expired(limit: int = 100) -> int:
+    """Delete sessions (and partial files) idle for longer than the TTL."""
+    expired = (
+        UploadSession.query.filter(UploadSession.expires_at < datetime.utcnow())
+        .limit(limit)
+        .all()
+    )
+    for session in expired:
+        remove_partial(session.id)
+        db.session.delete(session)
+    db.session.commit()
+    return len(expired)
@@ -0,0 +1,89 @@
+"""Database engine configuration.
+
+The database URL and pool sizing come from the environment, so production can
+point at PostgreSQL (install its driver, e.g. ``psycopg2-binary``) while
+development keeps the SQLite file.  On SQLite every new connection is tuned
+for several gunicorn workers writing at once:
+
+* ``journal_mode=WAL`` – readers no longer block the writer and vice versa;
+* ``busy_timeout`` – a writer waits for the lock instead of failing at once
+  with "database is locked";
+* ``synchronous=NORMAL`` – safe with WAL and avoids an fsync per commit;
+* a larger page cache and in-memory temp tables.
+
+Configuration (environment variables):
+
+``DATABASE_URL``            SQLAlchemy URL (default: SQLite ``resume_analyzer.db``
+                            in the instance folder); ``postgres://`` is accepted
+``DB_POOL_SIZE``            connections kept open per process
+``DB_MAX_OVERFLOW``         extra connections allowed under load
+``DB_POOL_TIMEOUT``         seconds to wait for a free connection
+``DB_POOL_RECYCLE``         seconds after which a connection is replaced (server DBs)
+``SQLITE_WAL``              ``0`` keeps SQLite's rollback journal
+``SQLITE_BUSY_TIMEOUT_MS``  how long a SQLite writer waits for the lock
+``SQLITE_SYNCHRONOUS``      ``NORMAL`` (default) or ``FULL``
+"""
+import os
+import sqlite3
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_DATABASE_URL = 'sqlite:///resume_analyzer.db'
+
+SQLITE_WAL = os.environ.get('SQLITE_WAL', '1').lower() not in ('0', 'false', 'no')
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 30000))
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+
+
+def database_url() -> str:
+    url = os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    # Heroku/Render hand out postgres://, which SQLAlchemy 1.4+ no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """``SQLALCHEMY_ENGINE_OPTIONS`` for *url*."""
+    options: Dict[str, Any] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
+    if url.startswith('sqlite'):
+        if ':memory:' in url or url.rstrip('/') == 'sqlite:':
+            # In-memory databases use a single shared connection, no pool sizing
+            return {}
+        # Python-level lock wait, in addition to the busy_timeout pragma
+        options['connect_args'] = {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    return options
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS:d}")
+        if SQLITE_WAL:
+            # Persistent in the file; repeating it on every connection is cheap
+            cursor.execute("PRAGMA journal_mode = WAL")
+        if SQLITE_SYNCHRONOUS in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute("PRAGMA cache_size = -20000")  # 20 MB
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
+
+def configure_database(app) -> None:
+    """Set the database URL and engine options of *app* from the environment."""
+    url = database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
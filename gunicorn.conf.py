@@ -0,0 +1,36 @@
+"""gunicorn settings (``gunicorn -c gunicorn.conf.py asgi:app``).
+
+Sets up prometheus_client's multi-process mode: every worker writes its
+metrics to files in ``PROMETHEUS_MULTIPROC_DIR`` and ``GET /metrics`` sums
+them, so a scrape sees the whole server rather than the one worker that
+answered.  The directory must be set before the workers import
+prometheus_client, hence here and not in the app.
+
+Each worker also starts loading the photo models as soon as it has booted
+(``post_worker_init``), so its first request does not pay for it.
+"""
+import os
+import shutil
+import tempfile
+
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'resume-analyzer-metrics'))
+
+
+def on_starting(server):
+    # Files left by a previous run would be added to this run's counters
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # In the worker process, after the app is loaded (also with --preload)
+    from photo_analyzer import start_warm_up
+    start_warm_up()
@@ -0,0 +1,70 @@
+"""Conditional GET for the read endpoints.
+
+The results page polls ``GET /api/resumes/<slug>`` and friends until the
+analysis is done.  Instead of rebuilding the same body every time, a view
+computes a validator from cheap data (row ids, ``updated_at`` columns,
+content hashes), and `conditional` answers a matching ``If-None-Match`` or
+``If-Modified-Since`` with ``304 Not Modified`` before the body is built.
+Browsers revalidate on their own once a response carries an ETag, so the
+frontend needs no changes.
+
+Responses are ``Cache-Control: private`` (they are per user) and, with
+the default ``max_age=0``, ``no-cache``: always revalidated, never served
+stale.
+"""
+import hashlib
+from datetime import datetime
+from typing import Callable
+
+from flask import Response, request
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the parts of a representation's version."""
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()[:32]
+
+
+def is_fresh(etag: str | None, last_modified: datetime | None = None) -> bool:
+    """Whether the client's cached copy is current.
+
+    ``If-None-Match`` wins over ``If-Modified-Since`` when both are sent
+    (RFC 9110, section 13.2.2).
+    """
+    if request.if_none_match:
+        return etag is not None and request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        # HTTP dates have second resolution
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def cache_headers(response: Response, etag: str | None, last_modified: datetime | None = None,
+                  max_age: int = 0, private: bool = True) -> Response:
+    if etag:
+        response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Overrides what send_file() set (it marks responses with a max_age public)
+    response.cache_control.private = private or None
+    response.cache_control.public = not private or None
+    if max_age:
+        response.cache_control.max_age = max_age
+        response.cache_control.no_cache = None
+    else:
+        response.cache_control.max_age = None
+        response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag: str | None, last_modified: datetime | None = None,
+                 max_age: int = 0, private: bool = True) -> Response:
+    return cache_headers(Response(status=304), etag, last_modified, max_age, private)
+
+
+def conditional(build: Callable[[], Response], etag: str | None, last_modified: datetime | None = None,
+                max_age: int = 0, private: bool = True) -> Response:
+    """Return 304 if the client is up to date, else ``build()`` with the
+    validators and ``Cache-Control`` set."""
+    if is_fresh(etag, last_modified):
+        return not_modified(etag, last_modified, max_age, private)
+    return cache_headers(build(), etag, last_modified, max_age, private)
@@ -0,0 +1,318 @@
+"""Durable background jobs backed by the application database.
+
+Long-running work (currently: resume analysis) is stored as an `AnalysisJob`
+row and picked up by a small pool of worker threads running inside every web
+process.  Bulk uploads (see `batches.py`) queue ``batch_analyze`` jobs, which
+a separate, larger pool drains so a batch of hundreds of resumes is not
+limited to a couple of analyses at a time.  Their OpenAI calls have
+background priority in the rate limiter (see `rate_limiter.py`), so
+interactive analyses are not queued behind them.
+
+Workers claim a job with a conditional UPDATE, so several gunicorn workers
+can share the same table without an external broker.  A claimed job holds a
+lease, renewed while the job runs; if its worker dies the lease expires and
+another worker picks the job up again, which is how queued and in-flight jobs
+survive restarts.  A job whose lease expired ``JOB_MAX_ATTEMPTS`` times is
+marked failed instead.
+
+Configuration (environment variables):
+
+``JOB_WORKERS``         threads per process (``0`` disables the pool)
+``JOB_POLL_INTERVAL``   seconds between queue polls when idle
+``JOB_LEASE_SECONDS``   how long a claim is valid before it may be re-taken
+``JOB_MAX_ATTEMPTS``    attempts before a job is marked failed
+``BATCH_CONCURRENCY``   threads per process for ``batch_analyze`` jobs
+"""
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Sequence
+
+from sqlalchemy import and_, or_, update
+
+from models import db, AnalysisJob, Resume
+from analysis_service import get_or_create_analysis
+from rate_limiter import background
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+# ---------------------------------------------------------------------------
+# Job handlers
+# ---------------------------------------------------------------------------
+
+def _run_batch_analysis(job: AnalysisJob) -> None:
+    with background():
+        _run_analysis(job)
+
+
+def _run_analysis(job: AnalysisJob) -> None:
+    resume = db.session.get(Resume, job.resume_id)
+    if resume is None:
+        raise LookupError(f"Resume {job.resume_id} no longer exists")
+
+    analysis, artifact = get_or_create_analysis(resume)
+    if artifact is not None:
+        job.analysis_id = artifact.id
+        job.result = None
+    else:
+        # OpenAI failed and basic_analysis was used; keep its dict on the job
+        job.result = {'analysis_markdown': analysis}
+
+
+HANDLERS: Dict[str, Callable[[AnalysisJob], None]] = {
+    'analyze': _run_analysis,
+    # Same work; a separate kind so bulk uploads get their own pool and a
+    # lower priority at the rate limiter
+    'batch_analyze': _run_batch_analysis,
+}
+
+
+# ---------------------------------------------------------------------------
+# Queue API
+# ---------------------------------------------------------------------------
+
+def enqueue_job(resume: Resume, kind: str = 'analyze') -> AnalysisJob:
+    """Queue *kind* for *resume*, reusing an already queued/running job."""
+    job = (
+        AnalysisJob.query
+        .filter(AnalysisJob.resume_id == resume.id,
+                AnalysisJob.kind == kind,
+                AnalysisJob.status.in_(ACTIVE_STATUSES))
+        .order_by(AnalysisJob.created_at.desc())
+        .first()
+    )
+    if job is None:
+        job = AnalysisJob(id=uuid.uuid4().hex, resume_id=resume.id, kind=kind, status=JOB_QUEUED)
+        db.session.add(job)
+        db.session.commit()
+
+    _wake(kind)
+    return job
+
+
+def enqueue_jobs(resumes: Iterable[Resume], kind: str = 'batch_analyze') -> List[AnalysisJob]:
+    """Queue one *kind* job per resume in a single transaction."""
+    jobs = [AnalysisJob(id=uuid.uuid4().hex, resume_id=resume.id, kind=kind, status=JOB_QUEUED)
+            for resume in resumes]
+    db.session.add_all(jobs)
+    db.session.commit()
+    _wake(kind)
+    return jobs
+
+
+def _wake(kind: str) -> None:
+    pool = get_worker_pool(kind)
+    if pool is not None:
+        pool.ensure_started()
+        pool.notify()
+
+
+def job_to_dict(job: AnalysisJob) -> Dict:
+    data = {
+        'job_id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == JOB_SUCCEEDED:
+        if job.analysis is not None:
+            data['result'] = {'analysis_markdown': job.analysis.markdown}
+        else:
+            data['result'] = job.result
+    if job.status == JOB_FAILED:
+        data['error'] = job.error
+    return data
+
+
+# ---------------------------------------------------------------------------
+# Worker pool
+# ---------------------------------------------------------------------------
+
+class JobWorkerPool:
+    """Bounded pool of daemon threads that drain the `AnalysisJob` table."""
+
+    def __init__(self, app, size: int = 2, poll_interval: float = 2.0,
+                 lease_seconds: float = 300, max_attempts: int = 3,
+                 kinds: Sequence[str] = ('analyze',)):
+        self.app = app
+        self.kinds = tuple(kinds)
+        self.size = size
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    @property
+    def worker_id(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def ensure_started(self) -> None:
+        """Start the threads once per process.
+
+        Threads do not survive ``fork``; checking the pid makes this safe to
+        call from every request even when gunicorn preloads the app.
+        """
+        if self._pid == os.getpid() or self.size <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = []
+            for i in range(self.size):
+                t = threading.Thread(target=self._run, name=f"job-worker-{self.kinds[0]}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    # -- internals --------------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            try:
+                with self.app.app_context():
+                    job = self._claim()
+                    if job is not None:
+                        self._process(job)
+                        continue
+            except Exception as e:
+                print(f"Job worker error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim(self) -> AnalysisJob | None:
+        now = datetime.utcnow()
+        claimable = or_(
+            AnalysisJob.status == JOB_QUEUED,
+            and_(AnalysisJob.status == JOB_RUNNING, AnalysisJob.locked_at < now - self.lease),
+        )
+        candidates = (
+            AnalysisJob.query.filter(claimable, AnalysisJob.kind.in_(self.kinds))
+            .order_by(AnalysisJob.created_at)
+            .limit(self.size * 2)
+            .all()
+        )
+        for candidate in candidates:
+            # Compare-and-set on (status, locked_at): only one worker wins
+            unchanged = and_(
+                AnalysisJob.id == candidate.id,
+                AnalysisJob.status == candidate.status,
+                AnalysisJob.locked_at.is_(None) if candidate.locked_at is None
+                else AnalysisJob.locked_at == candidate.locked_at,
+            )
+            if candidate.status == JOB_RUNNING and candidate.attempts >= self.max_attempts:
+                # Its worker died or hung on every attempt; do not run it again
+                result = db.session.execute(
+                    update(AnalysisJob).where(unchanged)
+                    .values(status=JOB_FAILED,
+                            error=f"Worker lease expired on attempt {candidate.attempts}",
+                            locked_by=None,
+                            locked_at=None,
+                            finished_at=now)
+                )
+                db.session.commit()
+                if result.rowcount == 1:
+                    print(f"Job {candidate.id} failed: lease expired after {candidate.attempts} attempts")
+                continue
+            result = db.session.execute(
+                update(AnalysisJob).where(unchanged)
+                .values(status=JOB_RUNNING,
+                        locked_by=self.worker_id,
+                        locked_at=now,
+                        started_at=now,
+                        attempts=AnalysisJob.attempts + 1)
+            )
+            db.session.commit()
+            if result.rowcount == 1:
+                return db.session.get(AnalysisJob, candidate.id, populate_existing=True)
+        return None
+
+    def _heartbeat(self, job_id: str, stop: threading.Event) -> None:
+        """Renew the lease of a running job until *stop* is set, so a slow
+        but healthy job is not taken over by another worker."""
+        while not stop.wait(self.lease.total_seconds() / 3):
+            try:
+                with self.app.app_context():
+                    db.session.execute(
+                        update(AnalysisJob)
+                        .where(AnalysisJob.id == job_id,
+                               AnalysisJob.status == JOB_RUNNING,
+                               AnalysisJob.locked_by == self.worker_id)
+                        .values(locked_at=datetime.utcnow())
+                    )
+                    db.session.commit()
+            except Exception as e:
+                print(f"Renewing the lease of job {job_id} failed: {e}")
+
+    def _process(self, job: AnalysisJob) -> None:
+        handler = HANDLERS.get(job.kind)
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job.id, stop),
+                                     name=f"job-heartbeat-{job.id}", daemon=True)
+        heartbeat.start()
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            handler(job)
+            job.status = JOB_SUCCEEDED
+            job.error = None
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(AnalysisJob, job.id)
+            print(f"Job {job.id} failed (attempt {job.attempts}): {e}")
+            job.error = str(e)
+            job.status = JOB_FAILED if job.attempts >= self.max_attempts else JOB_QUEUED
+        finally:
+            stop.set()
+            heartbeat.join()
+        if job.status in (JOB_SUCCEEDED, JOB_FAILED):
+            job.finished_at = datetime.utcnow()
+        job.locked_by = None
+        job.locked_at = None
+        db.session.commit()
+
+
+# ---------------------------------------------------------------------------
+# App integration
+# ---------------------------------------------------------------------------
+_pools: Dict[str, JobWorkerPool] = {}
+
+
+def init_jobs(app) -> JobWorkerPool:
+    """Create the worker pools for *app*; threads start on first use."""
+    settings = dict(
+        poll_interval=float(os.environ.get('JOB_POLL_INTERVAL', 2)),
+        lease_seconds=float(os.environ.get('JOB_LEASE_SECONDS', 300)),
+        max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', 3)),
+    )
+    pool = JobWorkerPool(app, size=int(os.environ.get('JOB_WORKERS', 2)), kinds=('analyze',), **settings)
+    # Batch throughput is bounded by the OpenAI rate limiter, not by this
+    # pool, as long as it is large enough to cover the request latency
+    batch_pool = JobWorkerPool(app, size=int(os.environ.get('BATCH_CONCURRENCY', 16)),
+                               kinds=('batch_analyze',), **settings)
+    for p in (pool, batch_pool):
+        for kind in p.kinds:
+            _pools[kind] = p
+        # Starting from a request hook (rather than at import) means each
+        # gunicorn worker process gets its own threads, including with --preload.
+        app.before_request(p.ensure_started)
+    return pool
+
+
+def get_worker_pool(kind: str = 'analyze') -> JobWorkerPool | None:
+    return _pools.get(kind)
@@ -0,0 +1,192 @@
+"""Prometheus metrics and ``Server-Timing`` headers.
+
+The slow stages of a request are timed with `timed`:
+
+``pdf_extract``       text extraction (PyMuPDF / PyPDF2)
+``openai_analysis``   OpenAI analysis call, including rate-limit retries
+``openai_strategy``   OpenAI strategy call
+``report_render``     reportlab rendering of the analysis PDF
+``smtp_connect``      SMTP connect, STARTTLS and login (outbox sender)
+``smtp_send``         SMTP delivery of one message (outbox sender)
+``db_commit``         SQLAlchemy commit, including flush and lock waits
+``photo_analyze``     `PhotoAnalyzer.analyze`
+``stripe``            Stripe API calls
+
+Each stage feeds the ``resume_stage_seconds`` histogram (and
+``resume_stage_errors_total`` when it raises).  Stages that run inside a
+Flask request are also listed in that response's ``Server-Timing`` header,
+so browser devtools show where the time went, next to ``app`` (the whole
+request).  Further counters: OpenAI token usage, resume tokens before and
+after prompt compaction, fallbacks to the basic analysis and cache lookups
+per cache.
+
+``GET /metrics`` exposes everything in the Prometheus text format.  Under
+gunicorn every worker is a separate process; ``gunicorn.conf.py`` points
+``PROMETHEUS_MULTIPROC_DIR`` at a shared directory so the endpoint reports
+the sum over all workers, whichever one serves the scrape.
+
+Configuration (environment variables):
+
+``PROMETHEUS_MULTIPROC_DIR``  directory for multi-process metrics (set by gunicorn.conf.py)
+``METRICS_TOKEN``             if set, ``/metrics`` requires ``Authorization: Bearer <token>``
+``SERVER_TIMING``             ``0`` disables the ``Server-Timing`` header
+"""
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1').lower() not in ('0', 'false', 'no')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# From 5 ms (commits, cache hits) up to the OpenAI deadline
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram('resume_stage_seconds', 'Duration of a request stage', ['stage'], buckets=BUCKETS)
+STAGE_ERRORS = Counter('resume_stage_errors_total', 'Stages that raised', ['stage'])
+REQUEST_SECONDS = Histogram('resume_http_request_seconds', 'Duration of HTTP requests',
+                            ['method', 'route', 'status'], buckets=BUCKETS)
+OPENAI_TOKENS = Counter('resume_openai_tokens_total', 'Tokens reported by OpenAI responses', ['call', 'kind'])
+PROMPT_TOKENS = Counter('resume_prompt_tokens_total', 'Resume tokens before and after prompt compaction',
+                        ['stage'])
+COMPACTION_STEPS = Counter('resume_prompt_compaction_steps_total', 'Prompts changed by a compaction step', ['step'])
+ANALYSIS_FALLBACKS = Counter('resume_analysis_fallbacks_total', 'Analyses answered by basic_analysis')
+CACHE_LOOKUPS = Counter('resume_cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+# Stages of a request served natively by asgi.py (no Flask request context);
+# asyncio.to_thread copies it, so work done in threads is included
+_native_timings: contextvars.ContextVar[Dict[str, float] | None] = contextvars.ContextVar(
+    'server_timing', default=None)
+
+
+def _server_timing(stage: str, seconds: float) -> None:
+    if not SERVER_TIMING:
+        return
+    timings = g.setdefault('server_timing', {}) if has_request_context() else _native_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the ``with`` block as *stage*."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        # Not BaseException: a client closing a stream (GeneratorExit) is no error
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        _server_timing(stage, elapsed)
+
+
+def record_openai_usage(call: str, usage) -> None:
+    """Count the tokens of an OpenAI response's ``usage`` (may be ``None``)."""
+    if usage is None:
+        return
+    OPENAI_TOKENS.labels(call, 'prompt').inc(getattr(usage, 'prompt_tokens', 0) or 0)
+    OPENAI_TOKENS.labels(call, 'completion').inc(getattr(usage, 'completion_tokens', 0) or 0)
+
+
+def record_compaction(result) -> None:
+    """Count the tokens of a `prompt_compactor.CompactionResult`."""
+    PROMPT_TOKENS.labels('before').inc(result.tokens_before)
+    PROMPT_TOKENS.labels('after').inc(result.tokens_after)
+    for step in result.steps:
+        # "furniture:3" -> "furniture"
+        COMPACTION_STEPS.labels(step.split(':', 1)[0]).inc()
+
+
+def cache_lookup(cache: str, result: str) -> None:
+    """Count a lookup of *cache*; *result* is ``hit``, ``miss`` or a tier (``memory_hit``)."""
+    CACHE_LOOKUPS.labels(cache, result).inc()
+
+
+@event.listens_for(Session, 'before_commit')
+def _commit_started(session) -> None:
+    session.info['commit_started'] = time.perf_counter()
+
+
+@event.listens_for(Session, 'after_commit')
+def _commit_finished(session) -> None:
+    started = session.info.pop('commit_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels('db_commit').observe(elapsed)
+        _server_timing('db_commit', elapsed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _commit_failed(session) -> None:
+    if session.info.pop('commit_started', None) is not None:
+        STAGE_ERRORS.labels('db_commit').inc()
+
+
+# ---------------------------------------------------------------------------
+# Flask integration
+# ---------------------------------------------------------------------------
+
+def _start_request() -> None:
+    g.request_started = time.perf_counter()
+
+
+def _finish_request(response: Response) -> Response:
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUEST_SECONDS.labels(request.method, route, str(response.status_code)).observe(elapsed)
+    if SERVER_TIMING:
+        response.headers.add('Server-Timing', server_timing_header(g.pop('server_timing', {}), elapsed))
+    return response
+
+
+def server_timing_header(timings: Dict[str, float], elapsed: float) -> str:
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    entries.append(f"app;dur={elapsed * 1000:.1f}")
+    return ', '.join(entries)
+
+
+@contextmanager
+def native_request_timing() -> Iterator[Dict[str, float]]:
+    """Collect the stages timed in this block (an ASGI request served
+    outside Flask) into the yielded dict."""
+    timings: Dict[str, float] = {}
+    token = _native_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _native_timings.reset(token)
+
+
+def metrics_response() -> Response:
+    """The metrics of this process, or of all gunicorn workers."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app) -> None:
+    """Time every request of *app* and add the ``Server-Timing`` header."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
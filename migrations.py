@@ -0,0 +1,99 @@
+"""Schema migrations for existing databases.
+
+`db.create_all()` creates missing tables but never changes existing ones, so
+indexes and columns added to the models after a table was created are
+applied here.  Every migration runs once, in order, inside its own
+transaction, and is recorded in the ``schema_migration`` table.  Migrations
+must be idempotent: on a fresh database `create_all` has already built the
+current schema and they find nothing to do.
+
+Run with ``flask --app app init-db``, which creates the tables and then
+applies the pending migrations.
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Connection, Engine
+
+from models import db
+
+_metadata = MetaData()
+schema_migration = Table(
+    'schema_migration', _metadata,
+    Column('id', String(100), primary_key=True),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def create_index(conn: Connection, model, column: str) -> None:
+    """Create the index the model declares on *column*, if missing."""
+    table = model.__table__
+    for index in table.indexes:
+        if [c.name for c in index.columns] == [column]:
+            index.create(conn, checkfirst=True)
+            return
+    raise LookupError(f"{table.name}.{column} has no index in the model")
+
+
+def add_column(conn: Connection, model, column: str) -> None:
+    """Add *column* as declared in the model, if missing (with its index)."""
+    table = model.__table__
+    if column in {c['name'] for c in inspect(conn).get_columns(table.name)}:
+        return
+    col = table.c[column]
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(conn.dialect)}"
+    conn.exec_driver_sql(ddl)
+    if col.index:
+        create_index(conn, model, column)
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+def _foreign_key_indexes(conn: Connection) -> None:
+    from models import Resume, Questionnaire, Payment
+    create_index(conn, Resume, 'user_id')
+    create_index(conn, Questionnaire, 'resume_id')
+    create_index(conn, Payment, 'user_id')
+
+
+def _resume_content_hash(conn: Connection) -> None:
+    from models import Resume
+    add_column(conn, Resume, 'original_filename')
+    add_column(conn, Resume, 'content_hash')
+
+
+def _resume_updated_at(conn: Connection) -> None:
+    from models import Resume
+    add_column(conn, Resume, 'updated_at')
+
+
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ('0001_foreign_key_indexes', _foreign_key_indexes),
+    ('0002_resume_content_hash', _resume_content_hash),
+    ('0003_resume_updated_at', _resume_updated_at),
+]
+
+
+def upgrade(engine: Engine | None = None) -> List[str]:
+    """Apply the pending migrations; returns the ids that were applied."""
+    engine = engine or db.engine
+    _metadata.create_all(engine)
+    with engine.connect() as conn:
+        done = set(conn.scalars(select(schema_migration.c.id)))
+
+    applied = []
+    for migration_id, migrate in MIGRATIONS:
+        if migration_id in done:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_migration.insert().values(id=migration_id, applied_at=datetime.utcnow()))
+        applied.append(migration_id)
+    return applied
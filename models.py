@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, UniqueConstraint, LargeBinary
 from sqlalchemy.orm import relationship
 
 db = SQLAlchemy()
@@ -14,17 +14,152 @@ class User(db.Model):
 
 class Resume(db.Model):
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
-    filename = Column(String(255), nullable=False)
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)  # storage key of the file (see storage.py)
+    original_filename = Column(String(255))  # name as uploaded
+    content_hash = Column(String(64), index=True)  # SHA-256 of the file; NULL for legacy uploads
     slug = Column(String(16), unique=True, index=True)
     upload_date = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # row version for ETags
     processed = Column(Boolean, default=False)
     analysis = Column(JSON)
     questionnaire = relationship('Questionnaire', backref='resume', uselist=False)
+    analyses = relationship('ResumeAnalysis', backref='resume', lazy=True)
+
+class ResumeAnalysis(db.Model):
+    """Stored LLM analysis of a resume file.
+
+    Rows are looked up by the SHA-256 of the uploaded PDF together with the
+    model and prompt version, so an analysis is only recomputed when the file
+    or the prompt changes.
+    """
+    id = Column(Integer, primary_key=True)
+    resume_id = Column(Integer, ForeignKey('resume.id'), nullable=False, index=True)
+    content_hash = Column(String(64), nullable=False, index=True)
+    prompt_version = Column(String(32), nullable=False)
+    model = Column(String(64), nullable=False)
+    markdown = Column(Text, nullable=False)
+    extracted_text = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ExtractedDocument(db.Model):
+    """Text extracted once from an uploaded PDF, keyed by the file's SHA-256."""
+    content_hash = Column(String(64), primary_key=True)
+    page_count = Column(Integer, nullable=False, default=0)
+    char_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    pages = relationship('ExtractedPage', backref='document', lazy=True,
+                         order_by='ExtractedPage.page_number')
+
+    @property
+    def text(self):
+        return "".join(page.text for page in self.pages)
+
+class ExtractedPage(db.Model):
+    __table_args__ = (UniqueConstraint('content_hash', 'page_number'),)
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), ForeignKey('extracted_document.content_hash'), nullable=False, index=True)
+    page_number = Column(Integer, nullable=False)  # 1-based
+    char_offset = Column(Integer, nullable=False)  # offset of this page in the joined text
+    text = Column(Text, nullable=False, default='')
+
+class AnalysisLock(db.Model):
+    """Cross-process single-flight lock, see `singleflight.py`."""
+    key = Column(String(200), primary_key=True)
+    owner = Column(String(32), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AnalysisJob(db.Model):
+    """Durable background job; see `jobs.py` for the worker pool."""
+    id = Column(String(32), primary_key=True)
+    resume_id = Column(Integer, ForeignKey('resume.id'), nullable=False, index=True)
+    kind = Column(String(20), nullable=False, default='analyze')
+    status = Column(String(20), nullable=False, default='queued', index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    analysis_id = Column(Integer, ForeignKey('resume_analysis.id'))
+    result = Column(JSON)
+    error = Column(Text)
+    locked_by = Column(String(64))
+    locked_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    resume = relationship('Resume')
+    analysis = relationship('ResumeAnalysis')
+
+class ProfilePicture(db.Model):
+    """Image extracted from a resume PDF, see `profile_pictures.py`.
+
+    A row with ``path`` NULL records that the PDF contains no image, so the
+    extraction is not retried on every request.
+    """
+    resume_id = Column(Integer, ForeignKey('resume.id'), primary_key=True)
+    path = Column(String(255))  # relative to the upload folder
+    format = Column(String(10))
+    mime_type = Column(String(50))
+    width = Column(Integer)
+    height = Column(Integer)
+    byte_size = Column(Integer)
+    content_hash = Column(String(64), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AnalysisBatch(db.Model):
+    """A bulk upload; each file becomes a `BatchItem` with its own job."""
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=False, index=True)
+    total = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    items = relationship('BatchItem', backref='batch', lazy=True, order_by='BatchItem.position')
+
+class BatchItem(db.Model):
+    __table_args__ = (UniqueConstraint('batch_id', 'position'),)
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(String(32), ForeignKey('analysis_batch.id'), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    filename = Column(String(255), nullable=False)  # name as uploaded
+    resume_id = Column(Integer, ForeignKey('resume.id'))
+    job_id = Column(String(32), ForeignKey('analysis_job.id'))
+    error = Column(Text)  # set when the file was rejected before queuing
+    resume = relationship('Resume')
+    job = relationship('AnalysisJob')
+
+class OutboxEmail(db.Model):
+    """Email queued for delivery; see `outbox.py` for the sender."""
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey('user.id'), index=True)
+    resume_id = Column(Integer, ForeignKey('resume.id'))
+    sender = Column(String(255), nullable=False)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255))
+    message = Column(LargeBinary, nullable=False)  # serialized message incl. attachments
+    status = Column(String(20), nullable=False, default='queued', index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    locked_by = Column(String(64))
+    locked_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+
+class UploadSession(db.Model):
+    """A resumable upload in progress; see `chunked_uploads.py`."""
+    id = Column(String(32), primary_key=True)
+    email = Column(String(120), nullable=False)
+    filename = Column(String(255), nullable=False)  # name as uploaded
+    size = Column(Integer, nullable=False)  # declared total size in bytes
+    offset = Column(Integer, nullable=False, default=0)  # bytes received so far
+    status = Column(String(20), nullable=False, default='open')  # open, finalizing, complete
+    content_hash = Column(String(64))
+    resume_id = Column(Integer, ForeignKey('resume.id'))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    resume = relationship('Resume')
 
 class Questionnaire(db.Model):
     id = Column(Integer, primary_key=True)
-    resume_id = Column(Integer, ForeignKey('resume.id'), nullable=False)
+    resume_id = Column(Integer, ForeignKey('resume.id'), nullable=False, index=True)
     current_status = Column(String(50))
     job_type = Column(String(50))
     salary_expectation = Column(String(50))
@@ -33,7 +168,7 @@ class Questionnaire(db.Model):
 
 class Payment(db.Model):
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=False, index=True)
     payment_intent_id = Column(String(100), unique=True, nullable=False)
     amount = Column(Integer, nullable=False)  # in cents
     currency = Column(String(3), nullable=False)
@@ -1,12 +1,16 @@
 import os
 import json
+import time
+import asyncio
+import hashlib
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Generator, List
 
-try:
-    import openai
-except ImportError as e:  # Keep the import local so that the main app can still run basic analysis without the package
-    openai = None
+from analysis_cache import AnalysisCache, get_analysis_cache
+from openai_client import get_openai_client, get_async_openai_client, with_deadline
+from prompt_compactor import PromptCompactor, CompactionResult
+from metrics import record_compaction, record_openai_usage, timed
+from rate_limiter import RateLimiter, get_rate_limiter, retry_rate_limited, aretry_rate_limited
 
 
 class OpenAIResumeAnalyzer:
@@ -52,8 +56,25 @@ class OpenAIResumeAnalyzer:
 {text}
 """
 
-    def __init__(self, api_key: str | None = None, model: str = "gpt-3.5-turbo"):
-        """Instantiate the OpenAI client.
+    DEFAULT_MODEL = "gpt-3.5-turbo"
+    MAX_TOKENS = 2500
+
+    SYSTEM_NOTICE = "You are a professional resume analyzer. Reply ONLY with formatted Markdown as instructed, no extra commentary."  # noqa: E501
+
+    # Changes whenever the prompt wording changes so cached and stored analyses
+    # produced by an older prompt are not served for the new one.
+    PROMPT_VERSION = hashlib.sha256((SYSTEM_NOTICE + PROMPT_TEMPLATE).encode("utf-8")).hexdigest()[:12]
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str = DEFAULT_MODEL,
+        cache: AnalysisCache | None = None,
+        timeout: float | None = None,
+        compactor: PromptCompactor | None = None,
+        limiter: RateLimiter | None = None,
+    ):
+        """Configure the analyzer; the OpenAI client is created on first use.
 
         Parameters
         ----------
@@ -61,38 +82,219 @@ class OpenAIResumeAnalyzer:
             Explicit key.  If *None* (default) the method falls back to the
             `OPENAI_API_KEY` environment variable so that the calling
             application can manage secrets in whichever way it prefers.
+            Without any key the analysis calls raise, and callers fall back
+            to the basic analysis.
         model: str
             Model name to call – kept configurable for easy future upgrades.
+        cache: AnalysisCache | None
+            Result cache consulted before calling the API.  Defaults to the
+            process-wide cache configured via `ANALYSIS_CACHE_*` variables.
+        timeout: float | None
+            Per-call deadline in seconds (default: `OPENAI_ANALYSIS_TIMEOUT`,
+            90 s).  The client itself is shared per process, see
+            `openai_client.get_openai_client`.
+        compactor: PromptCompactor | None
+            Pre-processing that cleans the resume text and fits it into the
+            `PROMPT_TOKEN_BUDGET` before it is sent.
+        limiter: RateLimiter | None
+            RPM/TPM limiter every call waits on; defaults to the process-wide
+            limiter configured via `OPENAI_RPM_LIMIT` / `OPENAI_TPM_LIMIT`.
         """
-        if openai is None:
-            raise ImportError("The `openai` package is required for advanced resume analysis. Install it first.")
-
-        self.client = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.api_key = api_key
+        self._client = None
         self.model = model
+        self.timeout = timeout if timeout is not None else float(os.getenv("OPENAI_ANALYSIS_TIMEOUT", 90))
+        self.cache = cache if cache is not None else get_analysis_cache()
+        self.compactor = compactor or PromptCompactor(model=model)
+        self.last_compaction: CompactionResult | None = None
+        self.limiter = limiter if limiter is not None else get_rate_limiter()
+        self._template_tokens: int | None = None
+
+    @property
+    def client(self):
+        # Created on first call so that a missing key fails the analysis (and
+        # triggers the fallback), not the construction of the analyzer
+        if self._client is None:
+            self._client = get_openai_client(self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
 
     # ---------------------------------------------------------------------
     # Public helpers
     # ---------------------------------------------------------------------
-    def analyse(self, text: str) -> str:
+    def analyse(self, text: str, pages: List[str] | None = None) -> str:
         """Call Chat Completions API with the predefined prompt.
 
-        Returns the parsed Markdown response.
+        Returns the parsed Markdown response.  The text is compacted first
+        (pass the per-page text as *pages* to also drop repeated headers and
+        footers).  Results are served from the analysis cache when the same
+        compacted text was analysed before with the same model and prompt
+        version.
         """
-        system_notice = "You are a professional resume analyzer. Reply ONLY with formatted Markdown as instructed, no extra commentary."  # noqa: E501
-
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_notice},
-                {"role": "user", "content": self.PROMPT_TEMPLATE.format(text=text)},
-            ],
-            temperature=0.3,
-            max_tokens=2500,
+        text = self._compact(text, pages)
+        cache_key = self.cache.make_key(text, self.model, self.PROMPT_VERSION)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        client = with_deadline(self.client, self.timeout)
+        reserved = self._estimate_tokens(text)
+        self.limiter.acquire(reserved)
+        started = time.perf_counter()
+        with timed('openai_analysis'):
+            response = retry_rate_limited(
+                lambda: client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(text),
+                    temperature=0.3,
+                    max_tokens=self.MAX_TOKENS,
+                ),
+                self.limiter,
+            )
+
+        markdown_output = self._clean(response.choices[0].message.content)
+
+        usage = getattr(response, "usage", None)
+        record_openai_usage('analysis', usage)
+        if usage:
+            self.limiter.settle(reserved, usage.total_tokens)
+        self.cache.set(
+            cache_key,
+            markdown_output,
+            cost_seconds=time.perf_counter() - started,
+            tokens=getattr(usage, "total_tokens", 0) if usage else 0,
         )
+        return markdown_output
+
+    def analyse_stream(self, text: str, pages: List[str] | None = None) -> Generator[str, None, str]:
+        """Streaming variant of `analyse`.
+
+        Yields Markdown chunks as the model produces them and *returns* the
+        final, cleaned Markdown (use ``markdown = yield from ...``).  The final
+        result goes through the same cache as `analyse`; a cache hit is yielded
+        as a single chunk.
+        """
+        text = self._compact(text, pages)
+        cache_key = self.cache.make_key(text, self.model, self.PROMPT_VERSION)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return cached
+
+        client = with_deadline(self.client, self.timeout)
+        reserved = self._estimate_tokens(text)
+        self.limiter.acquire(reserved)
+        started = time.perf_counter()
+        parts: List[str] = []
+        usage = None
+        # Covers the whole stream, including the time the consumer takes
+        with timed('openai_analysis'):
+            stream = retry_rate_limited(
+                lambda: client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(text),
+                    temperature=0.3,
+                    max_tokens=self.MAX_TOKENS,
+                    stream=True,
+                    # The last chunk then carries the token usage (the SDK
+                    # pinned here predates the stream_options argument)
+                    extra_body={"stream_options": {"include_usage": True}},
+                ),
+                self.limiter,
+            )
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
 
-        markdown_output: str = response.choices[0].message.content.strip()
+        record_openai_usage('analysis', usage)
+        if usage:
+            self.limiter.settle(reserved, usage.total_tokens)
+        markdown_output = self._clean("".join(parts))
+        self.cache.set(
+            cache_key,
+            markdown_output,
+            cost_seconds=time.perf_counter() - started,
+            tokens=getattr(usage, "total_tokens", 0) if usage else 0,
+        )
+        return markdown_output
+
+    async def aanalyse(self, text: str, pages: List[str] | None = None) -> str:
+        """Asyncio variant of `analyse` using the shared `AsyncOpenAI` client.
+
+        While waiting for the model the event loop is free to serve other
+        requests, so one worker can hold many analyses in flight.
+        """
+        text = self._compact(text, pages)
+        cache_key = self.cache.make_key(text, self.model, self.PROMPT_VERSION)
+        cached = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+        client = with_deadline(get_async_openai_client(self.api_key), self.timeout)
+        reserved = self._estimate_tokens(text)
+        await self.limiter.aacquire(reserved)
+        started = time.perf_counter()
+        with timed('openai_analysis'):
+            response = await aretry_rate_limited(
+                lambda: client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(text),
+                    temperature=0.3,
+                    max_tokens=self.MAX_TOKENS,
+                ),
+                self.limiter,
+            )
+
+        markdown_output = self._clean(response.choices[0].message.content)
+
+        usage = getattr(response, "usage", None)
+        record_openai_usage('analysis', usage)
+        if usage:
+            self.limiter.settle(reserved, usage.total_tokens)
+        await asyncio.to_thread(
+            self.cache.set,
+            cache_key,
+            markdown_output,
+            cost_seconds=time.perf_counter() - started,
+            tokens=getattr(usage, "total_tokens", 0) if usage else 0,
+        )
+        return markdown_output
+
+    # ---------------------------------------------------------------------
+    # Internals
+    # ---------------------------------------------------------------------
+    def _compact(self, text: str, pages: List[str] | None) -> str:
+        result = self.compactor.compact(text, pages)
+        self.last_compaction = result
+        record_compaction(result)
+        return result.text
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Tokens a request for *text* counts against the TPM limit: the prompt
+        plus the completion allowance (OpenAI reserves `max_tokens` up front)."""
+        counter = self.compactor.counter
+        if self._template_tokens is None:
+            self._template_tokens = counter.count(self.SYSTEM_NOTICE + self.PROMPT_TEMPLATE)
+        return self._template_tokens + counter.count(text) + self.MAX_TOKENS
+
+    def _messages(self, text: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.SYSTEM_NOTICE},
+            {"role": "user", "content": self.PROMPT_TEMPLATE.format(text=text)},
+        ]
+
+    @staticmethod
+    def _clean(markdown_output: str | None) -> str:
+        markdown_output = (markdown_output or "").strip()
         # Remove potential markdown fences accidentally added by the model
         if markdown_output.startswith("```"):
             markdown_output = markdown_output.strip("` ")
-
         return markdown_output
@@ -0,0 +1,143 @@
+"""Process-wide OpenAI client registry.
+
+Creating an `openai.OpenAI` client also creates a new httpx connection pool, so
+building one per request means paying TCP + TLS setup on every analysis.  The
+helpers below hand out one client per API key and process, backed by a pooled
+keep-alive connection pool.
+
+The registry is fork-safe: children forked from a preloaded gunicorn master
+drop the inherited clients (their sockets belong to the parent) and lazily
+build their own.
+
+Configuration (environment variables):
+
+``OPENAI_MAX_CONNECTIONS``     max open connections per process
+``OPENAI_ASYNC_MAX_CONNECTIONS`` the same for the asyncio (ASGI) client
+``OPENAI_MAX_KEEPALIVE``       idle connections kept in the pool
+``OPENAI_KEEPALIVE_EXPIRY``    seconds an idle connection is kept
+``OPENAI_CONNECT_TIMEOUT``     TCP/TLS connect timeout in seconds
+``OPENAI_TIMEOUT``             default read/overall timeout in seconds
+``OPENAI_MAX_RETRIES``         client-level retries on connection errors/5xx
+
+429 responses are not retried by the clients: `rate_limiter.retry_rate_limited`
+retries them and pauses the process-wide limiter meanwhile, so one call never
+multiplies into both loops' retries.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict
+
+# openai (and httpx with it) is imported on first use: it is the single most
+# expensive import of the app and most processes never need it at boot.
+openai = None
+httpx = None
+_client_classes = None
+
+_clients: Dict[str, "openai.OpenAI"] = {}
+# AsyncOpenAI pools are bound to the event loop they were created on
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, openai.AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+
+def load_openai():
+    """Import and return the `openai` module; raises ImportError without it."""
+    global openai, httpx, _client_classes
+    if openai is None:
+        try:
+            import httpx as _httpx
+            import openai as _openai
+        except ImportError as e:
+            raise ImportError("The `openai` package is required for advanced resume analysis. Install it first.") from e
+        _client_classes = tuple(_without_rate_limit_retries(cls) for cls in (_openai.OpenAI, _openai.AsyncOpenAI))
+        httpx, openai = _httpx, _openai
+    return openai
+
+
+def _without_rate_limit_retries(cls):
+    """Subclass of an SDK client that leaves 429s to `rate_limiter`."""
+    class Client(cls):
+        def _should_retry(self, response) -> bool:
+            return response.status_code != 429 and super()._should_retry(response)
+
+    Client.__name__ = Client.__qualname__ = cls.__name__
+    return Client
+
+
+def _timeout(seconds: float | None = None) -> "httpx.Timeout":
+    load_openai()  # also for with_deadline on a client built elsewhere
+    total = seconds if seconds is not None else float(os.environ.get('OPENAI_TIMEOUT', 60))
+    return httpx.Timeout(total, connect=float(os.environ.get('OPENAI_CONNECT_TIMEOUT', 5)))
+
+
+def _limits(max_connections: int | None = None) -> "httpx.Limits":
+    return httpx.Limits(
+        max_connections=max_connections or int(os.environ.get('OPENAI_MAX_CONNECTIONS', 20)),
+        max_keepalive_connections=int(os.environ.get('OPENAI_MAX_KEEPALIVE', 10)),
+        keepalive_expiry=float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY', 30)),
+    )
+
+
+def get_openai_client(api_key: str | None = None) -> "openai.OpenAI":
+    """Return the shared client for *api_key* (default: ``OPENAI_API_KEY``)."""
+    load_openai()
+
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    cache_key = api_key or ''
+    client = _clients.get(cache_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(cache_key)
+            if client is None:
+                client = _client_classes[0](
+                    api_key=api_key,
+                    timeout=_timeout(),
+                    max_retries=int(os.environ.get('OPENAI_MAX_RETRIES', 2)),
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+                )
+                _clients[cache_key] = client
+    return client
+
+
+def get_async_openai_client(api_key: str | None = None) -> "openai.AsyncOpenAI":
+    """Return the shared `AsyncOpenAI` client for the running event loop."""
+    load_openai()
+
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    loop_clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = loop_clients.get(api_key or '')
+    if client is None:
+        client = _client_classes[1](
+            api_key=api_key,
+            timeout=_timeout(),
+            max_retries=int(os.environ.get('OPENAI_MAX_RETRIES', 2)),
+            http_client=httpx.AsyncClient(
+                limits=_limits(int(os.environ.get('OPENAI_ASYNC_MAX_CONNECTIONS', 200))),
+                timeout=_timeout(),
+            ),
+        )
+        loop_clients[api_key or ''] = client
+    return client
+
+
+def with_deadline(client, seconds: float | None):
+    """Return *client* with a per-call deadline; shares the connection pool."""
+    if seconds is None:
+        return client
+    return client.with_options(timeout=_timeout(seconds))
+
+
+def _reset_after_fork() -> None:
+    # Don't close the inherited clients: their sockets are still used by the
+    # parent.  Just forget them so the child builds its own pool.
+    global _lock
+    _clients.clear()
+    _async_clients.clear()
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,364 @@
+"""Email outbox.
+
+Endpoints never talk to the mail server themselves: `queue_email` stores the
+serialized message as an `OutboxEmail` row and returns at once.  Sender
+threads running inside every web process claim due messages in batches (the
+same compare-and-set lease as `jobs.py`, so several gunicorn workers can share
+the table) and deliver them over an SMTP connection that stays open and
+authenticated between messages and batches.  The lease of the unsent messages
+is renewed before each message, so a slow batch is not reclaimed and re-sent.
+
+Failures are classified: 5xx answers to a message fail it permanently, 4xx
+answers and connection problems are retried with exponential backoff until
+``OUTBOX_MAX_ATTEMPTS``.  A connection problem also hands the rest of the
+batch back to the queue.  The status of every message can be polled through
+``GET /api/emails/<id>``.
+
+Configuration (environment variables):
+
+``SMTP_HOST`` / ``SMTP_PORT``     mail server
+``SMTP_USER`` / ``SMTP_PASS``     login (skipped if unset)
+``SMTP_STARTTLS``                 ``0`` for a plain local server, e.g.
+                                  ``python -m aiosmtpd -n -l localhost:8025``
+``SMTP_TIMEOUT``                  socket timeout in seconds
+``SMTP_IDLE_SECONDS``             an idle connection is closed after this
+``OUTBOX_SENDERS``                sender threads (connections) per process;
+                                  ``0`` disables sending in this process
+``OUTBOX_BATCH_SIZE``             messages claimed at once
+``OUTBOX_POLL_INTERVAL``          seconds between polls when idle
+``OUTBOX_LEASE_SECONDS``          how long a claim is valid
+``OUTBOX_MAX_ATTEMPTS``           delivery attempts before a message fails
+``OUTBOX_RETRY_BASE``             first retry delay in seconds (doubles)
+"""
+import os
+import smtplib
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email import policy
+from email.message import EmailMessage
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import and_, or_, update
+
+from metrics import timed
+from models import db, OutboxEmail
+from rate_limiter import backoff_delay
+
+EMAIL_QUEUED = 'queued'
+EMAIL_SENDING = 'sending'
+EMAIL_SENT = 'sent'
+EMAIL_FAILED = 'failed'
+
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+OUTBOX_RETRY_BASE = float(os.environ.get('OUTBOX_RETRY_BASE', 30))
+OUTBOX_RETRY_CAP = 3600
+
+# Answers about one message; anything else is a problem with the connection
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+# ---------------------------------------------------------------------------
+# Queue API
+# ---------------------------------------------------------------------------
+
+def queue_email(message: EmailMessage, user_id: int | None = None,
+                resume_id: int | None = None) -> OutboxEmail:
+    """Store *message* for delivery and wake the sender."""
+    email = OutboxEmail(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        resume_id=resume_id,
+        sender=message['From'],
+        recipient=message['To'],
+        subject=message['Subject'],
+        # CRLF line endings: smtplib sends bytes as they are
+        message=message.as_bytes(policy=policy.SMTP),
+        status=EMAIL_QUEUED,
+    )
+    db.session.add(email)
+    db.session.commit()
+
+    if _sender is not None:
+        _sender.ensure_started()
+        _sender.notify()
+    return email
+
+
+def email_to_dict(email: OutboxEmail) -> Dict:
+    data = {
+        'email_id': email.id,
+        'status': email.status,
+        'recipient': email.recipient,
+        'subject': email.subject,
+        'attempts': email.attempts,
+        'created_at': email.created_at.isoformat() if email.created_at else None,
+        'sent_at': email.sent_at.isoformat() if email.sent_at else None,
+    }
+    if email.status == EMAIL_QUEUED and email.attempts:
+        data['next_attempt_at'] = email.next_attempt_at.isoformat() if email.next_attempt_at else None
+    if email.error and email.status != EMAIL_SENT:
+        data['error'] = email.error
+    return data
+
+
+# ---------------------------------------------------------------------------
+# SMTP connection
+# ---------------------------------------------------------------------------
+
+class SMTPSession:
+    """One authenticated SMTP connection, opened on demand and reused."""
+
+    def __init__(self, host: str, port: int, user: str | None = None, password: str | None = None,
+                 starttls: bool = True, timeout: float = 30, idle_seconds: float = 60):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self._smtp: smtplib.SMTP | None = None
+        self._last_used = 0.0
+
+    @classmethod
+    def from_env(cls) -> "SMTPSession":
+        return cls(
+            host=os.environ.get('SMTP_HOST', 'smtp.gmail.com'),
+            port=int(os.environ.get('SMTP_PORT', 587)),
+            user=os.environ.get('SMTP_USER'),
+            password=os.environ.get('SMTP_PASS'),
+            starttls=os.environ.get('SMTP_STARTTLS', '1').lower() not in ('0', 'false', 'no'),
+            timeout=float(os.environ.get('SMTP_TIMEOUT', 30)),
+            idle_seconds=float(os.environ.get('SMTP_IDLE_SECONDS', 60)),
+        )
+
+    def _connect(self) -> smtplib.SMTP:
+        with timed('smtp_connect'):
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                if self.user and self.password:
+                    smtp.login(self.user, self.password)
+            except Exception:
+                smtp.close()
+                raise
+        return smtp
+
+    def send(self, sender: str, recipients: List[str], data: bytes) -> None:
+        # The server may have dropped a connection that sat idle; reconnect once
+        for attempt in (0, 1):
+            if self._smtp is None or time.monotonic() - self._last_used > self.idle_seconds:
+                self.close()
+                self._smtp = self._connect()
+            try:
+                with timed('smtp_send'):
+                    self._smtp.sendmail(sender, recipients, data)
+                self._last_used = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = None
+                if attempt:
+                    raise
+
+    def close_if_idle(self) -> None:
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            self.close()
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+
+def is_permanent(error: BaseException) -> bool:
+    """Whether retrying the message cannot help (5xx answer about it)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, MESSAGE_ERRORS):
+        return error.smtp_code >= 500
+    return False
+
+
+# ---------------------------------------------------------------------------
+# Sender
+# ---------------------------------------------------------------------------
+
+class OutboxSender:
+    """Daemon threads that deliver the `OutboxEmail` table, one SMTP
+    connection per thread."""
+
+    def __init__(self, app, size: int = 1, batch_size: int = 20, poll_interval: float = 5.0,
+                 lease_seconds: float = 120, max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self.app = app
+        self.size = size
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def worker_id(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def ensure_started(self) -> None:
+        """Start the threads once per process (see `JobWorkerPool.ensure_started`)."""
+        if self._pid == os.getpid() or self.size <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for i in range(self.size):
+                threading.Thread(target=self._run, name=f"outbox-sender-{i}", daemon=True).start()
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    # -- internals --------------------------------------------------------
+    def _run(self) -> None:
+        session = SMTPSession.from_env()
+        while True:
+            try:
+                with self.app.app_context():
+                    batch = self._claim()
+                    if batch:
+                        self._send_batch(session, batch)
+                        continue
+            except Exception as e:
+                print(f"Outbox sender error: {e}")
+            session.close_if_idle()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim(self) -> List[OutboxEmail]:
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(OutboxEmail.status == EMAIL_QUEUED, OutboxEmail.next_attempt_at <= now),
+            and_(OutboxEmail.status == EMAIL_SENDING, OutboxEmail.locked_at < now - self.lease),
+        )
+        candidates = (
+            OutboxEmail.query.filter(claimable)
+            .order_by(OutboxEmail.next_attempt_at)
+            .limit(self.batch_size)
+            .all()
+        )
+        claimed = []
+        for candidate in candidates:
+            # Compare-and-set on (status, locked_at): only one sender wins
+            result = db.session.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id == candidate.id,
+                       OutboxEmail.status == candidate.status,
+                       OutboxEmail.locked_at.is_(None) if candidate.locked_at is None
+                       else OutboxEmail.locked_at == candidate.locked_at)
+                .values(status=EMAIL_SENDING, locked_by=self.worker_id, locked_at=now)
+            )
+            db.session.commit()
+            if result.rowcount == 1:
+                claimed.append(candidate.id)
+        return [db.session.get(OutboxEmail, email_id, populate_existing=True) for email_id in claimed]
+
+    def _renew(self, emails: List[OutboxEmail], held_at: datetime) -> Tuple[datetime, Set[str]]:
+        """Extend the lease on those of *emails* still locked at *held_at*.
+
+        Returns the new lock time and the ids this sender still holds.
+        """
+        now = datetime.utcnow()
+        ids = [email.id for email in emails]
+        result = db.session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id.in_(ids),
+                   OutboxEmail.status == EMAIL_SENDING,
+                   OutboxEmail.locked_at == held_at)
+            .values(locked_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount == len(ids):
+            return now, set(ids)
+        held = db.session.execute(
+            db.select(OutboxEmail.id).where(OutboxEmail.id.in_(ids), OutboxEmail.locked_at == now)
+        ).scalars()
+        return now, set(held)
+
+    def _send_batch(self, session: SMTPSession, batch: List[OutboxEmail]) -> None:
+        held_at = batch[0].locked_at  # claimed together
+        for i, email in enumerate(batch):
+            held_at, held = self._renew(batch[i:], held_at)
+            if email.id not in held:
+                continue  # the lease ran out and another sender took it
+            email.attempts += 1
+            try:
+                session.send(email.sender, [email.recipient], email.message)
+            except Exception as e:
+                self._failed(email, e)
+                if not isinstance(e, MESSAGE_ERRORS):
+                    # The connection is the problem; retry the rest later too
+                    session.close()
+                    retry_at = datetime.utcnow() + timedelta(seconds=OUTBOX_RETRY_BASE)
+                    for rest in batch[i + 1:]:
+                        if rest.id in held:
+                            self._release(rest, retry_at)
+                    db.session.commit()
+                    return
+            else:
+                email.status = EMAIL_SENT
+                email.sent_at = datetime.utcnow()
+                email.error = None
+            email.locked_by = None
+            email.locked_at = None
+            # Commit per message so a crash mid-batch does not resend the sent ones
+            db.session.commit()
+
+    def _failed(self, email: OutboxEmail, error: BaseException) -> None:
+        print(f"Email {email.id} failed (attempt {email.attempts}): {error}")
+        email.error = str(error) or type(error).__name__
+        if is_permanent(error) or email.attempts >= self.max_attempts:
+            email.status = EMAIL_FAILED
+        else:
+            email.status = EMAIL_QUEUED
+            delay = backoff_delay(email.attempts - 1, base=OUTBOX_RETRY_BASE, cap=OUTBOX_RETRY_CAP)
+            email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+    @staticmethod
+    def _release(email: OutboxEmail, next_attempt_at: datetime) -> None:
+        email.status = EMAIL_QUEUED
+        email.next_attempt_at = next_attempt_at
+        email.locked_by = None
+        email.locked_at = None
+
+
+# ---------------------------------------------------------------------------
+# App integration
+# ---------------------------------------------------------------------------
+_sender: OutboxSender | None = None
+
+
+def init_outbox(app) -> OutboxSender:
+    """Create the sender for *app*; threads start on first use."""
+    global _sender
+    _sender = OutboxSender(
+        app,
+        size=int(os.environ.get('OUTBOX_SENDERS', 1)),
+        batch_size=int(os.environ.get('OUTBOX_BATCH_SIZE', 20)),
+        poll_interval=float(os.environ.get('OUTBOX_POLL_INTERVAL', 5)),
+        lease_seconds=float(os.environ.get('OUTBOX_LEASE_SECONDS', 120)),
+    )
+    # Started from a request hook so each gunicorn worker gets its own
+    # threads; this also picks up messages left queued by a restart
+    app.before_request(_sender.ensure_started)
+    return _sender
+
+
+def get_outbox_sender() -> OutboxSender | None:
+    return _sender
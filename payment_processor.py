@@ -1,10 +1,15 @@
-import stripe
 import os
 from dotenv import load_dotenv
 
+from metrics import timed
+
 load_dotenv()
 
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+def _stripe():
+    """Import stripe on first use; the SDK is slow to import."""
+    import stripe
+    stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+    return stripe
 
 class PaymentProcessor:
     def create_payment_intent(self, amount, currency):
@@ -18,12 +23,14 @@ class PaymentProcessor:
         Returns:
             dict: Payment intent details
         """
+        stripe = _stripe()
         try:
-            payment_intent = stripe.PaymentIntent.create(
-                amount=amount,
-                currency=currency,
-                payment_method_types=['card']
-            )
+            with timed('stripe'):
+                payment_intent = stripe.PaymentIntent.create(
+                    amount=amount,
+                    currency=currency,
+                    payment_method_types=['card']
+                )
             return payment_intent
         except stripe.error.StripeError as e:
             raise Exception(f"Stripe error: {str(e)}")
@@ -39,11 +46,13 @@ class PaymentProcessor:
         Returns:
             dict: Confirmation details
         """
+        stripe = _stripe()
         try:
-            payment_intent = stripe.PaymentIntent.confirm(
-                payment_intent_id,
-                payment_method=payment_method_id
-            )
+            with timed('stripe'):
+                payment_intent = stripe.PaymentIntent.confirm(
+                    payment_intent_id,
+                    payment_method=payment_method_id
+                )
             return payment_intent
         except stripe.error.StripeError as e:
             raise Exception(f"Stripe error: {str(e)}")
@@ -0,0 +1,181 @@
+"""Text extraction engines used by `PDFProcessor`.
+
+Two interchangeable engines are provided:
+
+* ``pymupdf`` – PyMuPDF (``fitz``), a C library and by far the fastest option.
+* ``pypdf2``  – PyPDF2, pure Python; slower but tolerant of some files
+  PyMuPDF rejects.
+
+`resolve_engines` turns the ``PDF_TEXT_ENGINE`` setting into an ordered list of
+engines to try.  ``auto`` (the default) tries the fastest available engine
+first and falls back to the next one if it fails on a malformed file.
+
+Libraries are imported on first use so that importing this module stays cheap
+(it is also imported by the worker processes used for parallel extraction).
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Dict, List, Tuple, Type
+
+
+class ExtractionEngine(ABC):
+    """Interface every text extraction engine implements."""
+
+    name = "base"
+
+    @abstractmethod
+    def available(self) -> bool:
+        """Return True if the engine's library can be imported."""
+
+    @abstractmethod
+    def extract_pages(self, filepath: str, start: int = 0, stop: int | None = None) -> List[str]:
+        """Return the text of pages ``start`` (inclusive) to ``stop`` (exclusive)."""
+
+    @abstractmethod
+    def extract_short(self, filepath: str, max_pages: int) -> Tuple[int, List[str] | None]:
+        """Open the document once and return ``(page_count, pages)``.
+
+        ``pages`` is the text of every page if the document has fewer than
+        *max_pages* pages, else None (the caller extracts it in parallel).
+        """
+
+
+class PyMuPDFEngine(ExtractionEngine):
+    name = "pymupdf"
+
+    def available(self) -> bool:
+        try:
+            import fitz  # noqa: F401  PyMuPDF
+        except ImportError:
+            return False
+        return True
+
+    def extract_pages(self, filepath: str, start: int = 0, stop: int | None = None) -> List[str]:
+        import fitz
+
+        with fitz.open(filepath) as doc:
+            stop = doc.page_count if stop is None else min(stop, doc.page_count)
+            return [doc.load_page(i).get_text("text") for i in range(start, stop)]
+
+    def extract_short(self, filepath: str, max_pages: int) -> Tuple[int, List[str] | None]:
+        import fitz
+
+        with fitz.open(filepath) as doc:
+            if doc.page_count >= max_pages:
+                return doc.page_count, None
+            return doc.page_count, [page.get_text("text") for page in doc]
+
+
+class PyPDF2Engine(ExtractionEngine):
+    name = "pypdf2"
+
+    def available(self) -> bool:
+        try:
+            import PyPDF2  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def extract_pages(self, filepath: str, start: int = 0, stop: int | None = None) -> List[str]:
+        import PyPDF2
+
+        with open(filepath, "rb") as file:
+            reader = PyPDF2.PdfReader(file)
+            pages = reader.pages[start:stop]
+            return [page.extract_text() or "" for page in pages]
+
+    def extract_short(self, filepath: str, max_pages: int) -> Tuple[int, List[str] | None]:
+        import PyPDF2
+
+        with open(filepath, "rb") as file:
+            pages = PyPDF2.PdfReader(file).pages
+            if len(pages) >= max_pages:
+                return len(pages), None
+            return len(pages), [page.extract_text() or "" for page in pages]
+
+
+# Fastest first: this is the order `auto` tries engines in.
+ENGINES: Dict[str, Type[ExtractionEngine]] = {
+    PyMuPDFEngine.name: PyMuPDFEngine,
+    PyPDF2Engine.name: PyPDF2Engine,
+}
+
+
+def resolve_engines(preference: str | None = None) -> List[ExtractionEngine]:
+    """Return the engines to try, in order, for *preference*.
+
+    *preference* is ``auto``, a single engine name, or a comma-separated
+    list of names (tried in the given order).  Defaults to the
+    ``PDF_TEXT_ENGINE`` environment variable.
+    """
+    preference = (preference or os.environ.get("PDF_TEXT_ENGINE", "auto")).strip().lower()
+    names = list(ENGINES) if preference == "auto" else [n.strip() for n in preference.split(",") if n.strip()]
+
+    engines = []
+    for name in names:
+        if name not in ENGINES:
+            raise ValueError(f"Unknown PDF text engine '{name}'. Choose from: auto, {', '.join(ENGINES)}")
+        engine = ENGINES[name]()
+        if engine.available():
+            engines.append(engine)
+    if not engines:
+        raise RuntimeError(f"No PDF text engine available for '{preference}'. Install PyMuPDF or PyPDF2.")
+    return engines
+
+
+# ---------------------------------------------------------------------------
+# Parallel extraction for long documents
+# ---------------------------------------------------------------------------
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    # One pool per process and worker count, recreated after fork.  "spawn"
+    # avoids forking a process that already runs request/job threads.
+    global _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _pools.clear()
+            _pool_pid = os.getpid()
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        return _pools[workers]
+
+
+def _discard_pool(workers: int, pool: ProcessPoolExecutor) -> None:
+    # A worker died (e.g. killed for memory on a bad PDF): the pool refuses
+    # all further work, so replace it unless another thread already has
+    with _pool_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_range(engine_name: str, filepath: str, start: int, stop: int) -> List[str]:
+    return ENGINES[engine_name]().extract_pages(filepath, start, stop)
+
+
+def extract_pages_parallel(engine: ExtractionEngine, filepath: str, page_count: int,
+                           workers: int) -> List[str]:
+    """Split the document into contiguous page ranges, one per worker."""
+    chunk = -(-page_count // workers)  # ceil division
+    ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    for attempt in range(2):
+        pool = _get_pool(workers)
+        try:
+            futures = [pool.submit(_extract_range, engine.name, filepath, start, stop) for start, stop in ranges]
+            pages: List[str] = []
+            for future in futures:
+                pages.extend(future.result())
+            return pages
+        except BrokenProcessPool:
+            _discard_pool(workers, pool)
+            if attempt:
+                raise
+            print("PDF extraction pool broke, retrying on a new pool")
@@ -1,33 +1,62 @@
-import PyPDF2
 import os
+import time
 from datetime import datetime
-import re
-from collections import Counter
-import json
 from typing import Dict, List, Any
 from openai_analyzer import OpenAIResumeAnalyzer
+from pdf_engines import resolve_engines, extract_pages_parallel
+from skills_engine import get_skills_matcher, parse_experience
+from metrics import timed, ANALYSIS_FALLBACKS
+
+class NoImageFound(Exception):
+    """The PDF does not contain any raster image."""
 
 class PDFProcessor:
-    def __init__(self, analyzer: OpenAIResumeAnalyzer | None = None):
+    def __init__(self, analyzer: OpenAIResumeAnalyzer | None = None, engine: str | None = None):
         self.supported_formats = [".pdf"]
         # Allow dependency injection for easier testing
-        self.analyzer = analyzer or OpenAIResumeAnalyzer()
-        
+        self._analyzer = analyzer
+        # Text extraction engine(s): "auto", "pymupdf", "pypdf2" or a comma
+        # separated fallback order; defaults to the PDF_TEXT_ENGINE variable.
+        self.engines = resolve_engines(engine)
+        self.parallel_min_pages = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 50))
+        self.parallel_workers = int(os.environ.get("PDF_PARALLEL_WORKERS", min(4, os.cpu_count() or 1)))
+
+    @property
+    def analyzer(self) -> OpenAIResumeAnalyzer:
+        # Created on first use so that text-only work (e.g. extraction at
+        # upload time) does not set up an OpenAI client.
+        if self._analyzer is None:
+            self._analyzer = OpenAIResumeAnalyzer()
+        return self._analyzer
+
     def validate_file(self, filename):
         """Validate if the file is a supported PDF format"""
         return os.path.splitext(filename)[1].lower() in self.supported_formats
     
     def extract_text(self, filepath):
         """Extract text from PDF file"""
-        try:
-            with open(filepath, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text()
-                return text
-        except Exception as e:
-            raise Exception(f"Error extracting text from PDF: {str(e)}")
+        return "".join(self.extract_pages(filepath))
+
+    def extract_pages(self, filepath) -> List[str]:
+        """Extract the text of every page of the PDF file, in page order.
+
+        Engines are tried in order until one succeeds.  Documents with at
+        least `PDF_PARALLEL_MIN_PAGES` pages are split across a process pool.
+        """
+        errors = []
+        with timed('pdf_extract'):
+            for engine in self.engines:
+                try:
+                    if self.parallel_workers <= 1:
+                        return engine.extract_pages(filepath)
+                    page_count, pages = engine.extract_short(filepath, self.parallel_min_pages)
+                    if pages is None:
+                        return extract_pages_parallel(engine, filepath, page_count, self.parallel_workers)
+                    return pages
+                except Exception as e:
+                    print(f"{engine.name} text extraction failed, trying next engine: {str(e)}")
+                    errors.append(f"{engine.name}: {str(e)}")
+            raise Exception(f"Error extracting text from PDF: {'; '.join(errors)}")
     
     # The heavy-lifting is now done by `OpenAIResumeAnalyzer`.  The kept stub is
     # only here to avoid breaking imports if other modules still reference it.
@@ -46,43 +75,62 @@ class PDFProcessor:
             return self.basic_analysis(text)
     
     def basic_analysis(self, text: str) -> Dict[str, Any]:
-        """Fallback to basic analysis if OpenAI fails"""
-        technical_skills = []
-        soft_skills = []
-        
-        # Basic skill detection
-        technical_skills = re.findall(r'\b(?:python|java|javascript|c\+\+|sql|aws|docker|git|linux)\b', text, re.IGNORECASE)
-        soft_skills = re.findall(r'\b(?:communication|teamwork|leadership|problem solving)\b', text, re.IGNORECASE)
-        
-        # Basic experience detection
-        experience = re.search(r'(\d+)\s+years?\s+of\s+experience', text, re.IGNORECASE)
-        years_of_experience = int(experience.group(1)) if experience else 0
-        
+        """Fallback to basic analysis if OpenAI fails
+
+        Skills, job titles and languages come from the taxonomy matcher in
+        `skills_engine`, years of experience from the dated positions.
+        """
+        ANALYSIS_FALLBACKS.inc()
+        started = time.perf_counter()
+        matches = get_skills_matcher().match(text)
+        experience = parse_experience(text)
+        total_ms = (time.perf_counter() - started) * 1000
+
         return {
             'skills': {
-                'technical': list(set(technical_skills)),
-                'soft': list(set(soft_skills))
+                'technical': matches.names('technical'),
+                'soft': matches.names('soft'),
+                'languages': matches.names('language'),
+                'by_category': matches.by_category('technical'),
             },
+            'job_titles': matches.names('title'),
             'experience': {
-                'years': years_of_experience,
+                'years': experience.years,
+                'months': experience.months,
+                'stated_years': experience.stated_years,
+                'positions': experience.positions,
                 'industries': []
             },
             'education': [],
             'recommendations': [
                 "Consider using OpenAI for more accurate analysis"
             ],
+            'timings_ms': {
+                'skills': round(matches.elapsed_ms, 2),
+                'experience': round(experience.elapsed_ms, 2),
+                'total': round(total_ms, 2),
+            },
             'analysis_date': datetime.utcnow().isoformat()
         }
 
     def extract_profile_picture(self, filepath: str):
         """Extract the first image found in the PDF and return it as (bytes, ext).
 
-        This naive implementation assumes the first embedded raster image
-        corresponds to the candidate's profile picture.  The method relies on
-        PyMuPDF (package name `PyMuPDF`, import name `fitz`) for robust image
-        extraction.  If the library is not installed the caller will receive an
-        informative exception so that the API layer can surface a clear error
-        message.
+        See `extract_profile_image` for details.
+        """
+        image = self.extract_profile_image(filepath)
+        return image["image"], image["ext"]
+
+    def extract_profile_image(self, filepath: str) -> Dict[str, Any]:
+        """Extract the first image found in the PDF.
+
+        Returns PyMuPDF's image dict (``image`` bytes, ``ext``, ``width``,
+        ``height``, ...).  This naive implementation assumes the first
+        embedded raster image corresponds to the candidate's profile picture.
+        The method relies on PyMuPDF (package name `PyMuPDF`, import name
+        `fitz`) for robust image extraction.  If the library is not installed
+        the caller will receive an informative exception so that the API layer
+        can surface a clear error message.
         """
         try:
             import fitz  # PyMuPDF
@@ -91,18 +139,17 @@ class PDFProcessor:
                 "PyMuPDF is required for profile-picture extraction. Add `PyMuPDF` to your dependencies."
             )
 
+        doc = fitz.open(filepath)
         try:
-            doc = fitz.open(filepath)
             for page in doc:
                 images = page.get_images(full=True)
                 if not images:
                     continue
                 # pick the first image entry -> (xref, smask, width, height, bpc, colorspace, alt, name, filter)
                 xref = images[0][0]
-                base_image = doc.extract_image(xref)
-                return base_image["image"], base_image["ext"]
+                return doc.extract_image(xref)
 
             # If we reach here, no images were found
-            raise Exception("No images found in the provided PDF.")
+            raise NoImageFound("No images found in the provided PDF.")
         finally:
             doc.close()
@@ -7,12 +7,57 @@ Lightweight wrapper around two pre-trained open-source models:
 
 Both libraries fetch model weights on first use and cache them under
 ~/.cache, so subsequent calls are fast.
+
+Serving notes:
+
+* Nothing heavy is imported at module import; the models are loaded on first
+  use, or when the worker starts if ``PHOTO_ANALYZER_WARMUP`` is on (default):
+  gunicorn's ``post_worker_init`` hook and the ASGI lifespan startup both
+  call `start_warm_up`.  Without deepface/numpy installed,
+  `PhotoAnalyzer.analyze` raises `PhotoAnalyzerUnavailable`.
+* A request that waits longer than ``PHOTO_ANALYZE_TIMEOUT`` seconds for its
+  batch raises `PhotoAnalyzerTimeout`.
+* Concurrent requests are collected for up to ``PHOTO_BATCH_MAX_WAIT_MS`` (or
+  ``PHOTO_BATCH_SIZE`` images) and the emotion model classifies them in one
+  forward pass.  The aesthetic predictor has no batch API and scores the
+  images of a batch one by one.
+* Results are memoised per process by image content hash, and concurrent
+  requests for the same image share one inference.
 """
+import hashlib
 import importlib
-from deepface import DeepFace
-from PIL import Image
 import io
-import numpy as np
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List
+
+from analysis_cache import LRUTTLCache
+from metrics import cache_lookup, timed
+
+PHOTO_ANALYZER_WARMUP = os.environ.get('PHOTO_ANALYZER_WARMUP', '1').lower() not in ('0', 'false', 'no')
+PHOTO_BATCH_SIZE = int(os.environ.get('PHOTO_BATCH_SIZE', 8))
+PHOTO_BATCH_MAX_WAIT_MS = float(os.environ.get('PHOTO_BATCH_MAX_WAIT_MS', 10))
+PHOTO_RESULT_CACHE_SIZE = int(os.environ.get('PHOTO_RESULT_CACHE_SIZE', 1024))
+PHOTO_ANALYZE_TIMEOUT = float(os.environ.get('PHOTO_ANALYZE_TIMEOUT', 120))
+
+# Output order of DeepFace's emotion model
+EMOTION_LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+EMOTION_INPUT_SIZE = (48, 48)
+
+# Bump when the models or metrics change (part of the analysis ETag)
+PHOTO_ANALYSIS_VERSION = '1'
+
+
+class PhotoAnalyzerUnavailable(ImportError):
+    """The optional model dependencies (deepface, numpy, ...) are not installed."""
+
+
+class PhotoAnalyzerTimeout(TimeoutError):
+    """The analysis did not finish within ``PHOTO_ANALYZE_TIMEOUT`` seconds."""
+
 
 # Try to locate the predict_from_pil function regardless of the internal
 # layout of aesthetic_predictor (which changed between 0.1.x and 0.2.x).
@@ -21,56 +66,311 @@ def _load_aesthetic_fn():
         module = importlib.import_module("aesthetic_predictor.predict")
         return module.predict_from_pil  # type: ignore
     except ModuleNotFoundError:
+        pass
+    try:
         # Fallback: some versions expose it directly in the package
         ap = importlib.import_module("aesthetic_predictor")
         if hasattr(ap, "predict_from_pil"):
             return getattr(ap, "predict_from_pil")
-        # Library not available – return a dummy scorer
-        def _dummy(img):
-            return 5.0
-        return _dummy
+    except ModuleNotFoundError:
+        pass
+
+    # Library not available – return a dummy scorer
+    def _dummy(img):
+        return 5.0
+    return _dummy
+
+
+# ---------------------------------------------------------------------------
+# Models
+# ---------------------------------------------------------------------------
+
+class _Models:
+    """The loaded models of this process."""
+
+    def __init__(self):
+        try:
+            import numpy as np
+            from deepface import DeepFace
+            from PIL import Image
+        except ImportError as e:
+            raise PhotoAnalyzerUnavailable(f"Photo analysis dependencies not installed: {e}") from e
+        self.np = np
+        self.DeepFace = DeepFace
+        self.Image = Image
+        self.predict_aesthetic = _load_aesthetic_fn()
+        self.emotion_model = self._build_emotion_model()
+
+    def _build_emotion_model(self):
+        """The Keras emotion classifier, or ``None`` to fall back to
+        `DeepFace.analyze` per image."""
+        try:
+            try:
+                client = self.DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+            except TypeError:
+                # deepface < 0.0.93 has no ``task`` argument
+                client = self.DeepFace.build_model("Emotion")
+        except Exception as e:
+            print(f"Emotion model could not be loaded for batching: {e}")
+            return None
+        model = getattr(client, "model", client)
+        return model if hasattr(model, "predict") else None
+
+    def _face(self, img):
+        """Grey-scale 48x48 face crop in [0, 1], as the emotion model expects."""
+        np = self.np
+        faces = self.DeepFace.extract_faces(
+            img_path=np.array(img),
+            detector_backend="opencv",
+            enforce_detection=False,
+        )
+        face = faces[0]["face"] if faces else np.asarray(img, dtype=np.float32) / 255.0
+        if face.max() <= 1.0:
+            face = face * 255.0
+        crop = self.Image.fromarray(face.astype(np.uint8)).convert("L").resize(EMOTION_INPUT_SIZE)
+        return np.asarray(crop, dtype=np.float32) / 255.0
+
+    def emotions(self, images) -> List[Dict[str, float]]:
+        """Emotion percentages of every image."""
+        if self.emotion_model is not None:
+            batch = self.np.stack([self._face(img) for img in images])[..., None]
+            probabilities = self.emotion_model.predict(batch, verbose=0)
+            return [
+                {label: float(p) * 100 for label, p in zip(EMOTION_LABELS, row)}
+                for row in probabilities
+            ]
+
+        results = []
+        for img in images:
+            # DeepFace may return a dict or a list of dicts
+            analysis = self.DeepFace.analyze(
+                img_path=self.np.array(img),
+                actions=["emotion"],
+                enforce_detection=False,
+                silent=True,
+            )
+            if isinstance(analysis, list):
+                analysis = analysis[0] if analysis else {}
+            results.append(analysis.get("emotion", {}) if isinstance(analysis, dict) else {})
+        return results
+
+    def analyze(self, images) -> List[Dict[str, float]]:
+        emotions = self.emotions(images)
+        results = []
+        for img, emotion in zip(images, emotions):
+            aesthetic_score = float(self.predict_aesthetic(img))
+            # Positive emotions indicating confidence
+            positive = emotion.get("happy", 0) + emotion.get("neutral", 0)
+            results.append({
+                "aesthetic": round(aesthetic_score, 2),
+                "confidence": round(positive / 100.0, 2),  # convert % → [0,1]
+            })
+        return results
+
+
+_models: _Models | None = None
+_models_error: PhotoAnalyzerUnavailable | None = None
+_models_lock = threading.Lock()
+
+
+def load_models() -> _Models:
+    """Load the models once per process; raises `PhotoAnalyzerUnavailable`."""
+    global _models, _models_error
+    if _models is not None:
+        return _models
+    with _models_lock:
+        if _models is None:
+            if _models_error is not None:
+                raise _models_error
+            started = time.perf_counter()
+            try:
+                _models = _Models()
+            except PhotoAnalyzerUnavailable as e:
+                _models_error = e
+                raise
+            print(f"Photo analyzer models loaded in {time.perf_counter() - started:.1f}s")
+    return _models
+
+
+# ---------------------------------------------------------------------------
+# Micro-batching
+# ---------------------------------------------------------------------------
+
+class _MicroBatcher:
+    """Collects submitted items on one thread and processes them in batches.
+
+    A batch is closed when it holds ``max_size`` items or ``max_wait``
+    seconds after its first item arrived, whichever comes first.
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], max_size: int, max_wait: float):
+        self.fn = fn
+        self.max_size = max(1, max_size)
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[tuple[Any, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, item: Any) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _ensure_started(self) -> None:
+        # Threads do not survive fork; start one per process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            threading.Thread(target=self._run, name="photo-batcher", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                results = self.fn([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+def _analyze_batch(images_bytes: List[bytes]) -> List[Any]:
+    """Decode and analyse a batch; undecodable images fail on their own."""
+    models = load_models()
+    images, results = [], []
+    for data in images_bytes:
+        try:
+            images.append(models.Image.open(io.BytesIO(data)).convert("RGB"))
+            results.append(None)
+        except Exception as e:
+            results.append(e)
+    analysed = iter(models.analyze(images) if images else [])
+    return [next(analysed) if result is None else result for result in results]
+
+
+_batcher = _MicroBatcher(_analyze_batch, PHOTO_BATCH_SIZE, PHOTO_BATCH_MAX_WAIT_MS / 1000)
+_results = LRUTTLCache(maxsize=PHOTO_RESULT_CACHE_SIZE, ttl=float('inf'))
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.RLock()
+
+
+def _forget(key: str, future: Future) -> None:
+    # Only if *future* is still the one in flight; a newer request may have
+    # replaced it after a timeout
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def _finish(key: str, future: Future) -> None:
+    _forget(key, future)
+    if future.exception() is None:
+        _results.set(key, future.result())
 
-predict_from_pil = _load_aesthetic_fn()
 
 class PhotoAnalyzer:
     """Provide aesthetic (beauty) and confidence metrics for a face photo."""
 
     def __init__(self):
-        # No heavy initialisation; models load lazily on first call.
+        # No heavy initialisation; models are shared by the whole process.
         pass
 
-    def analyze(self, image_bytes: bytes):
+    def analyze(self, image_bytes: bytes, content_hash: str | None = None):
         """Compute metrics.
 
-        Returns a dict:
+        *content_hash* is the SHA-256 of *image_bytes* if the caller already
+        has it.  Returns a dict:
             {
               "aesthetic": float  # 0-10, higher = more attractive/pleasing
               "confidence": float # 0-1, higher = more confident expression
             }
         """
-        img_pil = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        key = content_hash or hashlib.sha256(image_bytes).hexdigest()
+        cached = _results.get(key)
+        if cached is not None:
+            cache_lookup('photo', 'hit')
+            return dict(cached)
+        cache_lookup('photo', 'miss')
 
-        # 1. Aesthetic score
-        aesthetic_score = float(predict_from_pil(img_pil))
+        with timed('photo_analyze'):
+            load_models()
+            with _inflight_lock:
+                future = _inflight.get(key)
+                if future is None:
+                    future = _batcher.submit(image_bytes)
+                    _inflight[key] = future
+                    future.add_done_callback(lambda f: _finish(key, f))
+            try:
+                return dict(future.result(timeout=PHOTO_ANALYZE_TIMEOUT))
+            except FutureTimeoutError:
+                # Let the next request submit the image again rather than
+                # wait on a batch that is stuck
+                _forget(key, future)
+                raise PhotoAnalyzerTimeout(
+                    f"Photo analysis did not finish within {PHOTO_ANALYZE_TIMEOUT:g}s") from None
 
-        # 2. Emotion analysis – DeepFace may return a dict or a list of dicts
-        analysis = DeepFace.analyze(
-            img_path=np.array(img_pil),
-            actions=["emotion"],
-            enforce_detection=False,
-            silent=True,
-        )
 
-        # Normalise to a single dict
-        if isinstance(analysis, list):
-            analysis = analysis[0] if analysis else {}
+# ---------------------------------------------------------------------------
+# Warm-up
+# ---------------------------------------------------------------------------
+
+_warm_up_pid = None
+_warm_up_lock = threading.Lock()
+
 
-        emotions = analysis.get("emotion", {}) if isinstance(analysis, dict) else {}
-        # Positive emotions indicating confidence
-        positive = emotions.get("happy", 0) + emotions.get("neutral", 0)
-        confidence_score = positive / 100.0  # convert % → [0,1]
+def warm_up() -> bool:
+    """Load the models and run one inference so the first request does not
+    pay for weight downloads and graph building."""
+    try:
+        models = load_models()
+    except PhotoAnalyzerUnavailable as e:
+        print(f"Photo analyzer disabled: {e}")
+        return False
+    started = time.perf_counter()
+    models.analyze([models.Image.new("RGB", (64, 64), (128, 128, 128))])
+    print(f"Photo analyzer warmed up in {time.perf_counter() - started:.1f}s")
+    return True
+
+
+def start_warm_up() -> None:
+    """Warm up in a background thread, once per process.
+
+    A no-op unless ``PHOTO_ANALYZER_WARMUP`` is on.
+    """
+    global _warm_up_pid
+    if not PHOTO_ANALYZER_WARMUP or _warm_up_pid == os.getpid():
+        return
+    with _warm_up_lock:
+        if _warm_up_pid == os.getpid():
+            return
+        _warm_up_pid = os.getpid()
+        threading.Thread(target=_safe_warm_up, name="photo-warm-up", daemon=True).start()
+
+
+def _safe_warm_up() -> None:
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"Photo analyzer warm-up failed: {e}")
 
-        return {
-            "aesthetic": round(aesthetic_score, 2),
-            "confidence": round(confidence_score, 2),
-        }
@@ -0,0 +1,86 @@
+"""Profile pictures extracted from resume PDFs.
+
+The first image of a PDF is extracted once, written to a deterministic key
+(``profile_pictures/<resume id>.<ext>`` in the storage, see `storage.py`) and recorded in a
+`ProfilePicture` row together with its format, dimensions and content hash.
+Requests look the row up by resume id instead of scanning the directory, and
+the content hash doubles as the ETag.  PDFs without an image get a row too,
+so they are not re-parsed on every request.
+
+``PROFILE_PICTURE_EAGER`` (default on) extracts the picture at upload time.
+"""
+import hashlib
+import os
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Resume, ProfilePicture
+from analysis_service import resume_pdf_file
+from pdf_processor import PDFProcessor, NoImageFound
+from storage import get_storage
+
+PICTURE_DIR = 'profile_pictures'
+PROFILE_PICTURE_EAGER = os.environ.get('PROFILE_PICTURE_EAGER', '1').lower() not in ('0', 'false', 'no')
+
+MIME_TYPES = {
+    'jpeg': 'image/jpeg',
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'bmp': 'image/bmp',
+    'tiff': 'image/tiff',
+    'jpx': 'image/jp2',
+    'jp2': 'image/jp2',
+}
+
+
+def extract_profile_picture(resume: Resume, processor: PDFProcessor | None = None) -> ProfilePicture:
+    """Extract and record the picture of *resume*; returns the stored row.
+
+    Raises whatever the extraction raises except `NoImageFound`, which is
+    recorded as a row without ``path``.
+    """
+    processor = processor or PDFProcessor()
+    picture = ProfilePicture(resume_id=resume.id)
+    try:
+        with resume_pdf_file(resume) as path:
+            image = processor.extract_profile_image(path)
+    except NoImageFound:
+        image = None
+
+    if image is not None:
+        data = image['image']
+        ext = image['ext'].lower()
+        picture.path = f"{PICTURE_DIR}/{resume.id}.{ext}"
+        picture.format = ext
+        picture.mime_type = MIME_TYPES.get(ext, 'application/octet-stream')
+        picture.width = image.get('width')
+        picture.height = image.get('height')
+        picture.byte_size = len(data)
+        picture.content_hash = hashlib.sha256(data).hexdigest()
+        get_storage().write(picture.path, data)
+
+    db.session.add(picture)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Extracted concurrently by another request; same file, same path
+        db.session.rollback()
+        picture = db.session.get(ProfilePicture, resume.id)
+    return picture
+
+
+def get_profile_picture(resume: Resume, extract: bool = True) -> ProfilePicture | None:
+    """Stored picture row of *resume*, extracting it on first use.
+
+    Returns ``None`` only if nothing is stored and *extract* is false.
+    """
+    picture = db.session.get(ProfilePicture, resume.id)
+    if picture is not None and picture.path and not get_storage().exists(picture.path):
+        # File lost (e.g. fresh disk); extract again
+        db.session.delete(picture)
+        db.session.commit()
+        picture = None
+    if picture is None and extract:
+        picture = extract_profile_picture(resume)
+    return picture
@@ -0,0 +1,266 @@
+"""Token-budgeted compaction of resume text before it is sent to the LLM.
+
+Raw PDF text carries a lot of tokens that do not help the analysis: runs of
+whitespace, words hyphenated across line breaks, headers/footers repeated on
+every page, and sometimes garbage from embedded fonts.  `PromptCompactor`
+removes those and, if the text is still longer than the configured token
+budget, drops low-value sections (hobbies, references, ...) and finally
+truncates.  Every call reports the token count before and after.
+
+Tokens are counted locally with ``tiktoken`` when it (and its encoding file)
+is available, otherwise with a conservative word/character approximation.
+tiktoken downloads the encoding file on first use; the result, or the
+failure, is kept for the life of the process.  Hosts without outbound
+network access should fetch it at build time into ``TIKTOKEN_CACHE_DIR``::
+
+    TIKTOKEN_CACHE_DIR=/app/.tiktoken python -c "import tiktoken; tiktoken.get_encoding('cl100k_base')"
+"""
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+
+# Model -> tiktoken encoding, or None if it could not be loaded
+_encodings: Dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def _load_encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:  # Optional – fall back to an approximate counter
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"tiktoken unavailable, approximating token counts: {e}")
+        return None
+
+
+def get_encoding(model: str):
+    """The tiktoken encoding for *model*, loaded once per process; ``None``
+    if tiktoken or its encoding file is unavailable."""
+    if model not in _encodings:
+        with _encodings_lock:
+            if model not in _encodings:
+                _encodings[model] = _load_encoding(model)
+    return _encodings[model]
+
+
+class TokenCounter:
+    """Count and truncate text in model tokens."""
+
+    _APPROX_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]|\w+|[^\w\s]")
+
+    def __init__(self, model: str = "gpt-3.5-turbo"):
+        self.model = model
+
+    @property
+    def encoding(self):
+        # Loaded lazily: tiktoken may need to download the encoding file on
+        # first use, which must never break an analysis.
+        return get_encoding(self.model)
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return sum(self._approx(m.group(0)) for m in self._APPROX_PATTERN.finditer(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        used = 0
+        for m in self._APPROX_PATTERN.finditer(text):
+            used += self._approx(m.group(0))
+            if used > max_tokens:
+                return text[:m.start()]
+        return text
+
+    @staticmethod
+    def _approx(piece: str) -> int:
+        # ~4 characters per token for Latin words, one per CJK character
+        return max(1, -(-len(piece) // 4))
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    steps: List[str] = field(default_factory=list)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+class PromptCompactor:
+    """Clean up and shrink resume text to fit a token budget."""
+
+    # Garbage commonly produced by PDF text extraction
+    _GARBAGE = re.compile(
+        r"\(cid:\d+\)"                       # unmapped glyph ids
+        r"|[\ufffd\u200b-\u200f\u2060\ufeff]"   # replacement char, zero-width marks
+        r"|[\ue000-\uf8ff]"                     # private-use glyphs from icon fonts
+        r"|[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]"   # control characters
+    )
+    _HYPHENATION = re.compile(r"(\w)[-\u00ad]\n(?=[a-zäöüß])")
+    _PAGE_NUMBER = re.compile(
+        r"^(?:(?:page|seite)\s*)?\d{1,3}(?:\s*(?:/|of|von)\s*\d{1,3})?$|^-\s*\d{1,3}\s*-$",
+        re.IGNORECASE,
+    )
+
+    # Sections dropped (in this order) when the text exceeds the budget
+    LOW_VALUE_SECTIONS = (
+        r"referen(?:ces|zen)",
+        r"hobb(?:ies|ys)|interests|(?:persönliche\s+)?interessen|freizeit",
+        r"sonstiges|miscellaneous|other",
+        r"publi(?:cations|kationen)",
+        r"ehrenamt|volunteering|volunteer\s+work",
+    )
+    # Headings that start a new section; used to find where a section ends
+    SECTION_HEADINGS = (
+        r"(?:berufs|arbeits)?erfahrung|berufserfahrung|work\s+experience|experience|employment",
+        r"(?:aus)?bildung|education|studium",
+        r"skills|kenntnisse|fähigkeiten|kompetenzen",
+        r"sprachen|languages",
+        r"projekte|projects",
+        r"zertifi(?:kate|cates|cations)|certifications|weiterbildung",
+        r"profil|profile|summary|zusammenfassung|über mich|about me",
+        r"kontakt|contact|persönliche\s+daten|personal\s+(?:details|information)",
+    ) + LOW_VALUE_SECTIONS
+
+    def __init__(self, budget: int | None = None, model: str = "gpt-3.5-turbo",
+                 counter: TokenCounter | None = None):
+        self.budget = budget if budget is not None else int(os.environ.get("PROMPT_TOKEN_BUDGET", 6000))
+        self.counter = counter or TokenCounter(model)
+        self._heading = re.compile(
+            r"^\W{0,3}(?:%s)\W{0,3}$" % "|".join(self.SECTION_HEADINGS), re.IGNORECASE
+        )
+        self._low_value = [
+            re.compile(r"^\W{0,3}(?:%s)\W{0,3}$" % pattern, re.IGNORECASE)
+            for pattern in self.LOW_VALUE_SECTIONS
+        ]
+
+    def compact(self, text: str, pages: Sequence[str] | None = None) -> CompactionResult:
+        """Compact *text*; pass per-page *pages* to detect page furniture."""
+        tokens_before = self.counter.count(text)
+        steps = []
+
+        cleaned = self._GARBAGE.sub("", text)
+        if cleaned != text:
+            steps.append("garbage")
+        text = cleaned
+
+        text, changed = self._dehyphenate(text)
+        if changed:
+            steps.append("hyphenation")
+
+        text = self._collapse_whitespace(text)
+
+        text, removed = self._strip_furniture(text, pages)
+        if removed:
+            steps.append(f"furniture:{removed}")
+
+        tokens = self.counter.count(text)
+        if self.budget > 0 and tokens > self.budget:
+            for pattern in self._low_value:
+                text, dropped = self._drop_section(text, pattern)
+                if dropped:
+                    steps.append(f"section:{dropped}")
+                    tokens = self.counter.count(text)
+                    if tokens <= self.budget:
+                        break
+
+        if self.budget > 0 and tokens > self.budget:
+            text = self.counter.truncate(text, self.budget)
+            tokens = self.counter.count(text)
+            steps.append("truncated")
+
+        return CompactionResult(text=text, tokens_before=tokens_before, tokens_after=tokens, steps=steps)
+
+    # ------------------------------------------------------------------
+    def _dehyphenate(self, text: str):
+        joined = self._HYPHENATION.sub(r"\1", text)
+        return joined, joined != text
+
+    @staticmethod
+    def _collapse_whitespace(text: str) -> str:
+        text = re.sub(r"[ \t\u00a0]+", " ", text)
+        text = re.sub(r" *\n *", "\n", text)
+        text = re.sub(r"\n{3,}", "\n\n", text)
+        return text.strip()
+
+    def _strip_furniture(self, text: str, pages: Sequence[str] | None):
+        """Remove page numbers and header/footer lines repeated across pages.
+
+        Repetition is only judged with per-page text: without it a repeated
+        line ("Aufgaben:") is as likely to be content as furniture, and a
+        line such as "3 / 5" as likely a skill level as a page number.
+        """
+        lines = text.split("\n")
+        repeated = set()
+        numbers = Counter()
+        if pages and len(pages) > 1:
+            seen = {}
+            edges = {0: [], -1: []}
+            for page in pages:
+                page = self._collapse_whitespace(self._GARBAGE.sub("", page))
+                page_lines = [l for l in page.split("\n") if l]
+                if len(page_lines) < 2:
+                    continue
+                # Page numbers change from page to page: look for the pattern
+                # on the first and last line instead of the same text
+                for edge in edges:
+                    if self._PAGE_NUMBER.match(page_lines[edge]):
+                        edges[edge].append(page_lines[edge])
+                if len(page_lines) <= 6:
+                    continue
+                # Only the top and bottom of a page can be furniture
+                for line in set(page_lines[:2] + page_lines[-2:]):
+                    seen[line] = seen.get(line, 0) + 1
+            threshold = max(2, (len(pages) + 1) // 2)
+            repeated = {l for l, n in seen.items()
+                        if n >= threshold and len(l) <= 120 and not self._heading.match(l)}
+            for found in edges.values():
+                if len(found) >= threshold:
+                    numbers.update(found)
+
+        kept = self._without(lines, repeated, numbers)
+        if len(kept) < len(lines) * 0.8:
+            # Implausibly much "furniture": more likely repeated content, keep it
+            kept = self._without(lines, set(), numbers)
+        return "\n".join(kept), len(lines) - len(kept)
+
+    @staticmethod
+    def _without(lines: List[str], repeated: set, numbers: Counter) -> List[str]:
+        # Each page number found at a page edge is removed once
+        numbers = Counter(numbers)
+        kept = []
+        for line in lines:
+            if line in repeated:
+                continue
+            if numbers[line] > 0:
+                numbers[line] -= 1
+                continue
+            kept.append(line)
+        return kept
+
+    def _drop_section(self, text: str, pattern):
+        lines = text.split("\n")
+        out, dropping, dropped = [], False, None
+        for line in lines:
+            if pattern.match(line):
+                dropping, dropped = True, line.strip()
+                continue
+            if dropping and self._heading.match(line):
+                dropping = False
+            if not dropping:
+                out.append(line)
+        return "\n".join(out), dropped
@@ -0,0 +1,250 @@
+"""Client-side rate limiting for OpenAI calls.
+
+The OpenAI account limits requests per minute (RPM) and tokens per minute
+(TPM).  `RateLimiter` keeps one token bucket for each and makes callers wait
+before a request that would exceed either, so a large batch runs at the
+account's rate instead of running into a wall of 429 responses.  429s that
+still happen are retried by `retry_rate_limited` with jittered exponential
+backoff (honouring ``Retry-After``), and they pause the limiter for every
+caller in the process.
+
+Limits are per process: with several gunicorn workers, give each worker its
+share of the account limits.  Both default to ``0``, so the limiter does
+nothing until they are set.
+
+Interactive callers take their share in arrival order, possibly queueing
+behind each other.  Calls made inside `background` (batch jobs) never queue
+ahead of them: they only go when the buckets are fuller than the
+``OPENAI_INTERACTIVE_SHARE`` kept free for interactive requests, so an
+analysis a user is waiting for does not queue behind hundreds of batch items.
+
+Configuration (environment variables):
+
+``OPENAI_RPM_LIMIT``          requests per minute (``0`` = unlimited)
+``OPENAI_TPM_LIMIT``          tokens per minute (``0`` = unlimited)
+``OPENAI_INTERACTIVE_SHARE``  fraction of each bucket background calls leave free (default 0.2)
+``OPENAI_RATE_LIMIT_RETRIES`` retries of a request answered with 429
+"""
+import asyncio
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator
+
+# Bucket capacity in seconds of refill: allows short bursts without letting a
+# queue of hundreds of items fire all at once
+BURST_SECONDS = 10
+
+
+class TokenBucket:
+    """Bucket refilled continuously at ``per_minute / 60`` per second.
+
+    `reserve` always takes the amount and returns how long the caller has to
+    wait before using it, so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # A single request larger than the bucket must still be able to run
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def shortfall(self, amount: float, floor: float, now: float) -> float:
+        """Seconds until *amount* can be taken while leaving *floor* (a
+        fraction of the capacity) in the bucket; ``0`` if it can be now."""
+        self._refill(now)
+        needed = min(self.capacity, min(amount, self.capacity) + floor * self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def pause(self, seconds: float, now: float) -> None:
+        self._refill(now)
+        self.tokens = min(self.tokens, -self.rate * seconds)
+
+
+class RateLimiter:
+    """RPM + TPM limiter shared by all threads (and event loops) of a process."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, interactive_share: float = 0.2):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.interactive_share = interactive_share
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request using *tokens*; returns the seconds to wait."""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.requests is not None:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            return wait
+
+    def try_reserve_background(self, tokens: int) -> float:
+        """Reserve one background request if the buckets hold more than the
+        interactive share; otherwise take nothing and return the seconds to
+        wait before trying again."""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            buckets = [(b, amount) for b, amount in ((self.requests, 1), (self.tokens, tokens)) if b is not None]
+            wait = max(b.shortfall(amount, self.interactive_share, now) for b, amount in buckets)
+            if wait == 0:
+                for b, amount in buckets:
+                    b.take(amount)
+            return wait
+
+    def acquire(self, tokens: int) -> None:
+        if _background.get():
+            # Re-check rather than queue, so interactive callers overtake
+            while (wait := self.try_reserve_background(tokens)) > 0:
+                time.sleep(min(wait, 1.0))
+            return
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int) -> None:
+        if _background.get():
+            while (wait := self.try_reserve_background(tokens)) > 0:
+                await asyncio.sleep(min(wait, 1.0))
+            return
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Give back tokens reserved for a request that used fewer."""
+        if self.tokens is not None and used < reserved:
+            with self._lock:
+                self.tokens.refund(reserved - used, time.monotonic())
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for *seconds*, e.g. after a 429."""
+        with self._lock:
+            now = time.monotonic()
+            for bucket in (self.requests, self.tokens):
+                if bucket is not None:
+                    bucket.pause(seconds, now)
+
+
+_background = contextvars.ContextVar('rate_limiter_background', default=False)
+
+
+@contextmanager
+def background() -> Iterator[None]:
+    """Give the OpenAI calls made in this block (in this thread) the low,
+    batch priority."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+# ---------------------------------------------------------------------------
+# 429 handling
+# ---------------------------------------------------------------------------
+
+def _is_rate_limited(error: BaseException) -> bool:
+    # An OpenAI error implies the package was imported; never import it here
+    openai = sys.modules.get('openai')
+    return openai is not None and isinstance(error, openai.RateLimitError)
+
+
+def backoff_delay(attempt: int, error: BaseException | None = None,
+                  base: float = 1.0, cap: float = 60.0) -> float:
+    """Delay before retry *attempt* (0-based): ``Retry-After`` if the server
+    sent one, otherwise exponential backoff with full jitter."""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(cap, float(retry_after)) + random.uniform(0, base)
+    except ValueError:
+        pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_rate_limited(fn: Callable[[], Any], limiter: RateLimiter | None = None,
+                       retries: int | None = None) -> Any:
+    """Call *fn*, retrying 429 responses with jittered backoff."""
+    retries = retries if retries is not None else int(os.environ.get('OPENAI_RATE_LIMIT_RETRIES', 5))
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if not _is_rate_limited(e) or attempt == retries:
+                raise
+            delay = backoff_delay(attempt, e)
+            print(f"OpenAI rate limit hit, retrying in {delay:.1f}s (attempt {attempt + 1}/{retries})")
+            if limiter is not None:
+                limiter.pause(delay)
+            time.sleep(delay)
+
+
+async def aretry_rate_limited(fn: Callable[[], Awaitable[Any]], limiter: RateLimiter | None = None,
+                              retries: int | None = None) -> Any:
+    """Asyncio variant of `retry_rate_limited`."""
+    retries = retries if retries is not None else int(os.environ.get('OPENAI_RATE_LIMIT_RETRIES', 5))
+    for attempt in range(retries + 1):
+        try:
+            return await fn()
+        except Exception as e:
+            if not _is_rate_limited(e) or attempt == retries:
+                raise
+            delay = backoff_delay(attempt, e)
+            print(f"OpenAI rate limit hit, retrying in {delay:.1f}s (attempt {attempt + 1}/{retries})")
+            if limiter is not None:
+                limiter.pause(delay)
+            await asyncio.sleep(delay)
+
+
+# ---------------------------------------------------------------------------
+# Process-wide limiter
+# ---------------------------------------------------------------------------
+_limiter: RateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the limiter configured via ``OPENAI_RPM_LIMIT``/``OPENAI_TPM_LIMIT``."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(
+                    rpm=float(os.environ.get('OPENAI_RPM_LIMIT', 0)),
+                    tpm=float(os.environ.get('OPENAI_TPM_LIMIT', 0)),
+                    interactive_share=float(os.environ.get('OPENAI_INTERACTIVE_SHARE', 0.2)),
+                )
+    return _limiter
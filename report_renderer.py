@@ -0,0 +1,183 @@
+"""PDF reports of resume analyses.
+
+The reportlab setup (font lookup and registration, the paragraph styles) is
+done once per process, and reports are rendered into memory.  Finished PDFs
+are cached by a hash of the analysis Markdown in two tiers:
+
+1. An in-process LRU (``REPORT_MEMORY_CACHE_SIZE`` reports).
+2. Files under ``reports/<hash>.pdf`` in the storage (see `storage.py`),
+   shared by all workers and kept across restarts.
+
+so sending the same analysis again, or downloading it, skips rendering.
+Bump `RENDERER_VERSION` when the layout changes to invalidate old reports.
+"""
+import glob
+import hashlib
+import io
+import os
+import threading
+from typing import Tuple
+
+from analysis_cache import LRUTTLCache
+from metrics import cache_lookup, timed
+from storage import get_storage
+
+RENDERER_VERSION = '1'
+REPORT_DIR = 'reports'
+REPORT_MEMORY_CACHE_SIZE = int(os.environ.get('REPORT_MEMORY_CACHE_SIZE', 64))
+
+FONT_NAME = 'NotoSans'
+
+
+class ReportUnavailable(ImportError):
+    """reportlab is not installed."""
+
+
+def report_key(markdown: str) -> str:
+    """Cache key of the report for *markdown*."""
+    return hashlib.sha256(f"{RENDERER_VERSION}\n{markdown}".encode('utf-8')).hexdigest()
+
+
+def report_file(key: str) -> str:
+    """Storage key of a rendered report."""
+    return f"{REPORT_DIR}/{key}.pdf"
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+def _font_paths():
+    """Candidate fonts that support Chinese characters (e.g. NotoSansCJK)."""
+    paths = [
+        os.path.join(os.getcwd(), 'fonts', 'NotoSansCJKsc-Regular.otf'),
+        os.path.join(os.getcwd(), 'fonts', 'NotoSansCJKsc-Regular.ttf'),
+        os.path.join(os.getcwd(), 'NotoSansCJKsc-Regular.otf'),
+        os.path.join(os.getcwd(), 'NotoSansCJKsc-Regular.ttf'),
+        '/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc',
+    ]
+    # also accept any NotoSans* TTF/OTF in ./fonts directory
+    paths.extend(glob.glob(os.path.join(os.getcwd(), 'fonts', 'NotoSans*.*tf')))
+    return paths
+
+
+class _Renderer:
+    """reportlab modules, registered font and styles of this process."""
+
+    def __init__(self):
+        try:
+            from reportlab.lib.pagesizes import letter
+            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+        except ImportError as e:
+            raise ReportUnavailable("Server missing reportlab package for PDF generation") from e
+        self.letter = letter
+        self.SimpleDocTemplate = SimpleDocTemplate
+        self.Paragraph = Paragraph
+        self.Spacer = Spacer
+        # reportlab keeps module-level state while building; render one at a time
+        self._lock = threading.Lock()
+
+        font_registered = False
+        for path in _font_paths():
+            if os.path.exists(path):
+                try:
+                    pdfmetrics.registerFont(TTFont(FONT_NAME, path))
+                    font_registered = True
+                    break
+                except Exception:
+                    pass
+        # Without a CJK font Chinese will not render; continue with the default
+
+        self.styles = getSampleStyleSheet()
+        self.styles.add(
+            ParagraphStyle(
+                name="MarkdownBullet",
+                parent=self.styles["Normal"],
+                bulletIndent=0,
+                leftIndent=12,
+                firstLineIndent=-6,
+            )
+        )
+        if font_registered:
+            for name in ["Normal", "Heading2", "Heading3", "MarkdownBullet"]:
+                self.styles[name].fontName = FONT_NAME
+
+    def render(self, markdown: str) -> bytes:
+        """Render *markdown* with basic formatting; Platypus handles wrapping."""
+        styles = self.styles
+        story = []
+        for raw in markdown.split("\n"):
+            line = raw.strip()
+            if not line:
+                story.append(self.Spacer(1, 10))
+                continue
+
+            # Simple markdown cues
+            if line.startswith("###"):
+                story.append(self.Paragraph(line[3:].strip(), styles["Heading3"]))
+            elif line.startswith("##"):
+                story.append(self.Paragraph(line[2:].strip(), styles["Heading2"]))
+            elif line.startswith("- ") or line.startswith("• "):
+                story.append(self.Paragraph(line[2:].strip(), styles["MarkdownBullet"]))
+            else:
+                story.append(self.Paragraph(line, styles["Normal"]))
+
+        buffer = io.BytesIO()
+        doc = self.SimpleDocTemplate(
+            buffer,
+            pagesize=self.letter,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=72,
+        )
+        with self._lock:
+            doc.build(story)
+        return buffer.getvalue()
+
+
+_renderer: _Renderer | None = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> _Renderer:
+    """The process-wide renderer; raises `ReportUnavailable`."""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = _Renderer()
+    return _renderer
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+_reports = LRUTTLCache(maxsize=REPORT_MEMORY_CACHE_SIZE, ttl=float('inf'))
+
+
+def get_report_pdf(markdown: str) -> Tuple[str, bytes]:
+    """Return ``(key, pdf bytes)`` of the report for *markdown*, rendering
+    it only if no worker has done so before."""
+    key = report_key(markdown)
+    data = _reports.get(key)
+    if data is not None:
+        cache_lookup('report', 'memory_hit')
+        return key, data
+
+    storage = get_storage()
+    try:
+        data = storage.read(report_file(key))
+        cache_lookup('report', 'storage_hit')
+    except FileNotFoundError:
+        cache_lookup('report', 'miss')
+        with timed('report_render'):
+            data = get_renderer().render(markdown)
+        storage.write(report_file(key), data)
+
+    _reports.set(key, data)
+    return key, data
@@ -0,0 +1,98 @@
+"""Request coalescing ("single-flight") for expensive computations.
+
+Two layers are provided:
+
+* `SingleFlight` – within one process, concurrent callers with the same key
+  wait for the first caller's result instead of repeating the work.
+* `acquire_lock` / `release_lock` – a lock row in the shared database, so
+  callers in *other* gunicorn workers can tell that the work is already in
+  progress and wait for its stored result.  Locks expire after a TTL so a
+  crashed worker cannot block a key forever.
+
+The database helpers need an active Flask app context.
+"""
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AnalysisLock
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls with the same key inside one process."""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run *fn* unless a call for *key* is already in flight; in that case
+        block until it finishes and return (or raise) its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def acquire_lock(key: str, ttl: float) -> str | None:
+    """Try to take the cross-process lock for *key*.
+
+    Returns an owner token on success or ``None`` if another live caller
+    holds the lock.  Expired locks are taken over.
+    """
+    now = datetime.utcnow()
+    owner = uuid.uuid4().hex
+    AnalysisLock.query.filter(AnalysisLock.key == key, AnalysisLock.expires_at < now).delete()
+    db.session.add(AnalysisLock(key=key, owner=owner, expires_at=now + timedelta(seconds=ttl)))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return owner
+
+
+def release_lock(key: str, owner: str) -> None:
+    AnalysisLock.query.filter_by(key=key, owner=owner).delete()
+    db.session.commit()
+
+
+def lock_held(key: str) -> bool:
+    return AnalysisLock.query.filter(
+        AnalysisLock.key == key, AnalysisLock.expires_at >= datetime.utcnow()
+    ).first() is not None
@@ -0,0 +1,339 @@
+"""Offline skills, job-title and experience extraction.
+
+Used by `PDFProcessor.basic_analysis`, the fallback when OpenAI is not
+available, so it has to be fast: all traffic lands on it during an outage.
+
+The German/English taxonomy (``data/skills_taxonomy.json``, or the file named
+by ``SKILLS_TAXONOMY_PATH``) is compiled once per process into a word-level
+trie.  A resume is tokenised with a single regex and matched in one pass over
+its tokens, so the cost depends on the resume length, not on the number of
+terms: a full resume against ~10k terms takes about a millisecond.
+
+Experience is read from date ranges ("03/2018 – heute", "Jan 2015 - Dec
+2017", "seit 2020") outside the education section, merged so that parallel
+positions are not counted twice, and from explicit statements ("5 Jahre
+Berufserfahrung", "10+ years of experience").
+"""
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, Iterable, List, Tuple
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'skills_taxonomy.json')
+
+# Words, keeping the characters that matter in tech terms: C++, C#, .NET, Node.js
+TOKEN_PATTERN = re.compile(r"\.?\w[\w+#]*(?:\.\w+)*")
+
+_END = ''  # trie key marking a complete term; never a token
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text)
+
+
+@dataclass
+class Term:
+    name: str
+    type: str  # technical / soft / language / title
+    category: str
+
+
+@dataclass
+class Match:
+    term: Term
+    start: int  # token offsets
+    end: int
+
+
+@dataclass
+class MatchResult:
+    matches: List[Match]
+    token_count: int
+    elapsed_ms: float
+
+    def names(self, term_type: str) -> List[str]:
+        """Canonical names of *term_type* terms, most frequent first."""
+        counts: Dict[str, int] = {}
+        for m in self.matches:
+            if m.term.type == term_type:
+                counts[m.term.name] = counts.get(m.term.name, 0) + 1
+        return sorted(counts, key=lambda name: -counts[name])
+
+    def by_category(self, term_type: str) -> Dict[str, List[str]]:
+        categories: Dict[str, List[str]] = {}
+        for m in self.matches:
+            if m.term.type == term_type:
+                names = categories.setdefault(m.term.category, [])
+                if m.term.name not in names:
+                    names.append(m.term.name)
+        return categories
+
+
+class SkillMatcher:
+    """Single-pass multi-term matcher over a word-level trie.
+
+    Every surface form (name or synonym) is stored as its sequence of
+    case-folded tokens.  Matching walks the trie from each token of the text;
+    where terms of the same type overlap, the longest wins ("Spring Boot"
+    over "Spring"), while a skill inside a title ("Java" in
+    "Java-Entwickler") is still reported.
+    """
+
+    _FEMININE = (('innen', ''), ('in', ''), ('frauen', 'leute'), ('frau', 'mann'))
+    _FEMININE_ENDINGS = ('in', 'frau', 'frauen')
+
+    def __init__(self, entries: Iterable[Dict[str, Any]]):
+        self.terms: List[Term] = []
+        self._root: Dict[str, Any] = {}
+        self._vocabulary = set()
+        self._fold_cache: Dict[str, str] = {}
+        self.form_count = 0
+        for entry in entries:
+            self.add(entry)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'SkillMatcher':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('skills', []) + data.get('titles', []))
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        term = Term(entry['name'], entry.get('type', 'technical'), entry.get('category', ''))
+        index = len(self.terms)
+        self.terms.append(term)
+        exact = set(entry.get('exact', ()))
+        for form in [entry['name'], *entry.get('synonyms', ())]:
+            tokens = tokenize(form)
+            if not tokens:
+                continue
+            node = self._root
+            for token in tokens:
+                folded = token.casefold()
+                self._vocabulary.add(folded)
+                node = node.setdefault(folded, {})
+            # (term index, tokens that must match case-sensitively or None)
+            node.setdefault(_END, []).append((index, tuple(tokens) if form in exact else None))
+            self.form_count += 1
+        self._fold_cache.clear()
+
+    def _fold(self, token: str) -> str:
+        folded = token.casefold()
+        if folded in self._vocabulary or not folded.endswith(self._FEMININE_ENDINGS):
+            return folded
+        # German feminine/plural job titles: Entwicklerin(nen) -> Entwickler,
+        # Bürokauffrau -> Bürokaufmann
+        for suffix, replacement in self._FEMININE:
+            if folded.endswith(suffix) and len(folded) > len(suffix) + 3:
+                candidate = folded[:-len(suffix)] + replacement
+                if candidate in self._vocabulary:
+                    return candidate
+        return folded
+
+    def match(self, text: str) -> MatchResult:
+        started = time.perf_counter()
+        tokens = tokenize(text)
+        cache = self._fold_cache
+        if len(cache) > 100_000:
+            cache.clear()
+        folded = []
+        for token in tokens:
+            f = cache.get(token)
+            if f is None:
+                f = cache[token] = self._fold(token)
+            folded.append(f)
+        root = self._root
+        n = len(folded)
+
+        candidates: List[Match] = []
+        for i in range(n):
+            node = root.get(folded[i])
+            j = i
+            while node is not None:
+                j += 1
+                for index, exact in node.get(_END, ()):
+                    if exact is None or tuple(tokens[i:j]) == exact:
+                        candidates.append(Match(self.terms[index], i, j))
+                node = node.get(folded[j]) if j < n else None
+
+        # Per type, keep the leftmost-longest non-overlapping matches
+        candidates.sort(key=lambda m: (m.start, m.start - m.end))
+        covered_until: Dict[str, int] = {}
+        matches = []
+        for m in candidates:
+            if m.start >= covered_until.get(m.term.type, 0):
+                matches.append(m)
+                covered_until[m.term.type] = m.end
+
+        return MatchResult(matches, n, (time.perf_counter() - started) * 1000)
+
+
+# ---------------------------------------------------------------------------
+# Experience dates
+# ---------------------------------------------------------------------------
+
+MONTHS = {
+    'jan': 1, 'januar': 1, 'january': 1, 'jän': 1, 'jänner': 1,
+    'feb': 2, 'februar': 2, 'february': 2,
+    'mar': 3, 'mär': 3, 'märz': 3, 'maerz': 3, 'march': 3, 'mrz': 3,
+    'apr': 4, 'april': 4,
+    'mai': 5, 'may': 5,
+    'jun': 6, 'juni': 6, 'june': 6,
+    'jul': 7, 'juli': 7, 'july': 7,
+    'aug': 8, 'august': 8,
+    'sep': 9, 'sept': 9, 'september': 9,
+    'okt': 10, 'oct': 10, 'oktober': 10, 'october': 10,
+    'nov': 11, 'november': 11,
+    'dez': 12, 'dec': 12, 'dezember': 12, 'december': 12,
+}
+_MONTH_NAMES = '|'.join(sorted(MONTHS, key=len, reverse=True))
+_DATE = (
+    r"(?:\d{1,2}\.)?\d{1,2}[./]\s?(?:19|20)\d{2}"      # 03/2018, 03.2018, 01.03.2018
+    r"|(?:19|20)\d{2}[-/]\d{1,2}(?!\d)"                 # 2018-03
+    rf"|(?<![a-zäöü])(?:{_MONTH_NAMES})\.?\s*(?:19|20)\d{{2}}"  # März 2018, Jan. 2018
+    r"|(?:19|20)\d{2}"                                  # 2018
+)
+_PRESENT = r"heute|present|current|now|today|aktuell|jetzt|dato|laufend|ongoing"
+RANGE_PATTERN = re.compile(
+    rf"(?<![\d.])(?P<start>{_DATE})\s*(?:[-–—]+|bis|to|until|till)\s*(?:(?:bis\s+)?(?P<present>{_PRESENT})\b|(?P<end>{_DATE}))"
+    rf"|\b(?:seit|since)\s+(?P<since>{_DATE})",
+    re.IGNORECASE,
+)
+STATED_PATTERN = re.compile(
+    r"(?:über|mehr als|more than|over)?\s*(\d{1,2})\s*\+?\s*(?:years?|jahre?n?)\s+(?:of\s+)?"
+    r"(?:professional\s+|relevant\s+|praktische\s+|einschlägige\s+)?(?:work\s+)?(?:experience|berufserfahrung|erfahrung)",
+    re.IGNORECASE,
+)
+# Section headings; date ranges in education sections are not work experience
+EDUCATION_HEADING = re.compile(
+    r"^\W{0,3}(?:(?:aus)?bildung|schulbildung|education|studium|akademischer werdegang|"
+    r"academic background|schulische ausbildung|qualifications)\W{0,3}$",
+    re.IGNORECASE,
+)
+OTHER_HEADING = re.compile(
+    r"^\W{0,3}(?:berufserfahrung|berufliche[rn]? (?:werdegang|erfahrung|stationen)|work experience|experience|"
+    r"professional experience|employment(?: history)?|praxiserfahrung|praktika|projekte|projects|"
+    r"kenntnisse|skills|sprachen|languages|zertifikate|certifications|weiterbildung)\W{0,3}$",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Experience:
+    months: int = 0
+    stated_years: int = 0
+    positions: List[Dict[str, Any]] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def years(self) -> int:
+        return max(self.stated_years, round(self.months / 12))
+
+
+def _parse_date(value: str) -> Tuple[int, int] | None:
+    """``(year, month)`` of a date string matched by `_DATE`."""
+    value = value.strip().lower()
+    numbers = re.findall(r"\d+", value)
+    if value[:1].isalpha():
+        name = re.match(r"[a-zäöü]+", value).group(0)
+        return int(numbers[-1]), MONTHS[name]
+    if len(numbers) == 1:
+        # Year only: "2015 - 2017" is read as Jan 2015 - Dec 2016
+        return int(numbers[0]), 1
+    if len(numbers[0]) == 4:
+        year, month = int(numbers[0]), int(numbers[1])
+    else:
+        year, month = int(numbers[-1]), int(numbers[-2])
+    return (year, month) if 1 <= month <= 12 else None
+
+
+def parse_experience(text: str, today: date | None = None) -> Experience:
+    """Work experience from the date ranges and statements in *text*."""
+    started = time.perf_counter()
+    today = today or date.today()
+    now = today.year * 12 + today.month - 1
+
+    intervals = []
+    positions = []
+    in_education = False
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if len(stripped) < 60:
+            if EDUCATION_HEADING.match(stripped):
+                in_education = True
+                continue
+            if OTHER_HEADING.match(stripped):
+                in_education = False
+                continue
+        if in_education or not any(c.isdigit() for c in line):
+            continue
+        for m in RANGE_PATTERN.finditer(line):
+            start = _parse_date(m.group('start') or m.group('since'))
+            if m.group('present') or m.group('since'):
+                end = (today.year, today.month)
+                open_ended = True
+            else:
+                end = _parse_date(m.group('end'))
+                open_ended = False
+            if start is None or end is None:
+                continue
+            first = start[0] * 12 + start[1] - 1
+            last = end[0] * 12 + end[1] - 1
+            if end[1] == 1 and re.fullmatch(r"\s*(?:19|20)\d{2}\s*", m.group('end') or ''):
+                # Year-only end: up to December of the previous year, or of
+                # that year when the range starts in it ("2018 - 2018")
+                last += 11 if end[0] == start[0] else -1
+            if not (1950 * 12 <= first <= last <= now + 12) or last - first > 50 * 12:
+                continue
+            intervals.append((first, last))
+            positions.append({
+                'start': f"{start[0]:04d}-{start[1]:02d}",
+                'end': 'present' if open_ended else f"{last // 12:04d}-{last % 12 + 1:02d}",
+                'months': last - first + 1,
+            })
+
+    # Merge overlapping/adjacent intervals so parallel jobs count once
+    months = 0
+    current = None
+    for first, last in sorted(intervals):
+        if current and first <= current[1] + 1:
+            current[1] = max(current[1], last)
+            continue
+        if current:
+            months += current[1] - current[0] + 1
+        current = [first, last]
+    if current:
+        months += current[1] - current[0] + 1
+
+    stated = [int(m.group(1)) for m in STATED_PATTERN.finditer(text)]
+    return Experience(
+        months=months,
+        stated_years=max(stated, default=0),
+        positions=positions,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Process-wide matcher
+# ---------------------------------------------------------------------------
+_matcher: SkillMatcher | None = None
+_matcher_lock = threading.Lock()
+
+
+def get_skills_matcher() -> SkillMatcher:
+    """Matcher for the taxonomy at ``SKILLS_TAXONOMY_PATH``; built once."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                started = time.perf_counter()
+                path = os.environ.get('SKILLS_TAXONOMY_PATH', DEFAULT_TAXONOMY_PATH)
+                matcher = SkillMatcher.from_file(path)
+                print(f"Skills taxonomy loaded: {len(matcher.terms)} terms, {matcher.form_count} forms "
+                      f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+                _matcher = matcher
+    return _matcher
@@ -0,0 +1,382 @@
+"""Storage of uploaded resumes, profile pictures and reports.
+
+Files are addressed by a key relative to the storage root, e.g.
+``blobs/ab/<sha256>.pdf`` (see `upload_store.py`), ``profile_pictures/<id>.jpg``
+or ``reports/<hash>.pdf``, and accessed through the backend returned by
+`get_storage`:
+
+* `LocalStorage` (default) keeps them under ``uploads/``.  Downloads are sent
+  from the file, which the WSGI server can pass to ``sendfile``, with Range
+  and conditional request support.  With ``STORAGE_ACCEL_REDIRECT`` set the
+  worker only sends the headers and nginx serves the file itself
+  (``X-Accel-Redirect``), e.g.::
+
+      location /protected-uploads/ { internal; alias /app/uploads/; }
+
+* `S3Storage` keeps them in an S3-compatible bucket (AWS S3, MinIO, R2, ...),
+  so several web instances share the files and they are not limited by the
+  local disk.  Downloads redirect to a short-lived presigned URL (the bucket
+  handles Range requests) or, with ``S3_SERVE=proxy``, are streamed through
+  the worker.  Needs ``boto3``.
+
+Uploads are staged on the local disk (``uploads/tmp``, and ``uploads/partial``
+for resumable uploads, whose chunks must therefore reach the same instance)
+and moved into the storage once complete.  The PDF tools read a local copy
+(`Storage.local_file`).
+
+Configuration (environment variables):
+
+``STORAGE_BACKEND``         ``local`` (default) or ``s3``
+``STORAGE_ACCEL_REDIRECT``  local: URL prefix of an nginx ``internal`` location for ``uploads/``
+``S3_BUCKET``               bucket name
+``S3_ENDPOINT_URL``         e.g. ``http://localhost:9000`` for MinIO (default: AWS)
+``S3_REGION``               bucket region
+``S3_ACCESS_KEY_ID``        credentials (default: the usual AWS credential chain)
+``S3_SECRET_ACCESS_KEY``
+``S3_PREFIX``               key prefix inside the bucket, e.g. ``resume-analyzer/``
+``S3_SERVE``                ``redirect`` (default) or ``proxy``
+``S3_PRESIGN_SECONDS``      lifetime of presigned download URLs
+"""
+import mimetypes
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import ContextManager, Iterator
+from urllib.parse import quote
+
+from flask import Response, redirect, request
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+import http_cache
+
+UPLOAD_FOLDER = 'uploads'
+TMP_DIR = 'tmp'
+PARTIAL_DIR = 'partial'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class StorageUnavailable(ImportError):
+    """The configured backend's client library is not installed."""
+
+
+def staging_path(suffix: str = '.tmp') -> str:
+    """A new local file name for staging a write; on the same filesystem as
+    `LocalStorage`, so moving it into place is an atomic rename."""
+    os.makedirs(os.path.join(UPLOAD_FOLDER, TMP_DIR), exist_ok=True)
+    return os.path.join(UPLOAD_FOLDER, TMP_DIR, f"{uuid.uuid4().hex}{suffix}")
+
+
+def _mimetype(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+class Storage(ABC):
+    """Interface of the storage backends; keys use ``/`` as separator."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def read(self, key: str) -> bytes:
+        """Contents of *key*; raises `FileNotFoundError` if it is missing."""
+
+    @abstractmethod
+    def write(self, key: str, data: bytes) -> None:
+        """Store *data* at *key*; readers never see a partial file."""
+
+    @abstractmethod
+    def put_file(self, key: str, path: str) -> None:
+        """Move the local file *path* (e.g. from `staging_path`) to *key*."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def local_file(self, key: str) -> ContextManager[str]:
+        """Path of a local file with the contents of *key*, valid inside the
+        ``with`` block (for tools like PyMuPDF that need a file).
+        Implemented as a `contextlib.contextmanager`."""
+
+    def send(self, key: str, mimetype: str | None = None, etag: str | None = None, max_age: int = 0,
+             download_name: str | None = None, as_attachment: bool = False,
+             allow_redirect: bool = True) -> Response:
+        """Response serving *key* to the current request.
+
+        A request whose ``If-None-Match`` matches *etag* is answered with
+        304 without touching the file.  ``allow_redirect=False`` keeps small,
+        browser-cached files (e.g. pictures) on this URL instead of sending
+        the client to a presigned URL that changes on every request.
+        """
+        if etag and http_cache.is_fresh(etag):
+            return http_cache.not_modified(etag, max_age=max_age)
+        return self._send(key, mimetype or _mimetype(key), etag, max_age, download_name, as_attachment,
+                          allow_redirect)
+
+    @abstractmethod
+    def _send(self, key, mimetype, etag, max_age, download_name, as_attachment, allow_redirect) -> Response:
+        ...
+
+
+# ---------------------------------------------------------------------------
+# Local disk
+# ---------------------------------------------------------------------------
+
+class LocalStorage(Storage):
+    def __init__(self, root: str = UPLOAD_FOLDER, accel_redirect: str | None = None):
+        self.root = root
+        self.accel_redirect = accel_redirect
+
+    def path(self, key: str) -> str:
+        path = safe_join(self.root, key)
+        if path is None:
+            raise FileNotFoundError(key)
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def read(self, key: str) -> bytes:
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+
+    def write(self, key: str, data: bytes) -> None:
+        tmp = staging_path()
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        self.put_file(key, tmp)
+
+    def put_file(self, key: str, path: str) -> None:
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[str]:
+        path = self.path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        yield path
+
+    def _send(self, key, mimetype, etag, max_age, download_name, as_attachment, allow_redirect) -> Response:
+        path = os.path.abspath(self.path(key))
+        if not self.accel_redirect:
+            # Range and conditional requests are handled by werkzeug; the
+            # file object goes to the server's wsgi.file_wrapper (sendfile)
+            return send_file(path, request.environ, mimetype=mimetype, etag=etag or True,
+                             conditional=True, max_age=max_age, as_attachment=as_attachment,
+                             download_name=download_name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        # Headers only; nginx sends the file (including Range requests)
+        response = send_file(path, request.environ, mimetype=mimetype, etag=etag or True,
+                             conditional=False, max_age=max_age, as_attachment=as_attachment,
+                             download_name=download_name, use_x_sendfile=True)
+        del response.headers['X-Sendfile']
+        response.headers['X-Accel-Redirect'] = self.accel_redirect.rstrip('/') + '/' + quote(key)
+        return response
+
+
+# ---------------------------------------------------------------------------
+# S3-compatible object storage
+# ---------------------------------------------------------------------------
+
+class S3Storage(Storage):
+    def __init__(self, bucket: str, prefix: str = '', serve: str = 'redirect', presign_seconds: int = 300,
+                 **client_options):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.serve = serve
+        self.presign_seconds = presign_seconds
+        self.client_options = client_options
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """boto3 S3 client, created on first use (clients are thread-safe)."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    try:
+                        import boto3
+                        from botocore.config import Config
+                    except ImportError as e:
+                        raise StorageUnavailable("STORAGE_BACKEND=s3 needs boto3: pip install boto3") from e
+                    options = dict(self.client_options)
+                    config = {'signature_version': 's3v4', 'max_pool_connections': 20}
+                    if options.get('endpoint_url'):
+                        # MinIO and most stand-ins only support path-style URLs
+                        config['s3'] = {'addressing_style': 'path'}
+                    self._client = boto3.session.Session().client('s3', config=Config(**config), **options)
+        return self._client
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def _missing(self, error) -> bool:
+        return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if self._missing(e):
+                return False
+            raise
+        return True
+
+    def read(self, key: str) -> bytes:
+        from botocore.exceptions import ClientError
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+        return obj['Body'].read()
+
+    def write(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, ContentType=_mimetype(key))
+
+    def put_file(self, key: str, path: str) -> None:
+        # Multipart for large files; the object appears only once complete
+        self.client.upload_file(path, self.bucket, self._key(key), ExtraArgs={'ContentType': _mimetype(key)})
+        os.remove(path)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[str]:
+        from botocore.exceptions import ClientError
+        path = staging_path(os.path.splitext(key)[1])
+        try:
+            try:
+                self.client.download_file(self.bucket, self._key(key), path)
+            except ClientError as e:
+                if self._missing(e):
+                    raise FileNotFoundError(key) from e
+                raise
+            yield path
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _disposition(self, download_name, as_attachment) -> str | None:
+        if not download_name and not as_attachment:
+            return None
+        kind = 'attachment' if as_attachment else 'inline'
+        if not download_name:
+            return kind
+        return f"{kind}; filename*=UTF-8''{quote(download_name)}"
+
+    def _send(self, key, mimetype, etag, max_age, download_name, as_attachment, allow_redirect) -> Response:
+        disposition = self._disposition(download_name, as_attachment)
+        if self.serve != 'proxy' and allow_redirect:
+            params = {'Bucket': self.bucket, 'Key': self._key(key), 'ResponseContentType': mimetype}
+            if disposition:
+                params['ResponseContentDisposition'] = disposition
+            url = self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=self.presign_seconds)
+            response = redirect(url, code=302)
+            # The URL expires; never cache the redirect itself
+            response.cache_control.no_store = True
+            return response
+
+        from botocore.exceptions import ClientError
+        params = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if request.range is not None:
+            params['Range'] = request.headers['Range']
+        try:
+            obj = self.client.get_object(**params)
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key) from e
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                return Response(status=416)
+            raise
+        body = obj['Body']
+        response = Response(body.iter_chunks(STREAM_CHUNK_SIZE), mimetype=mimetype, direct_passthrough=True,
+                            status=obj['ResponseMetadata']['HTTPStatusCode'])
+        response.content_length = obj['ContentLength']
+        response.accept_ranges = 'bytes'
+        if obj.get('ContentRange'):
+            response.headers['Content-Range'] = obj['ContentRange']
+        if disposition:
+            response.headers['Content-Disposition'] = disposition
+        response.set_etag(etag or obj['ETag'].strip('"'))
+        response.cache_control.max_age = max_age
+        response.call_on_close(body.close)
+        return response
+
+
+# ---------------------------------------------------------------------------
+# Configured backend
+# ---------------------------------------------------------------------------
+
+_storage: Storage | None = None
+_storage_lock = threading.Lock()
+
+
+def storage_from_env() -> Storage:
+    backend = os.environ.get('STORAGE_BACKEND', 'local').lower()
+    if backend == 'local':
+        return LocalStorage(UPLOAD_FOLDER, accel_redirect=os.environ.get('STORAGE_ACCEL_REDIRECT') or None)
+    if backend == 's3':
+        bucket = os.environ.get('S3_BUCKET')
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+        options = {
+            'endpoint_url': os.environ.get('S3_ENDPOINT_URL') or None,
+            'region_name': os.environ.get('S3_REGION') or None,
+            'aws_access_key_id': os.environ.get('S3_ACCESS_KEY_ID') or None,
+            'aws_secret_access_key': os.environ.get('S3_SECRET_ACCESS_KEY') or None,
+        }
+        return S3Storage(
+            bucket,
+            prefix=os.environ.get('S3_PREFIX', ''),
+            serve=os.environ.get('S3_SERVE', 'redirect').lower(),
+            presign_seconds=int(os.environ.get('S3_PRESIGN_SECONDS', 300)),
+            **{k: v for k, v in options.items() if v is not None},
+        )
+    raise RuntimeError(f"Unknown STORAGE_BACKEND {backend!r}")
+
+
+def get_storage() -> Storage:
+    """The storage backend of this process (from the environment)."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = storage_from_env()
+    return _storage
+
+
+def copy_local_files(target: Storage, root: str = UPLOAD_FOLDER) -> int:
+    """Copy the files under the local *root* (except staging directories)
+    to *target*, skipping keys it already has; returns the number copied."""
+    copied = 0
+    for directory, dirs, files in os.walk(root):
+        if directory == root:
+            dirs[:] = [d for d in dirs if d not in (TMP_DIR, PARTIAL_DIR)]
+        for name in files:
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(directory, name)
+            key = os.path.relpath(path, root).replace(os.sep, '/')
+            if not target.exists(key):
+                with open(path, 'rb') as f:
+                    target.write(key, f.read())
+                copied += 1
+    return copied
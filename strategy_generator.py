@@ -0,0 +1,91 @@
+"""Job-hunting strategy generation from a resume analysis and questionnaire.
+
+Shared by the Flask view in `blueprints/strategies.py` (blocking) and the
+asyncio endpoint in `asgi.py`.
+"""
+import os
+import json
+from typing import Any, Dict, List
+
+from metrics import record_openai_usage, timed
+from openai_client import get_openai_client, get_async_openai_client, with_deadline
+
+
+class StrategyGenerator:
+    SYSTEM_MSG = "You are an expert career coach and labour-market analyst."
+
+    FALLBACK_STRATEGY = {
+        'job_market_overview': 'Could not retrieve AI-generated overview. Please try again later.',
+        'personal_strategy': 'N/A',
+        'recommended_job_boards': [],
+        'next_steps': []
+    }
+
+    def __init__(self, model: str = "gpt-3.5-turbo", timeout: float | None = None):
+        self.model = model
+        self.timeout = timeout if timeout is not None else float(os.environ.get('OPENAI_STRATEGY_TIMEOUT', 30))
+
+    @staticmethod
+    def questionnaire_to_dict(questionnaire) -> Dict[str, Any]:
+        return {
+            'current_status': questionnaire.current_status,
+            'job_type': questionnaire.job_type,
+            'salary_expectation': questionnaire.salary_expectation,
+            'preferred_location': questionnaire.preferred_location,
+        }
+
+    def generate(self, analysis, questionnaire: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the strategy dict; falls back to a placeholder on any error."""
+        try:
+            client = with_deadline(get_openai_client(), self.timeout)
+            with timed('openai_strategy'):
+                response = client.chat.completions.create(**self._request(analysis, questionnaire))
+            record_openai_usage('strategy', getattr(response, 'usage', None))
+            return self._parse(response)
+        except Exception as e:
+            print('Strategy generation failed:', e)
+            return dict(self.FALLBACK_STRATEGY)
+
+    async def agenerate(self, analysis, questionnaire: Dict[str, Any]) -> Dict[str, Any]:
+        """Asyncio variant of `generate` using the shared `AsyncOpenAI` client."""
+        try:
+            client = with_deadline(get_async_openai_client(), self.timeout)
+            with timed('openai_strategy'):
+                response = await client.chat.completions.create(**self._request(analysis, questionnaire))
+            record_openai_usage('strategy', getattr(response, 'usage', None))
+            return self._parse(response)
+        except Exception as e:
+            print('Strategy generation failed:', e)
+            return dict(self.FALLBACK_STRATEGY)
+
+    # ------------------------------------------------------------------
+    def _messages(self, analysis, questionnaire: Dict[str, Any]) -> List[Dict[str, str]]:
+        user_prompt = (
+            "Based on the following resume analysis JSON and questionnaire data, "
+            "produce a JSON advice report with these keys:\n"
+            "job_market_overview: short paragraph,\n"
+            "personal_strategy: detailed plan (3-5 bullet points),\n"
+            "recommended_job_boards: list of strings,\n"
+            "next_steps: list of actionable next steps.\n\n"
+            f"Resume analysis: {json.dumps(analysis)}\n\n"
+            f"Questionnaire: {json.dumps(questionnaire)}"
+        )
+        return [
+            {"role": "system", "content": self.SYSTEM_MSG},
+            {"role": "system", "content": "Return ONLY pure JSON with no markdown."},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _request(self, analysis, questionnaire: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(
+            model=self.model,
+            messages=self._messages(analysis, questionnaire),
+            temperature=0.5,
+            response_format={"type": "json_object"},
+            max_tokens=800
+        )
+
+    @staticmethod
+    def _parse(response) -> Dict[str, Any]:
+        raw = response.choices[0].message.content.strip()
+        return json.loads(raw)
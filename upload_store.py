@@ -0,0 +1,206 @@
+"""Content-addressed storage of uploaded PDFs.
+
+Uploads are stored as ``blobs/<hh>/<sha256>.pdf`` in the configured storage
+(see `storage.py`).  The hash is computed while the upload is streamed to a
+local staging file, which is then moved into the storage, or dropped if a
+blob with that content already exists.
+Identical files therefore share one blob, and since extractions and analyses
+are keyed by the same hash, also the extracted text and the LLM analysis.
+
+The name the user uploaded is kept as ``Resume.original_filename``; blobs
+never change, so ``Resume.content_hash`` is used without re-hashing the file.
+
+Uploads are checked for the PDF header as soon as their first bytes arrive,
+so other files are rejected before the rest of the body is written.
+Resumable uploads (see `chunked_uploads.py`) are assembled in
+``uploads/partial/<upload_id>.part`` and moved into the blob store when
+they are finalized.
+
+Configuration (environment variables):
+
+``UPLOAD_MAX_FILE_MB``  size limit of a single resume PDF
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import IO, Tuple
+
+from storage import UPLOAD_FOLDER, PARTIAL_DIR, get_storage, staging_path
+
+BLOB_DIR = 'blobs'
+CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_FILE_BYTES = int(float(os.environ.get('UPLOAD_MAX_FILE_MB', 16)) * 1024 * 1024)
+
+# A PDF starts with "%PDF-" (readers accept it within the first 1 KB) and
+# ends with "%%EOF" (within the last 1 KB)
+PDF_MAGIC = b'%PDF-'
+PDF_EOF = b'%%EOF'
+PDF_HEADER_WINDOW = 1024
+
+
+class UploadRejected(ValueError):
+    """The upload is refused; `status` is the HTTP status to answer with."""
+    status = 400
+
+
+class NotAPDF(UploadRejected):
+    status = 415
+
+
+class UploadTooLarge(UploadRejected):
+    status = 413
+
+
+@dataclass
+class StoredBlob:
+    content_hash: str
+    path: str  # storage key, i.e. `Resume.filename`
+    created: bool  # False if identical content was already stored
+
+
+def blob_path(content_hash: str) -> str:
+    return f"{BLOB_DIR}/{content_hash[:2]}/{content_hash}.pdf"
+
+
+def _commit(tmp: str, content_hash: str) -> StoredBlob:
+    path = blob_path(content_hash)
+    storage = get_storage()
+    if storage.exists(path):
+        os.remove(tmp)
+        return StoredBlob(content_hash, path, created=False)
+    # Atomic; a concurrent upload of the same content writes identical bytes
+    storage.put_file(path, tmp)
+    return StoredBlob(content_hash, path, created=True)
+
+
+def read_head(stream: IO[bytes], size: int = PDF_HEADER_WINDOW) -> bytes:
+    """Read up to *size* bytes; a short read only happens at the end of *stream*."""
+    head = b''
+    while len(head) < size:
+        piece = stream.read(size - len(head))
+        if not piece:
+            break
+        head += piece
+    return head
+
+
+def check_pdf_header(head: bytes) -> None:
+    if PDF_MAGIC not in head[:PDF_HEADER_WINDOW]:
+        raise NotAPDF('Only PDF files are accepted')
+
+
+def _copy(stream: IO[bytes], f: IO[bytes], digest, max_bytes: int | None, head: bytes = b'') -> int:
+    """Write *head* and then *stream* to *f*, hashing as it goes; returns the
+    byte count.  Stops reading as soon as *max_bytes* is exceeded."""
+    written = 0
+    chunk = head
+    while True:
+        if chunk:
+            written += len(chunk)
+            if max_bytes is not None and written > max_bytes:
+                raise UploadTooLarge('File too large')
+            digest.update(chunk)
+            f.write(chunk)
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            return written
+
+
+def store_stream(stream: IO[bytes], max_bytes: int | None = None) -> StoredBlob:
+    """Store a PDF upload, checking its header and hashing it while it is
+    written to disk."""
+    head = read_head(stream)
+    check_pdf_header(head)
+    digest = hashlib.sha256()
+    tmp = staging_path()
+    try:
+        with open(tmp, 'wb') as f:
+            _copy(stream, f, digest, max_bytes, head)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return _commit(tmp, digest.hexdigest())
+
+
+def store_bytes(data: bytes) -> StoredBlob:
+    """Store a PDF that is already in memory (e.g. a zip entry); raises
+    `NotAPDF` like `store_stream`."""
+    check_pdf_header(data[:PDF_HEADER_WINDOW])
+    tmp = staging_path()
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    return _commit(tmp, hashlib.sha256(data).hexdigest())
+
+
+def remove_blob(blob: StoredBlob) -> None:
+    """Delete a blob this request created, e.g. when the upload is rejected."""
+    if blob.created:
+        get_storage().delete(blob.path)
+
+
+# ---------------------------------------------------------------------------
+# Resumable uploads
+# ---------------------------------------------------------------------------
+
+def partial_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_FOLDER, PARTIAL_DIR, f"{upload_id}.part")
+
+
+class _Tee:
+    def __init__(self, *digests):
+        self.digests = [d for d in digests if d is not None]
+
+    def update(self, data: bytes) -> None:
+        for d in self.digests:
+            d.update(data)
+
+
+def write_chunk(upload_id: str, offset: int, stream: IO[bytes], max_bytes: int, digest=None) -> Tuple[int, str]:
+    """Write *stream* into the partial file of *upload_id* at *offset*.
+
+    The first chunk (offset 0) must start with the PDF header.  Returns the
+    number of bytes written and their SHA-256; *digest*, if given, is updated
+    with the same bytes (the running hash of the whole file).  Anything past
+    the chunk is cut off, so a retried chunk replaces a broken earlier try.
+    """
+    head = b''
+    if offset == 0:
+        head = read_head(stream)
+        check_pdf_header(head)
+    path = partial_path(upload_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    chunk_digest = hashlib.sha256()
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.seek(offset)
+        written = _copy(stream, f, _Tee(chunk_digest, digest), max_bytes, head)
+        f.truncate(offset + written)
+    return written, chunk_digest.hexdigest()
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_pdf_trailer(path: str) -> None:
+    """Reject a file whose end is not a PDF trailer, e.g. a truncated upload."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - PDF_HEADER_WINDOW))
+        if PDF_EOF not in f.read():
+            raise NotAPDF('The file is not a complete PDF')
+
+
+def store_partial(upload_id: str, content_hash: str) -> StoredBlob:
+    """Move a finished partial file into the blob store."""
+    return _commit(partial_path(upload_id), content_hash)
+
+
+def remove_partial(upload_id: str) -> None:
+    try:
+        os.remove(partial_path(upload_id))
+    except FileNotFoundError:
+        pass